@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Moteur de scan asyncio natif
+Collecteurs en coroutines pilotées par une seule boucle : HTTP/1.1 sur
+asyncio.open_connection (keep-alive, redirections, chunked, gzip), poignée
+de main TLS via open_connection(ssl=...), WHOIS (bloquant) délégué à un
+petit pool de threads. Concurrence plafonnée par sémaphores (globale et par
+hôte) et délai maximal par phase. Le schéma de results est celui de
+WebScanner / MalwareScanner.
+"""
+
+import json
+import zlib
+import asyncio
+import contextlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit, urljoin
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from web_scanner import WebScanner
+from malware_scanner import MalwareScanner
+from scan_pipeline import CombinedScanner
+from tls_cache import shared_context
+from http_session import BoundedBody, DOWNLOAD_CHUNK, add_download_arguments, configure_download_from_args
+from rule_engine import add_rules_arguments, configure_rules_from_args
+
+
+# Délai maximal de chaque phase de collecte (secondes)
+DEFAULT_DEADLINES = {"http": 15.0, "tls": 10.0, "whois": 20.0}
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 30            # valeur par défaut de requests
+MAX_HEADER_LINE = 64 * 1024
+
+
+def parse_deadlines(text: str) -> dict:
+    """'http=10,tls=5' → délais par phase (les autres gardent leur défaut)"""
+    deadlines = dict(DEFAULT_DEADLINES)
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        phase, _, value = item.partition('=')
+        if phase not in deadlines:
+            raise ValueError(f"Phase inconnue : {phase}")
+        deadlines[phase] = float(value)
+    return deadlines
+
+
+# ========== CLIENT HTTP/1.1 ==========
+
+class _StreamDecoder:
+    """Content-Encoding gzip / deflate décodé bloc par bloc (comme urllib3),
+    sortie limitée à max_length : une bombe gzip ne peut pas saturer la mémoire"""
+
+    def __init__(self, encoding):
+        self.deflate = encoding == 'deflate'
+        self._fallback = self.deflate  # deflate brut (sans en-tête zlib) toléré
+        self._obj = zlib.decompressobj(zlib.MAX_WBITS if self.deflate else 16 + zlib.MAX_WBITS)
+
+    def decompress(self, data, max_length):
+        try:
+            output = self._obj.decompress(data, max_length)
+        except zlib.error:
+            if not self._fallback:
+                raise
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            output = self._obj.decompress(data, max_length)
+        self._fallback = False
+        return output
+
+
+def _decoder(encoding):
+    encoding = (encoding or '').strip().lower()
+    if encoding in ('gzip', 'x-gzip', 'deflate'):
+        return _StreamDecoder('deflate' if encoding == 'deflate' else 'gzip')
+    return None
+
+
+class AsyncHTTPClient:
+    """Client GET minimal avec connexions keep-alive réutilisées par hôte"""
+
+    def __init__(self, max_idle_per_host=4, max_redirects=MAX_REDIRECTS, context=None):
+        self.max_idle_per_host = max_idle_per_host
+        self.max_redirects = max_redirects
+        self.context = context
+        self._idle = {}
+        self.stats = {"requests": 0, "new_connections": 0, "reused_connections": 0}
+
+    async def _connect(self, key):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                self.stats["reused_connections"] += 1
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        ssl_context = (self.context or shared_context()) if scheme == 'https' else None
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=ssl_context, server_hostname=host if ssl_context else None,
+            limit=MAX_HEADER_LINE
+        )
+        self.stats["new_connections"] += 1
+        return reader, writer, False
+
+    def _release(self, key, reader, writer, keep_alive):
+        idle = self._idle.setdefault(key, [])
+        if keep_alive and len(idle) < self.max_idle_per_host:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+
+    async def _read_head(self, reader):
+        """Ligne de statut et en-têtes (réponses 1xx ignorées)"""
+        while True:
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError("Connexion fermée avant la réponse")
+            version, status, *reason = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+            headers = CaseInsensitiveDict()
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                name, value = name.strip(), value.strip()
+                # En-têtes répétés joints par ", " (comportement de requests)
+                headers[name] = f"{headers[name]}, {value}" if name in headers else value
+            status = int(status)
+            if not 100 <= status < 200 or status == 101:
+                return version, status, (reason[0] if reason else ''), headers
+
+    async def _read_body(self, reader, status, headers):
+        """(BoundedBody, connexion réutilisable) ; lecture arrêtée au plafond"""
+        body = BoundedBody(decoder=_decoder(headers.get('Content-Encoding')))
+        if status in (204, 304):
+            return body, True
+        if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b';', 1)[0].strip() or b'0', 16)
+                if size == 0:
+                    # Trailers éventuels jusqu'à la ligne vide
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    return body, True
+                if not await self._read_into(reader, body, size):
+                    return body, False
+                await reader.readexactly(2)
+        length = headers.get('Content-Length')
+        if length is not None:
+            body.check_length(int(length))
+            return body, await self._read_into(reader, body, int(length))
+        # Ni longueur ni chunked : corps délimité par la fermeture
+        while True:
+            chunk = await reader.read(DOWNLOAD_CHUNK)
+            if not chunk or not body.feed(chunk):
+                return body, False
+
+    async def _read_into(self, reader, body, size):
+        """Lit size octets par blocs ; False si le plafond interrompt la lecture
+        (reste non lu : connexion à fermer)"""
+        while size:
+            chunk = await reader.readexactly(min(size, DOWNLOAD_CHUNK))
+            size -= len(chunk)
+            if not body.feed(chunk):
+                return False
+        return True
+
+    async def _request(self, url, headers):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ('http', 'https') or not parts.hostname:
+            raise requests.exceptions.InvalidURL(f"URL invalide : {url}")
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        head = [f"GET {target} HTTP/1.1", f"Host: {parts.netloc.rsplit('@', 1)[-1]}",
+                "Accept: */*", "Accept-Encoding: gzip, deflate", "Connection: keep-alive"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        payload = ("\r\n".join(head) + "\r\n\r\n").encode('latin-1')
+
+        for attempt in range(2):
+            reader, writer, reused = await self._connect(key)
+            try:
+                writer.write(payload)
+                await writer.drain()
+                version, status, reason, response_headers = await self._read_head(reader)
+                body, framed = await self._read_body(reader, status, response_headers)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused and attempt == 0:
+                    continue  # connexion keep-alive fermée par le serveur : on réessaie
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            keep_alive = framed and version == 'HTTP/1.1' \
+                and response_headers.get('Connection', '').lower() != 'close'
+            self._release(key, reader, writer, keep_alive)
+            self.stats["requests"] += 1
+            break
+
+        response = requests.models.Response()
+        response.status_code = status
+        response.reason = reason
+        response.headers = response_headers
+        response.url = url
+        body.attach(response)
+        response.encoding = get_encoding_from_headers(response_headers)
+        return response
+
+    async def get(self, url, headers=None, timeout=10):
+        """GET avec redirections ; Response de requests (text, history, raise_for_status)"""
+        history = []
+        for _ in range(self.max_redirects + 1):
+            response = await asyncio.wait_for(self._request(url, headers or {}), timeout)
+            location = response.headers.get('Location')
+            if response.status_code not in REDIRECT_STATUSES or not location:
+                response.history = history
+                return response
+            history.append(response)
+            url = urljoin(url, location)
+        raise requests.exceptions.TooManyRedirects(f"Plus de {self.max_redirects} redirections")
+
+    def snapshot(self):
+        """Même forme que http_session.connection_stats()"""
+        opened = self.stats["new_connections"] + self.stats["reused_connections"]
+        return {**self.stats,
+                "reuse_ratio": self.stats["reused_connections"] / opened if opened else 0.0}
+
+    def close(self):
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+
+# ========== SCANNERS ==========
+
+class AsyncWebScanner(WebScanner):
+    """WebScanner dont les collecteurs sont des coroutines"""
+
+    def __init__(self, url, client: AsyncHTTPClient, whois_executor=None,
+                 deadlines=None, **kwargs):
+        kwargs.setdefault("quiet", True)
+        super().__init__(url, **kwargs)
+        self.client = client
+        self.whois_executor = whois_executor
+        self.deadlines = deadlines or DEFAULT_DEADLINES
+        self._unparsed = None
+
+    def parse_response(self, response):
+        # Parsing laissé à collect_http_async, hors de la boucle
+        self._unparsed = response.content
+        self.results["collection"]["html_structure"] = None
+
+    async def collect_http_async(self):
+        self.log("Collecte des données HTTP...")
+        with self.metrics.phase("fetch", cpu=False):
+            response = await self.client.get(self.url, headers=self.http_request_headers(),
+                                             timeout=self.deadlines["http"])
+        self.handle_http_response(response)
+        if self._unparsed is not None:
+            # Le document est rattaché depuis la boucle, jamais par un thread
+            # qui aurait dépassé le délai
+            content, self._unparsed = self._unparsed, None
+            document = await asyncio.get_running_loop().run_in_executor(
+                None, self.parse_document, content)
+            self.set_document(document)
+
+    async def collect_tls_async(self):
+        self.log("Collecte du certificat TLS...")
+        if not self.parsed_url.scheme == 'https':
+            self.results["collection"]["tls"] = {"error": "Non-HTTPS"}
+            return False
+        hostname = self.parsed_url.hostname
+        port = self.parsed_url.port or 443
+        context = self.tls_store.context or shared_context()
+        with self.metrics.phase("tls", cpu=False):
+            _, writer = await asyncio.open_connection(hostname, port, ssl=context,
+                                                      server_hostname=hostname)
+            try:
+                der = writer.get_extra_info('ssl_object').getpeercert(binary_form=True)
+            finally:
+                writer.close()
+        fingerprint = self.tls_store.record_handshake((hostname, port, hostname), der)
+        tls = self.tls_store.describe(der, fingerprint)
+        self.results["collection"]["tls"] = tls
+        self.log(f"✓ Certificat collecté : expire dans {tls['days_until_expiry']} jours")
+
+    async def collect_whois_async(self):
+        self.log("Collecte des données WHOIS...")
+        # Requête bloquante dans le pool ; le résumé est écrit depuis la boucle,
+        # jamais par un thread qui aurait dépassé le délai
+        loop = asyncio.get_running_loop()
+        with self.metrics.phase("whois", cpu=False):
+            record, from_cache = await loop.run_in_executor(self.whois_executor, self.lookup_whois)
+        self.store_whois(record, from_cache)
+
+    async def collect_async(self):
+        """Les trois collecteurs en parallèle, chacun borné par son délai"""
+        collectors = {
+            "http": self.collect_http_async,
+            "tls": self.collect_tls_async,
+            "whois": self.collect_whois_async
+        }
+        loop = asyncio.get_running_loop()
+        timings = {}
+
+        async def timed(name, collector):
+            start = loop.time()
+            success = False
+            try:
+                success = await asyncio.wait_for(collector(), self.deadlines[name]) is not False
+            except asyncio.TimeoutError:
+                self.results["collection"][f"{name}_error"] = \
+                    f"Délai dépassé ({self.deadlines[name]:g} s)"
+            except Exception as e:
+                self.results["collection"][f"{name}_error"] = str(e) or type(e).__name__
+            finally:
+                timings[name] = {
+                    "duration_ms": round((loop.time() - start) * 1000, 1),
+                    "success": success
+                }
+
+        start = loop.time()
+        await asyncio.gather(*(timed(name, collector) for name, collector in collectors.items()))
+        timings["total_ms"] = round((loop.time() - start) * 1000, 1)
+        self.results["collection"]["timings"] = {
+            name: timings[name] for name in (*collectors, "total_ms")
+        }
+
+    async def run_async(self, save_state=True):
+        # Pas de profilage cProfile/tracemalloc : les scans s'entrelacent sur la boucle
+        with self.metrics.phase("scan", cpu=False):
+            await self.run_steps_async(save_state)
+        self.results["metrics"] = self.metrics.to_dict()
+        return self.results
+
+    async def run_steps_async(self, save_state=True):
+        await self.collect_async()
+        self.analyze()
+        if save_state:
+            self.save_state()
+        return self.results
+
+
+class AsyncMalwareScanner(MalwareScanner):
+    """MalwareScanner dont la récupération est une coroutine"""
+
+    def __init__(self, url, client: AsyncHTTPClient, deadline=DEFAULT_DEADLINES["http"], **kwargs):
+        super().__init__(url, **kwargs)
+        self.client = client
+        self.deadline = deadline
+
+    async def scan_async(self):
+        previous, extra_headers = self.previous_scan()
+        headers = {'User-Agent': 'Mozilla/5.0 (Malware Scanner Bot)', **(extra_headers or {})}
+        with self.metrics.phase("scan", cpu=False):
+            try:
+                with self.metrics.phase("fetch", cpu=False):
+                    response = await self.client.get(self.url, headers=headers, timeout=self.deadline)
+                self.metrics.count("bytes_downloaded", len(response.content))
+                response.raise_for_status()
+            except (requests.exceptions.RequestException, OSError, asyncio.TimeoutError):
+                self.results["error"] = "Impossible de récupérer le contenu"
+            else:
+                self.response = response
+                # Décodage, parsing et analyse dans un thread (ou le pool CPU) :
+                # la boucle continue de servir les autres scans
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.process_response, response, previous)
+        self.results["metrics"] = self.metrics.to_dict()
+        return self.results
+
+    def process_response(self, response, previous):
+        content = response.content if self.cpu_stage is not None else response.text
+        return self.process_content(content, response.headers, response.status_code,
+                                    previous, verbose=False)
+
+
+class AsyncCombinedScanner(CombinedScanner):
+    """Scan combiné (externe + malware) sur la boucle asyncio"""
+
+    def __init__(self, url, client: AsyncHTTPClient, whois_executor=None, deadlines=None,
+                 verbose=False, cpu_stage=None, **web_options):
+        super().__init__(url, verbose=verbose, quiet=True, cpu_stage=cpu_stage)
+        self.web = AsyncWebScanner(url, client, whois_executor, deadlines,
+                                   verbose=verbose, session=self.session, **web_options)
+        self.web.requires_malware_state = True
+        self.web.defer_parsing = cpu_stage is not None
+        self.malware.metrics = self.web.metrics
+        self.results = self.web.results
+
+    async def run_async(self):
+        with self.web.metrics.phase("scan", cpu=False):
+            await self.web.run_steps_async(save_state=False)
+            # Analyse malware (pool CPU ou parsing/patterns locaux) hors de la boucle
+            loop = asyncio.get_running_loop()
+            self.results["malware"] = await loop.run_in_executor(None, self.analyze_malware)
+            self.web.save_state(malware=self.results["malware"])
+        self.results["metrics"] = self.web.metrics.to_dict()
+        return self.results
+
+
+class AsyncScanEngine:
+    """Milliers de scans concurrents sur une boucle et quelques threads WHOIS"""
+
+    def __init__(self, concurrency=500, per_host=2, combined=False, deadlines=None,
+                 whois_workers=8, scanner_options=None, cpu_stage=None):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.combined = combined
+        self.deadlines = deadlines or DEFAULT_DEADLINES
+        self.whois_workers = whois_workers
+        self.scanner_options = scanner_options or {}
+        self.cpu_stage = cpu_stage
+        self.client = None
+        self.whois_executor = None
+        self._host_limits = {}   # hôte → [sémaphore, scans en cours ou en attente]
+        self._global_limit = None
+
+    async def __aenter__(self):
+        self.client = AsyncHTTPClient(max_idle_per_host=self.per_host)
+        self.whois_executor = ThreadPoolExecutor(max_workers=self.whois_workers,
+                                                 thread_name_prefix="whois")
+        self._global_limit = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.client.close()
+        # Les requêtes WHOIS hors délai se terminent en arrière-plan
+        self.whois_executor.shutdown(wait=False, cancel_futures=True)
+
+    @contextlib.asynccontextmanager
+    async def _host_slot(self, host):
+        """Place de l'hôte ; l'entrée disparaît quand l'hôte n'a plus de scan"""
+        entry = self._host_limits.get(host)
+        if entry is None:
+            entry = self._host_limits[host] = [asyncio.Semaphore(self.per_host), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._host_limits[host]
+
+    def make_scanner(self, url):
+        if self.combined:
+            return AsyncCombinedScanner(url, self.client, self.whois_executor, self.deadlines,
+                                        cpu_stage=self.cpu_stage, **self.scanner_options)
+        return AsyncWebScanner(url, self.client, self.whois_executor, self.deadlines,
+                               **self.scanner_options)
+
+    async def scan_one(self, url):
+        """Scanne un site ; les erreurs sont retournées dans le résultat"""
+        # Place de l'hôte d'abord : un scan en attente de son hôte n'occupe
+        # pas de place globale au détriment des autres hôtes
+        async with self._host_slot(urlsplit(url).netloc.lower()), self._global_limit:
+            try:
+                return await self.make_scanner(url).run_async()
+            except Exception as e:
+                return {
+                    "url": url,
+                    "domain": urlsplit(url).netloc,
+                    "scan_date": datetime.now().isoformat(),
+                    "error": str(e)
+                }
+
+
+async def _scan_urls(urls, malware_only, **engine_options):
+    async with AsyncScanEngine(**engine_options) as engine:
+        if malware_only:
+            scans = [AsyncMalwareScanner(url, engine.client).scan_async() for url in urls]
+        else:
+            scans = [engine.scan_one(url) for url in urls]
+        return await asyncio.gather(*scans)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan asyncio natif d'une ou plusieurs URLs")
+    parser.add_argument("urls", nargs="+", help="URLs à analyser")
+    parser.add_argument("--combined", action="store_true", help="Ajoute l'analyse malware")
+    parser.add_argument("--malware-only", action="store_true", help="Analyse malware uniquement")
+    parser.add_argument("--deadlines", default="",
+                        help="Délais par phase, ex. http=10,tls=5,whois=15 (secondes)")
+    add_download_arguments(parser)
+    add_rules_arguments(parser)
+    args = parser.parse_args()
+    configure_download_from_args(args)
+    configure_rules_from_args(args)
+
+    urls = [url if url.startswith(('http://', 'https://')) else 'https://' + url for url in args.urls]
+    results = asyncio.run(_scan_urls(urls, args.malware_only, combined=args.combined,
+                                     deadlines=parse_deadlines(args.deadlines)))
+    print(json.dumps(results if len(results) > 1 else results[0],
+                     indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    main()
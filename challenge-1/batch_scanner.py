@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Scan par lots pour le Web Scanner
+Exécute de nombreux WebScanner dans un seul processus (pool de threads ou
+asyncio) et écrit chaque résultat dans une destination (NDJSON par défaut,
+SQLite ou colonnes, voir result_sink.py)
+"""
+
+import os
+import re
+import sys
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from urllib.parse import urlparse
+
+from web_scanner import WebScanner
+from scan_pipeline import CombinedScanner
+from http_session import (configure_session, connection_stats, add_download_arguments,
+                          configure_download_from_args, DEFAULT_RETRIES)
+from rule_engine import add_rules_arguments, configure_rules_from_args
+from whois_cache import add_whois_arguments, whois_options
+from async_scanner import AsyncScanEngine, DEFAULT_DEADLINES, parse_deadlines
+from tls_cache import default_store
+from scan_state import add_state_arguments, state_options
+from script_cache import add_script_cache_arguments, configure_from_args
+from external_scripts import add_external_script_arguments, configure_external_from_args
+from cpu_pipeline import add_cpu_arguments, cpu_stage_from_args
+from metrics import add_metrics_arguments, metrics_options
+from result_sink import ResultSink, NDJSONSink, DEFAULT_BATCH, add_sink_arguments, sink_from_args
+
+
+def normalize_url(url):
+    """Ajoute le schéma https:// si absent (même règle que web_scanner.py)"""
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+
+# URLs mises de côté (hôte déjà au plafond) avant de suspendre la lecture
+DEFAULT_MAX_DEFERRED = 10_000
+
+
+def read_urls(stream):
+    """Lit une URL par ligne (lignes vides et commentaires # ignorés)"""
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        yield normalize_url(line)
+
+
+class HostGate:
+    """Scans en cours et URLs en attente par hôte, consulté avant soumission :
+    une URL dont l'hôte est au plafond attend dans sa file sans occuper de
+    worker. Les hôtes inactifs sont oubliés. Utilisé depuis un seul thread."""
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self.deferred = 0
+        self._running = {}   # hôte → scans en cours
+        self._waiting = {}   # hôte → URLs en attente
+
+    @staticmethod
+    def host(url):
+        return urlparse(url).netloc.lower()
+
+    def admit(self, url) -> bool:
+        """Vrai si le scan peut démarrer, sinon l'URL est mise en attente"""
+        host = self.host(url)
+        running = self._running.get(host, 0)
+        if running < self.per_host:
+            self._running[host] = running + 1
+            return True
+        self._waiting.setdefault(host, deque()).append(url)
+        self.deferred += 1
+        return False
+
+    def release(self, url):
+        """Fin du scan de url : URL suivante du même hôte (qui reprend la place) ou None"""
+        host = self.host(url)
+        waiting = self._waiting.get(host)
+        if waiting:
+            self.deferred -= 1
+            if len(waiting) == 1:
+                del self._waiting[host]
+            return waiting.popleft()
+        if self._running[host] == 1:
+            del self._running[host]
+        else:
+            self._running[host] -= 1
+        return None
+
+
+class BatchScanner:
+    """Orchestre des scans WebScanner concurrents avec limites par hôte"""
+
+    ENGINES = ("thread", "asyncio")
+
+    def __init__(self, workers=16, max_in_flight=None, per_host=2,
+                 engine="thread", verbose=False, combined=False, scanner_factory=None,
+                 scanner_options=None, deadlines=None, cpu_stage=None, reports_dir=None,
+                 max_deferred=DEFAULT_MAX_DEFERRED):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Moteur inconnu : {engine}")
+        self.workers = max(1, workers)
+        # Plafond global de scans en cours (soumis mais non terminés)
+        self.max_in_flight = max(self.workers, max_in_flight or self.workers * 2)
+        self.per_host = max(1, per_host)
+        # URLs d'hôtes au plafond gardées en attente avant de suspendre la lecture
+        self.max_deferred = max(1, max_deferred)
+        self.engine = engine
+        self.verbose = verbose
+        # Options transmises à chaque WebScanner (cache WHOIS, délais...)
+        self.scanner_options = scanner_options or {}
+        self.combined = combined
+        self.deadlines = deadlines or DEFAULT_DEADLINES
+        # Pool de processus pour le parsing et l'analyse malware (--combined)
+        self.cpu_stage = cpu_stage
+        # Rapports texte par site (désactivés par défaut : un fichier par site)
+        self.reports_dir = reports_dir
+        if reports_dir:
+            os.makedirs(reports_dir, exist_ok=True)
+        # Moteur asyncio natif sauf si une fabrique de scanners synchrones est imposée
+        self.native_async = scanner_factory is None
+        self.async_engine = None
+        if scanner_factory is None:
+            if combined:
+                scanner_factory = lambda url: CombinedScanner(url, quiet=True, cpu_stage=self.cpu_stage,
+                                                              **self.scanner_options)
+            else:
+                scanner_factory = lambda url: WebScanner(url, quiet=True, **self.scanner_options)
+        self.scanner_factory = scanner_factory
+        self.stats = {"submitted": 0, "completed": 0, "errors": 0, "deferred": 0}
+
+    @staticmethod
+    def error_result(url, error):
+        return {
+            "url": url,
+            "domain": urlparse(url).netloc,
+            "scan_date": datetime.now().isoformat(),
+            "error": str(error) or type(error).__name__
+        }
+
+    def scan_one(self, url):
+        """Scanne un site ; les erreurs sont retournées dans le résultat
+        (limite par hôte appliquée avant l'appel, voir HostGate)"""
+        try:
+            return self.scanner_factory(url).run()
+        except Exception as e:
+            return self.error_result(url, e)
+
+    def scan(self, urls):
+        """Générateur de résultats, dans l'ordre de fin des scans"""
+        if self.engine == "asyncio":
+            return self._scan_asyncio(urls)
+        return self._scan_threads(urls)
+
+    def _admit(self, gate, url) -> bool:
+        self.stats["submitted"] += 1
+        if gate.admit(url):
+            return True
+        self.stats["deferred"] += 1
+        return False
+
+    def _scan_threads(self, urls):
+        gate = HostGate(self.per_host)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {}   # future → URL
+
+            def finish(done):
+                for future in done:
+                    url = pending.pop(future)
+                    following = gate.release(url)
+                    if following is not None:
+                        pending[executor.submit(self.scan_one, following)] = following
+                    yield self._account(future.result())
+
+            for url in urls:
+                # Contre-pression : au plus max_in_flight scans soumis et
+                # max_deferred URLs en attente de leur hôte
+                while len(pending) >= self.max_in_flight or gate.deferred >= self.max_deferred:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from finish(done)
+                if self._admit(gate, url):
+                    pending[executor.submit(self.scan_one, url)] = url
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finish(done)
+
+    def _scan_asyncio(self, urls):
+        """Boucle asyncio : scanners en coroutines (natif) ou pool de threads"""
+        loop = asyncio.new_event_loop()
+        queue = deque()
+
+        async def produce():
+            executor = None if self.native_async else ThreadPoolExecutor(max_workers=self.workers)
+            engine = None
+            if self.native_async:
+                # Natif : workers = threads WHOIS, max_in_flight = scans simultanés
+                engine = AsyncScanEngine(
+                    concurrency=self.max_in_flight, per_host=self.per_host, combined=self.combined,
+                    deadlines=self.deadlines, whois_workers=self.workers,
+                    scanner_options=self.scanner_options, cpu_stage=self.cpu_stage
+                )
+                self.async_engine = engine
+            in_flight = asyncio.Semaphore(self.max_in_flight)
+            gate = HostGate(self.per_host)
+            tasks = set()
+
+            async def worker(url):
+                # Toute tâche produit un résultat, même si le scan lève une exception
+                try:
+                    if self.native_async:
+                        return await engine.scan_one(url)
+                    return await loop.run_in_executor(executor, self.scan_one, url)
+                except Exception as e:
+                    return self.error_result(url, e)
+
+            def start(url):
+                task = loop.create_task(worker(url))
+                task.add_done_callback(lambda t: finished(url, t))
+                tasks.add(task)
+
+            def finished(url, task):
+                tasks.discard(task)
+                if task.cancelled():
+                    return
+                queue.append(task.result())
+                following = gate.release(url)
+                if following is not None:
+                    start(following)   # la place de l'hôte passe à l'URL suivante
+                else:
+                    in_flight.release()
+
+            if self.native_async:
+                await engine.__aenter__()
+            try:
+                for url in urls:
+                    while gate.deferred >= self.max_deferred:
+                        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    if self._admit(gate, url):
+                        await in_flight.acquire()
+                        start(url)
+                    while queue:
+                        yield queue.popleft()
+                while tasks:
+                    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    while queue:
+                        yield queue.popleft()
+                while queue:
+                    yield queue.popleft()
+            finally:
+                if self.native_async:
+                    await engine.__aexit__(None, None, None)
+                else:
+                    executor.shutdown(wait=True)
+
+        agen = produce()
+        try:
+            while True:
+                try:
+                    result = loop.run_until_complete(agen.__anext__())
+                except StopAsyncIteration:
+                    break
+                yield self._account(result)
+        finally:
+            loop.run_until_complete(agen.aclose())
+            loop.close()
+
+    def _account(self, result):
+        self.stats["completed"] += 1
+        if "error" in result:
+            self.stats["errors"] += 1
+        return result
+
+    def write_report(self, result):
+        """Rapport texte d'un site dans reports_dir"""
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', result.get("domain") or "site")[:100]
+        path = os.path.join(self.reports_dir, f"{name}_{self.stats['completed']}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(WebScanner.format_report(result))
+
+    def run(self, urls, output):
+        """Scanne toutes les URLs ; output : ResultSink ou flux texte (une ligne NDJSON par site)"""
+        sink = output if isinstance(output, ResultSink) else NDJSONSink(output, batch_size=1)
+        for result in self.scan(urls):
+            sink.write(result)
+            if self.reports_dir and "analysis" in result:
+                self.write_report(result)
+            if self.verbose:
+                level = result.get("analysis", {}).get("risk_level", "ERROR")
+                print(f"[INFO] {result['url']} → {level}", file=sys.stderr)
+        return self.stats
+
+
+def add_batch_arguments(parser):
+    """Options du mode batch, partagées avec web_scanner.py"""
+    parser.add_argument("-i", "--input",
+                        help="Fichier d'URLs (une par ligne, '-' pour stdin)")
+    parser.add_argument("--ndjson", default="-",
+                        help="Fichier NDJSON de sortie (défaut : stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=16,
+                        help="Taille du pool de scan (défaut : 16)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Plafond global de scans en cours (défaut : 2 × workers)")
+    parser.add_argument("--per-host", type=int, default=2,
+                        help="Scans simultanés maximum par hôte (défaut : 2)")
+    parser.add_argument("--engine", choices=BatchScanner.ENGINES, default="thread",
+                        help="Pool de threads ou scanners asyncio natifs (défaut : thread)")
+    parser.add_argument("--deadlines", type=parse_deadlines, default=DEFAULT_DEADLINES,
+                        help="Délais par phase en mode asyncio, ex. http=10,tls=5,whois=15")
+    parser.add_argument("--combined", action="store_true",
+                        help="Ajoute l'analyse malware (même téléchargement, même parsing)")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="Connexions keep-alive par hôte (défaut : max(10, per-host))")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"Tentatives HTTP avec backoff (défaut : {DEFAULT_RETRIES})")
+    parser.add_argument("--reports", metavar="DOSSIER",
+                        help="Écrit aussi le rapport texte de chaque site (désactivé par défaut)")
+    add_script_cache_arguments(parser)
+    add_external_script_arguments(parser)
+    add_cpu_arguments(parser)
+
+
+def run_batch(args):
+    """Point d'entrée du mode batch à partir des arguments CLI"""
+    configure_session(
+        pool_connections=max(100, args.workers),
+        pool_maxsize=args.pool_size or max(10, args.per_host),
+        retries=args.retries
+    )
+    options = {**whois_options(args), **state_options(args), **metrics_options(args)}
+    if options["profiler"] is not None and args.engine == "asyncio":
+        # Les scans s'entrelacent sur la boucle : pas de profil par scan
+        print("⚠️  --profile-dir/--trace-memory ignorés avec --engine asyncio", file=sys.stderr)
+    script_cache = configure_from_args(args)
+    cpu_stage = cpu_stage_from_args(args) if args.combined else None
+    external_scripts = None
+    if args.external_scripts and (args.engine == "asyncio" or cpu_stage is not None):
+        # Téléchargements bloquants : ni sur la boucle, ni dans le pool de processus
+        print("⚠️  --external-scripts ignoré avec --engine asyncio / --cpu-workers", file=sys.stderr)
+    else:
+        external_scripts = configure_external_from_args(args)
+    scanner = BatchScanner(
+        workers=args.workers,
+        max_in_flight=args.max_in_flight,
+        per_host=args.per_host,
+        engine=args.engine,
+        verbose=args.verbose,
+        combined=args.combined,
+        scanner_options=options,
+        deadlines=args.deadlines,
+        cpu_stage=cpu_stage,
+        reports_dir=args.reports
+    )
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    # --sink remplace la sortie --ndjson ; écritures groupées (ligne à ligne sur stdout)
+    sink = sink_from_args(args) or NDJSONSink(
+        args.ndjson, args.sink_batch or (1 if args.ndjson == "-" else DEFAULT_BATCH))
+    try:
+        stats = scanner.run(read_urls(source), sink)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        sink.close()
+        if cpu_stage is not None:
+            cpu_stage.close()
+
+    print(f"✓ {stats['completed']} sites scannés ({stats['errors']} erreurs)", file=sys.stderr)
+    if scanner.async_engine is not None:
+        reuse = scanner.async_engine.client.snapshot()
+    else:
+        reuse = connection_stats()
+    print(f"✓ Connexions HTTP : {reuse['requests']} requêtes, "
+          f"{reuse['reused_connections']} réutilisées ({reuse['reuse_ratio']:.0%})", file=sys.stderr)
+    tls = default_store().snapshot()
+    print(f"✓ TLS : {tls['handshakes']} poignées de main, {tls['certificate_changes']} certificats changés, "
+          f"{tls['decodes']} certificats décodés", file=sys.stderr)
+    if cpu_stage is not None:
+        cpu = cpu_stage.snapshot()
+        print(f"✓ Étage CPU : {cpu['completed']} pages sur {cpu_stage.workers} processus, "
+              f"{cpu['waits']} attentes (pool saturé)", file=sys.stderr)
+        print(f"✓ Verdicts de scripts : {cpu['script_hits']} réutilisés, "
+              f"{cpu['script_misses']} calculés ({cpu['script_hit_rate']:.0%})", file=sys.stderr)
+    elif args.combined:
+        scripts = script_cache.snapshot()
+        print(f"✓ Verdicts de scripts : {scripts['hits'] + scripts['persistent_hits']} réutilisés, "
+              f"{scripts['misses']} calculés ({scripts['hit_rate']:.0%})", file=sys.stderr)
+    script_cache.close()
+    if external_scripts is not None:
+        external = external_scripts.snapshot()
+        print(f"✓ Scripts externes : {external['downloads']} téléchargés, {external['reused']} repris "
+              f"du cache, {external['errors']} échecs ({external['content_mb']} Mo en cache)", file=sys.stderr)
+        external_scripts.close()
+    whois_cache = options["whois_cache"]
+    if whois_cache is not None:
+        cache = whois_cache.snapshot()
+        print(f"✓ Cache WHOIS : {cache['hits']} hits, {cache['negative_hits']} échecs en cache, "
+              f"{cache['misses']} requêtes ({cache['hit_rate']:.0%})", file=sys.stderr)
+        whois_cache.close()
+    state_store = options["state_store"]
+    if state_store is not None:
+        state = state_store.snapshot()
+        print(f"✓ Rescan incrémental : {state['not_modified']} non modifiés (304), "
+              f"{state['unchanged']} inchangés, {state['changed']} modifiés, {state['new']} nouveaux",
+              file=sys.stderr)
+        state_store.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scan par lots de sites web - sortie NDJSON"
+    )
+    add_batch_arguments(parser)
+    add_whois_arguments(parser)
+    add_state_arguments(parser)
+    add_metrics_arguments(parser)
+    add_download_arguments(parser)
+    add_rules_arguments(parser)
+    add_sink_arguments(parser)
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mode verbeux")
+    args = parser.parse_args()
+    if args.input is None:
+        args.input = "-"
+    configure_download_from_args(args)
+    configure_rules_from_args(args)
+
+    try:
+        run_batch(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Scan interrompu par l'utilisateur", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Banc de performance hors ligne des scanners
+Démarre un serveur HTTP et un serveur HTTPS locaux (certificat auto-signé
+généré au lancement) qui servent les pages html de data.json /
+data_stream.json avec une latence réglable, ainsi qu'un répondeur WHOIS
+factice. Mesure WebScanner.run, MalwareScanner.scan et le moteur asyncio
+à plusieurs niveaux de concurrence : sites/s, latence p50/p99 et RSS
+crête (chaque mesure dans un processus neuf). Aucun accès réseau externe.
+"""
+
+import os
+import ssl
+import sys
+import json
+import time
+import zlib
+import asyncio
+import hashlib
+import argparse
+import datetime
+import resource
+import tempfile
+import ipaddress
+import threading
+import subprocess
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+
+from stream_reader import iter_records
+from offline_scanner import http_from_record
+
+
+SCANNERS = ("web", "malware", "async")
+DEFAULT_LEVELS = "1,8,32"
+DEFAULT_FILES = ["data.json", "data_stream.json"]
+LISTEN_BACKLOG = 1024
+
+
+# ========== SERVEURS LOCAUX ==========
+
+def load_payloads(paths):
+    """Pages servies : html et en-têtes de chaque enregistrement archivé"""
+    payloads = []
+    for path in paths:
+        for record in iter_records(path):
+            html = record.get("html")
+            if not html:
+                continue
+            body = html.encode("utf-8")
+            headers = http_from_record(record, len(body))["headers"]
+            headers["Content-Type"] = "text/html; charset=utf-8"
+            payloads.append((body, headers))
+    if not payloads:
+        raise ValueError("Aucune page html dans les jeux de données")
+    return payloads
+
+
+def _delay(key, latency_ms, jitter_ms):
+    """Latence déterministe par chemin : mêmes délais d'une exécution à l'autre"""
+    jitter = zlib.crc32(key.encode()) % (jitter_ms + 1) if jitter_ms else 0
+    return (latency_ms + jitter) / 1000
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """GET /site/<n> : page n (modulo le nombre de pages), après la latence configurée"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(_delay(self.path, server.latency_ms, server.jitter_ms))
+        parts = self.path.split('/')
+        if len(parts) < 3 or parts[1] != "site" or not parts[2].isdigit():
+            self.send_error(404)
+            return
+        body, headers = server.payloads[int(parts[2]) % len(server.payloads)]
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PageServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, payloads, latency_ms, jitter_ms, context=None):
+        super().__init__(("127.0.0.1", 0), PageHandler)
+        self.payloads = payloads
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        if context is not None:
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+
+
+class WhoisHandler(socketserver.StreamRequestHandler):
+    """Répondeur WHOIS (RFC 3912) : une date de création stable par domaine"""
+
+    def handle(self):
+        domain = self.rfile.readline(512).decode("ascii", errors="replace").strip()
+        time.sleep(_delay(domain, self.server.latency_ms, 0))
+        # Âge entre 10 jours et ~14 ans, dérivé du nom : les domaines récents
+        # déclenchent l'analyse d'âge
+        age = 10 + int(hashlib.sha1(domain.encode()).hexdigest(), 16) % 5000
+        now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0, tzinfo=None)
+        created = now - datetime.timedelta(days=age)
+        expires = now + datetime.timedelta(days=365)
+        self.wfile.write(
+            f"Domain Name: {domain.upper()}\r\n"
+            f"Registrar: Bench Registrar\r\n"
+            f"Creation Date: {created.isoformat()}Z\r\n"
+            f"Registry Expiry Date: {expires.isoformat()}Z\r\n"
+            f"Updated Date: {now.isoformat()}Z\r\n"
+            f"Name Server: NS1.BENCH.INVALID\r\n"
+            f"Domain Status: ok\r\n".encode()
+        )
+
+
+class WhoisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, latency_ms):
+        super().__init__(("127.0.0.1", 0), WhoisHandler)
+        self.latency_ms = latency_ms
+
+
+def make_certificate(directory):
+    """Certificat auto-signé localhost / 127.0.0.1 (cryptography, dépendance de pyOpenSSL)"""
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost"),
+                      x509.NameAttribute(NameOID.ORGANIZATION_NAME, "Scanner Bench")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=90))
+        .add_extension(x509.SubjectAlternativeName([
+            x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))
+        ]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "bench-cert.pem")
+    key_path = os.path.join(directory, "bench-key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class BenchEnvironment:
+    """Serveurs HTTP, HTTPS et WHOIS locaux, dans des threads du processus parent"""
+
+    def __init__(self, payloads, latency_ms=50, jitter_ms=20, whois_latency_ms=30):
+        self.payloads = payloads
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.whois_latency_ms = whois_latency_ms
+        self._tmp = None
+        self._servers = []
+
+    def __enter__(self):
+        self._tmp = tempfile.TemporaryDirectory(prefix="scanner-bench-")
+        self.cafile, key = make_certificate(self._tmp.name)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.cafile, key)
+
+        self.http = PageServer(self.payloads, self.latency_ms, self.jitter_ms)
+        self.https = PageServer(self.payloads, self.latency_ms, self.jitter_ms, context)
+        self.whois = WhoisServer(self.whois_latency_ms)
+        self._servers = [self.http, self.https, self.whois]
+        for server in self._servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._tmp.cleanup()
+
+    @property
+    def whois_server(self):
+        return f"127.0.0.1:{self.whois.server_address[1]}"
+
+    def urls(self, count):
+        """Alternance HTTP (127.0.0.1) / HTTPS (localhost, certificat vérifié)"""
+        http_port = self.http.server_address[1]
+        https_port = self.https.server_address[1]
+        return [f"http://127.0.0.1:{http_port}/site/{i}" if i % 2 == 0
+                else f"https://localhost:{https_port}/site/{i}"
+                for i in range(count)]
+
+
+# ========== MESURE (processus enfant) ==========
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _failed(result):
+    collection = result.get("collection", {})
+    return "error" in result or "http_error" in collection or "whois_error" in collection \
+        or "tls_error" in collection
+
+
+def _bench_child(spec):
+    """Scans mesurés dans un processus neuf : débit, latences, RSS crête"""
+    from http_session import configure_session
+    from tls_cache import configure_tls_context
+    from web_scanner import WebScanner
+    from malware_scanner import MalwareScanner
+
+    # requests privilégie REQUESTS_CA_BUNDLE / CURL_CA_BUNDLE à session.verify
+    os.environ["REQUESTS_CA_BUNDLE"] = spec["cafile"]
+    os.environ.pop("CURL_CA_BUNDLE", None)
+    configure_tls_context(spec["cafile"])
+    configure_session(pool_maxsize=max(10, spec["concurrency"]), retries=0, verify=spec["cafile"])
+    urls, web_options = spec["urls"], {"whois_server": spec["whois_server"]}
+
+    def timed(scan):
+        def run(url):
+            start = time.perf_counter()
+            result = scan(url)
+            return time.perf_counter() - start, _failed(result)
+        return run
+
+    if spec["scanner"] == "async":
+        samples, elapsed = _bench_async(spec, web_options)
+    else:
+        if spec["scanner"] == "web":
+            scan = timed(lambda url: WebScanner(url, quiet=True, **web_options).run())
+        else:
+            scan = timed(lambda url: MalwareScanner(url).scan(verbose=False))
+        scan(urls[0])  # préchauffage : imports, compilation des patterns
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=spec["concurrency"]) as executor:
+            samples = list(executor.map(scan, urls))
+        elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in samples]
+    print(json.dumps({
+        "scanner": spec["scanner"],
+        "concurrency": spec["concurrency"],
+        "sites": len(urls),
+        "errors": sum(failed for _, failed in samples),
+        "sites_per_sec": round(len(urls) / elapsed, 2),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        # ru_maxrss : Ko sous Linux, octets sous macOS
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    }))
+
+
+def _bench_async(spec, web_options):
+    from async_scanner import AsyncScanEngine
+
+    async def run():
+        # Latence mesurée une fois la place obtenue, comme pour le pool de threads
+        slots = asyncio.Semaphore(spec["concurrency"])
+        async with AsyncScanEngine(concurrency=spec["concurrency"], per_host=spec["concurrency"],
+                                   scanner_options=web_options) as engine:
+            async def scan(url):
+                async with slots:
+                    start = time.perf_counter()
+                    result = await engine.scan_one(url)
+                    return time.perf_counter() - start, _failed(result)
+
+            await scan(spec["urls"][0])
+            start = time.perf_counter()
+            samples = await asyncio.gather(*(scan(url) for url in spec["urls"]))
+            return samples, time.perf_counter() - start
+
+    return asyncio.run(run())
+
+
+# ========== ORCHESTRATION ==========
+
+def benchmark(args):
+    payloads = load_payloads(args.files)
+    levels = [int(level) for level in args.levels.split(",")]
+    rows = []
+    with BenchEnvironment(payloads, args.latency, args.jitter, args.whois_latency) as env:
+        print(f"🧪 {len(payloads)} pages servies, latence {args.latency} ms (+0..{args.jitter} ms), "
+              f"WHOIS {args.whois_latency} ms", file=sys.stderr)
+        print(f"{'scanner':<9} {'conc.':>6} {'sites':>6} {'sites/s':>9} {'p50 ms':>9} "
+              f"{'p99 ms':>9} {'RSS crête':>10} {'erreurs':>8}")
+        for scanner in args.scanners.split(","):
+            for level in levels:
+                spec = {"scanner": scanner, "concurrency": level, "urls": env.urls(args.sites),
+                        "cafile": env.cafile, "whois_server": env.whois_server}
+                # Spécification sur stdin : la liste d'URLs dépasserait la taille d'un argument
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--bench-child"],
+                    input=json.dumps(spec), capture_output=True, text=True, check=True
+                ).stdout
+                r = json.loads(out.strip().splitlines()[-1])
+                rows.append(r)
+                print(f"{r['scanner']:<9} {r['concurrency']:>6} {r['sites']:>6} "
+                      f"{r['sites_per_sec']:>9.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+                      f"{r['peak_rss_mb']:>8.1f}MB {r['errors']:>8}", flush=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parameters": {"latency_ms": args.latency, "jitter_ms": args.jitter,
+                                      "whois_latency_ms": args.whois_latency, "sites": args.sites,
+                                      "pages": len(payloads)},
+                       "results": rows}, f, indent=2)
+        print(f"💾 Résultats JSON : {args.json}", file=sys.stderr)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de performance hors ligne des scanners")
+    parser.add_argument("files", nargs="*", default=DEFAULT_FILES,
+                        help="Jeux de données dont les pages html sont servies (défaut : data.json data_stream.json)")
+    parser.add_argument("--scanners", default="web,malware",
+                        help=f"Scanners mesurés parmi {', '.join(SCANNERS)} (défaut : web,malware)")
+    parser.add_argument("--levels", default=DEFAULT_LEVELS,
+                        help=f"Niveaux de concurrence (défaut : {DEFAULT_LEVELS})")
+    parser.add_argument("--sites", type=int, default=200, help="Sites par mesure (défaut : 200)")
+    parser.add_argument("--latency", type=int, default=50, help="Latence des pages en ms (défaut : 50)")
+    parser.add_argument("--jitter", type=int, default=20, help="Variation de latence en ms (défaut : 20)")
+    parser.add_argument("--whois-latency", type=int, default=30,
+                        help="Latence du répondeur WHOIS en ms (défaut : 30)")
+    parser.add_argument("--json", metavar="FICHIER", help="Écrit aussi les résultats en JSON")
+    parser.add_argument("--bench-child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.bench_child:
+        _bench_child(json.load(sys.stdin))
+        return
+    unknown = set(args.scanners.split(",")) - set(SCANNERS)
+    if unknown:
+        parser.error(f"scanner inconnu : {', '.join(sorted(unknown))}")
+    benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
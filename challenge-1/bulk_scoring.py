@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Score de risque par lots (NumPy)
+Un lot de résultats devient des tableaux : anomalies et menaces comptées
+par sévérité, caractéristiques numériques à plat (TLS_expiry_days,
+Domain_age_days, Blacklist_hits, Security_headers_count, Nb_ports_open).
+Scores et niveaux sont calculés pour tout le lot en opérations vectorisées,
+avec les poids, seuils et règles de WebScanner.score_anomalies et
+MalwareScanner.risk_level_for : rescorer un historique après réglage des
+poids ne reboucle plus site par site.
+"""
+
+import sys
+import time
+import argparse
+from collections.abc import Mapping
+
+import numpy as np
+
+from web_scanner import WebScanner
+from malware_scanner import MalwareScanner
+from offline_scanner import HTTP_SEC_HEADERS, numeric_value
+from stream_reader import iter_records
+from compact_results import compact_results
+
+
+SEVERITIES = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+_SEVERITY_INDEX = {severity: i for i, severity in enumerate(SEVERITIES)}
+# Dernière colonne des effectifs : sévérités inconnues (comptées, poids nul)
+OTHER = len(SEVERITIES)
+
+FEATURES = ("TLS_expiry_days", "Domain_age_days", "Blacklist_hits",
+            "Security_headers_count", "Nb_ports_open")
+
+
+def severity_counts(groups) -> np.ndarray:
+    """(n, 5) : effectifs par sévérité de chaque liste d'anomalies / menaces"""
+    lengths = np.fromiter((len(group) for group in groups), dtype=np.int64, count=len(groups))
+    codes = np.fromiter((_SEVERITY_INDEX.get(item["severity"], OTHER) for group in groups for item in group),
+                        dtype=np.int64, count=int(lengths.sum()))
+    rows = np.repeat(np.arange(len(groups)), lengths)
+    width = OTHER + 1
+    return np.bincount(rows * width + codes, minlength=len(groups) * width).reshape(len(groups), width)
+
+
+def _malware_threats(result):
+    """Menaces d'un résultat MalwareScanner (racine) ou combiné (bloc malware)"""
+    if "threats_found" in result:
+        return result["threats_found"]
+    malware = result.get("malware")
+    if isinstance(malware, Mapping) and "threats_found" in malware:
+        return malware["threats_found"]
+    return None
+
+
+def result_features(result) -> tuple:
+    """Caractéristiques disponibles dans un résultat de scan (None sinon)"""
+    collection = result.get("collection") or {}
+    tls = collection.get("tls") or {}
+    whois_data = collection.get("whois") or {}
+    headers = (collection.get("http") or {}).get("headers")
+    security_headers = None
+    if headers is not None:
+        # Même test que analyze_security_headers
+        security_headers = sum(header in headers for header in HTTP_SEC_HEADERS.values())
+    return (tls.get("days_until_expiry"), whois_data.get("age_days"), None, security_headers, None)
+
+
+def record_features(record) -> tuple:
+    """Caractéristiques à plat d'un enregistrement archivé (data.json)"""
+    return tuple(numeric_value(record.get(name)) for name in FEATURES)
+
+
+class ScoreBatch:
+    """Lot de résultats sous forme de tableaux, une ligne par site"""
+
+    def __init__(self, urls, anomaly_counts, threat_counts, has_malware, features):
+        self.urls = urls
+        self.anomaly_counts = anomaly_counts    # (n, 5) anomalies WebScanner
+        self.threat_counts = threat_counts      # (n, 5) menaces MalwareScanner
+        self.has_malware = has_malware          # (n,) résultat malware présent
+        self.features = features                # (n, len(FEATURES)), NaN si absent
+
+    @classmethod
+    def from_results(cls, results, records=None):
+        """Conversion d'un lot ; records (url → enregistrement archivé) complète
+        les caractéristiques que le scan ne collecte pas"""
+        results = list(results)
+        threats = [_malware_threats(result) for result in results]
+        features = np.array([result_features(result) for result in results], dtype=np.float64)
+        if records:
+            archived = np.array([record_features(records[result.get("url")])
+                                 if result.get("url") in records else (None,) * len(FEATURES)
+                                 for result in results], dtype=np.float64)
+            features = np.where(np.isnan(archived), features, archived)
+        return cls(
+            urls=[result.get("url") for result in results],
+            anomaly_counts=severity_counts([result.get("anomalies") or [] for result in results]),
+            threat_counts=severity_counts([group or [] for group in threats]),
+            has_malware=np.fromiter((group is not None for group in threats), dtype=bool, count=len(results)),
+            features=features.reshape(len(results), len(FEATURES))
+        )
+
+    def __len__(self):
+        return len(self.urls)
+
+    def feature(self, name) -> np.ndarray:
+        return self.features[:, FEATURES.index(name)]
+
+    @property
+    def anomalies_count(self) -> np.ndarray:
+        return self.anomaly_counts.sum(axis=1)
+
+    def web_scores(self, weights=None) -> np.ndarray:
+        """Score WebScanner de chaque site (poids par sévérité)"""
+        weights = weights or WebScanner.SEVERITY_WEIGHTS
+        vector = np.array([weights.get(severity, 0) for severity in SEVERITIES] + [0])
+        return self.anomaly_counts @ vector
+
+    def web_levels(self, scores, thresholds=None) -> np.ndarray:
+        """Niveau de risque de chaque score (seuils ((100, "CRITICAL"), ...))"""
+        ordered = sorted(thresholds or WebScanner.RISK_THRESHOLDS)
+        names = np.array(["LOW"] + [level for _, level in ordered])
+        return names[np.searchsorted([threshold for threshold, _ in ordered], scores, side="right")]
+
+    def malware_levels(self) -> np.ndarray:
+        """Niveau MalwareScanner de chaque site ('' sans résultat malware)"""
+        high = self.threat_counts[:, _SEVERITY_INDEX["HIGH"]]
+        medium = self.threat_counts[:, _SEVERITY_INDEX["MEDIUM"]]
+        levels = np.select(
+            [(high >= 3) | ((high >= 1) & (medium >= 3)), (high >= 1) | (medium >= 3), medium >= 1],
+            ["CRITICAL", "HIGH", "MEDIUM"],
+            default="LOW"
+        )
+        return np.where(self.has_malware, levels, "")
+
+    def score(self, weights=None, thresholds=None) -> dict:
+        scores = self.web_scores(weights)
+        return {
+            "risk_score": scores,
+            "risk_level": self.web_levels(scores, thresholds),
+            "anomalies_count": self.anomalies_count,
+            "malware_risk_level": self.malware_levels()
+        }
+
+
+def check_identity(results, scored) -> int:
+    """Écarts entre le calcul vectorisé (poids par défaut) et les fonctions scalaires"""
+    mismatches = 0
+    for i, result in enumerate(results):
+        score, level = WebScanner.score_anomalies(result.get("anomalies") or [])
+        expected = [score, level, len(result.get("anomalies") or [])]
+        actual = [scored["risk_score"][i], scored["risk_level"][i], scored["anomalies_count"][i]]
+        threats = _malware_threats(result)
+        expected.append(MalwareScanner.risk_level_for(threats) if threats is not None else "")
+        actual.append(scored["malware_risk_level"][i])
+        if expected != actual:
+            mismatches += 1
+    return mismatches
+
+
+def parse_levels(text, cast) -> dict:
+    """'CRITICAL=100,HIGH=40' → {"CRITICAL": 100, "HIGH": 40}"""
+    values = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, value = item.partition('=')
+        if name not in SEVERITIES:
+            raise argparse.ArgumentTypeError(f"Sévérité inconnue : {name}")
+        values[name] = cast(value)
+    return values
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score de risque vectorisé d'un lot de résultats")
+    parser.add_argument("results", help="Résultats de scan (NDJSON ou tableau JSON, .gz accepté)")
+    parser.add_argument("--records", action="append", default=[],
+                        help="Enregistrements archivés (data.json) complétant les caractéristiques, "
+                             "joints par URL ; répétable")
+    parser.add_argument("--weights", type=lambda text: parse_levels(text, _number),
+                        help="Poids des sévérités, ex. CRITICAL=100,HIGH=40 (les autres inchangés)")
+    parser.add_argument("--thresholds", type=lambda text: parse_levels(text, _number),
+                        help="Seuils des niveaux, ex. CRITICAL=120,HIGH=60,MEDIUM=20")
+    parser.add_argument("--check", action="store_true",
+                        help="Vérifie l'identité avec les fonctions scalaires (poids par défaut)")
+    args = parser.parse_args()
+
+    # Enregistrements compacts : un lot de 100 000 résultats tient en mémoire
+    results = list(compact_results(iter_records(args.results)))
+    records = {record["url"]: record for path in args.records for record in iter_records(path)
+               if record.get("url")}
+    start = time.perf_counter()
+    batch = ScoreBatch.from_results(results, records)
+    converted = time.perf_counter()
+
+    weights = {**WebScanner.SEVERITY_WEIGHTS, **(args.weights or {})}
+    thresholds = {level: threshold for threshold, level in WebScanner.RISK_THRESHOLDS}
+    thresholds.update(args.thresholds or {})
+    scored = batch.score(weights, [(threshold, level) for level, threshold in thresholds.items()])
+    elapsed = time.perf_counter() - converted
+    print(f"📋 {len(batch)} résultats : conversion {(converted - start) * 1000:.1f} ms, "
+          f"score vectorisé {elapsed * 1000:.2f} ms")
+
+    previous = np.array([(result.get("analysis") or {}).get("risk_level") or "" for result in results])
+    changed = int(np.count_nonzero(previous != scored["risk_level"]))
+    print(f"\n{'niveau':<10} {'avant':>8} {'après':>8}")
+    for level in ("CRITICAL", "HIGH", "MEDIUM", "LOW"):
+        print(f"{level:<10} {int(np.count_nonzero(previous == level)):>8} "
+              f"{int(np.count_nonzero(scored['risk_level'] == level)):>8}")
+    print(f"✓ {changed} sites changent de niveau")
+
+    print(f"\n{'caractéristique':<24} {'sites':>6} " + " ".join(f"{level:>9}" for level in SEVERITIES))
+    for name in FEATURES:
+        column = batch.feature(name)
+        known = ~np.isnan(column)
+        means = []
+        for level in SEVERITIES:
+            mask = known & (scored["risk_level"] == level)
+            means.append(f"{column[mask].mean():>9.1f}" if mask.any() else f"{'-':>9}")
+        print(f"{name:<24} {int(known.sum()):>6} " + " ".join(means))
+
+    if args.check:
+        mismatches = check_identity(results, batch.score())
+        if mismatches:
+            print(f"\n❌ {mismatches} écarts avec les fonctions scalaires")
+            sys.exit(1)
+        print(f"\n✓ Identique aux fonctions scalaires sur {len(batch)} résultats")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
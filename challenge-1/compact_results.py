@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Résultats compacts en mémoire
+Un résultat de scan est un arbre de dicts et de listes : garder des
+centaines de milliers de résultats en mémoire (score par lots, réévaluation
+des règles) coûte des Go. Les résultats deviennent des enregistrements à
+__slots__ :
+  - dicts : forme partagée (tuple de clés) + tuple de valeurs
+  - anomalies et menaces : Finding, sévérité et type internés
+  - extraits context / sample : positions dans un ContentStore partagé, le
+    début d'un script n'est stocké qu'une fois pour tous les résultats
+  - chaînes courtes (niveaux, types, en-têtes, libellés) internées
+Les enregistrements se lisent comme les dicts d'origine (result["collection"],
+.get, in) et to_dict() restitue le résultat, même JSON.
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+import tracemalloc
+from collections.abc import Mapping
+
+from stream_reader import iter_records
+
+
+INTERN_MAX = 64            # chaînes internées jusqu'à cette longueur
+SNIPPET_MAX = 0xFFFF       # extraits plus longs conservés tels quels
+STORE_PREFIX = 64          # caractères qui regroupent les extraits d'un même script
+
+_shapes = {}               # tuple de clés → tuple partagé
+
+
+def _shape(data) -> tuple:
+    keys = tuple(data)
+    shape = _shapes.get(keys)
+    if shape is None:
+        shape = tuple(sys.intern(key) for key in keys)
+        shape = _shapes.setdefault(shape, shape)
+    return shape
+
+
+# ========== STOCKAGE PARTAGÉ DES EXTRAITS ==========
+
+class ContentStore:
+    """Débuts de scripts partagés entre résultats ; un extrait est un entier
+    (entrée << 16 | longueur) : context (200 car.) et sample (100 car.) d'un
+    même script pointent vers une seule chaîne"""
+
+    def __init__(self):
+        self._texts = []       # entrée → plus long extrait vu
+        self._index = {}       # hash du préfixe → entrées
+        self._lock = threading.Lock()
+
+    def ref(self, text: str) -> int:
+        with self._lock:
+            entries = self._index.setdefault(hash(text[:STORE_PREFIX]), [])
+            for entry in entries:
+                stored = self._texts[entry]
+                if stored.startswith(text):
+                    return entry << 16 | len(text)
+                if text.startswith(stored):
+                    self._texts[entry] = text
+                    return entry << 16 | len(text)
+            entries.append(len(self._texts))
+            self._texts.append(text)
+            return (len(self._texts) - 1) << 16 | len(text)
+
+    def text(self, ref: int) -> str:
+        return self._texts[ref >> 16][:ref & 0xFFFF]
+
+    def __len__(self):
+        return len(self._texts)
+
+
+_default_store = ContentStore()
+
+
+def default_content_store() -> ContentStore:
+    return _default_store
+
+
+# ========== ENREGISTREMENTS ==========
+
+class Items(tuple):
+    """Liste figée ; égale à la liste d'origine"""
+
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+
+class Record(Mapping):
+    """Dict figé : forme partagée et tuple de valeurs"""
+
+    __slots__ = ("_shape", "_values")
+
+    @classmethod
+    def from_dict(cls, data, store):
+        record = cls.__new__(cls)
+        record._shape = _shape(data)
+        record._values = tuple(_pack(value, store, key) for key, value in data.items())
+        return record
+
+    def __getitem__(self, key):
+        try:
+            return self._values[self._shape.index(key)]
+        except ValueError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return iter(self._shape)
+
+    def __len__(self):
+        return len(self._shape)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        return {key: _unpack(self[key]) for key in self._shape}
+
+
+class SlotRecord(Record):
+    """Enregistrement à champs fixes (FIELDS) ; _shape garde les clés
+    présentes et leur ordre, les champs absents valent None"""
+
+    __slots__ = ("_store",)
+    FIELDS = ()
+    SNIPPETS = ()
+
+    @classmethod
+    def accepts(cls, data) -> bool:
+        return all(key in cls.FIELDS for key in data)
+
+    @classmethod
+    def from_dict(cls, data, store):
+        record = cls.__new__(cls)
+        record._shape = _shape(data)
+        for key in cls.FIELDS:
+            value = data.get(key)
+            if key in cls.SNIPPETS and isinstance(value, str) and len(value) <= SNIPPET_MAX:
+                value = store.ref(value)
+            else:
+                value = _pack(value, store, key)
+            setattr(record, key, value)
+        record._store = store
+        return record
+
+    def __getitem__(self, key):
+        if key not in self._shape:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if key in self.SNIPPETS and isinstance(value, int):
+            return self._store.text(value)
+        return value
+
+
+class Finding(SlotRecord):
+    """Anomalie WebScanner ou menace MalwareScanner"""
+
+    __slots__ = ("type", "severity", "title", "description")
+    FIELDS = ("type", "severity", "title", "description")
+
+
+class PatternHit(SlotRecord):
+    """Pattern suspect trouvé dans un script (context : extrait partagé)"""
+
+    __slots__ = ("type", "pattern", "matches", "offsets", "context", "src")
+    FIELDS = ("type", "pattern", "matches", "offsets", "context", "src")
+    SNIPPETS = ("context",)
+
+
+class ObfuscatedScript(SlotRecord):
+    """Script obfusqué (sample : extrait partagé)"""
+
+    __slots__ = ("type", "hash", "sample", "features", "src")
+    FIELDS = ("type", "hash", "sample", "features", "src")
+    SNIPPETS = ("sample",)
+
+
+# Valeurs conservées telles quelles dans une liste
+_SCALARS = frozenset((int, float, bool, type(None)))
+
+# Listes dont les éléments ont un type dédié
+TYPED_LISTS = {
+    "anomalies": Finding,
+    "threats_found": Finding,
+    "suspicious_patterns": PatternHit,
+    "obfuscated_code": ObfuscatedScript
+}
+
+
+def _pack(value, store, key=None):
+    kind = type(value)
+    if kind is str:
+        return sys.intern(value) if len(value) <= INTERN_MAX else value
+    if kind is dict:
+        if all(type(name) is str for name in value):
+            return Record.from_dict(value, store)
+        return value
+    if kind is list:
+        typed = TYPED_LISTS.get(key)
+        if typed is not None:
+            return Items(typed.from_dict(item, store) if type(item) is dict and typed.accepts(item)
+                         else _pack(item, store) for item in value)
+        if all(type(item) in _SCALARS for item in value):
+            # offsets, compteurs : rien à convertir élément par élément
+            return Items(value)
+        return Items(_pack(item, store) for item in value)
+    return value
+
+
+def _unpack(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, Items):
+        return [_unpack(item) for item in value]
+    return value
+
+
+class CompactResult(Record):
+    """Résultat de scan compact (racine)"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data, store=None):
+        return super().from_dict(data, store if store is not None else default_content_store())
+
+
+def compact_results(results, store=None):
+    """Résultats convertis un à un (le dict d'origine peut être libéré aussitôt)"""
+    for result in results:
+        yield CompactResult.from_dict(result, store) if isinstance(result, dict) else result
+
+
+# ========== MESURE ==========
+
+def _retained(load):
+    """(objet, octets alloués et conservés) par load()"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        value = load()
+        return value, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mémoire des résultats : dicts contre enregistrements compacts")
+    parser.add_argument("results", help="Résultats de scan (NDJSON ou tableau JSON, .gz accepté)")
+    parser.add_argument("--check", action="store_true",
+                        help="Vérifie que to_dict() restitue exactement le JSON d'origine")
+    args = parser.parse_args()
+
+    originals, plain = _retained(lambda: list(iter_records(args.results)))
+    count = max(len(originals), 1)
+    if not args.check:
+        del originals
+    start = time.perf_counter()
+    store = ContentStore()
+    compact, packed = _retained(lambda: list(compact_results(iter_records(args.results), store)))
+    elapsed = time.perf_counter() - start
+
+    print(f"📋 {len(compact)} résultats")
+    print(f"   dicts        {plain / 1024 / 1024:>9.1f} Mo  {plain / count:>10,.0f} octets / résultat")
+    print(f"   compacts     {packed / 1024 / 1024:>9.1f} Mo  {packed / count:>10,.0f} octets / résultat "
+          f"({len(store)} extraits partagés)")
+    print(f"✓ Réduction : {1 - packed / max(plain, 1):.0%} (conversion {elapsed:.1f} s)")
+
+    if args.check:
+        mismatches = sum(json.dumps(record.to_dict()) != json.dumps(original) or record != original
+                         for record, original in zip(compact, originals))
+        if mismatches:
+            print(f"❌ {mismatches} résultats diffèrent après to_dict()")
+            sys.exit(1)
+        print(f"✓ to_dict() identique au JSON d'origine sur {len(compact)} résultats")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Étage CPU du scan par lots
+Les threads réseau transmettent les octets bruts de chaque page (avec
+en-têtes, encodage et code HTTP) à un pool de processus qui fait le
+parsing HTML et l'analyse malware (patterns, obfuscation) hors du GIL.
+Un sémaphore borne les pages en attente : quand le pool sature, les
+threads de téléchargement attendent au lieu d'accumuler des pages en mémoire.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import html_document
+from html_document import HTMLDocument, BACKENDS, set_default_backend
+from script_cache import configure_script_cache, add_script_cache_arguments
+from malware_scanner import MalwareScanner, MALWARE_KEYS
+from metrics import ScanMetrics
+from http_session import add_download_arguments, configure_download_from_args
+
+
+# Pages en attente par processus avant que les téléchargements ne patientent
+PENDING_PER_WORKER = 4
+
+
+def _init_worker(backend, script_cache_options):
+    """Initialisation d'un processus du pool (backend HTML, cache de verdicts)"""
+    set_default_backend(backend)
+    configure_script_cache(**script_cache_options)
+
+
+def _response(url, payload):
+    """Reconstruit une requests.Response à partir de la charge transmise"""
+    content, headers, encoding, status_code = payload
+    response = requests.models.Response()
+    response._content = content
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = encoding
+    response.status_code = status_code
+    response.url = url
+    return response
+
+
+def _malware_keys(scanner):
+    return {key: scanner.results[key] for key in MALWARE_KEYS}
+
+
+def analyze_content(url, payload) -> dict:
+    """Processus du pool : parsing du texte décodé et analyse malware
+    (mêmes étapes que MalwareScanner.process_content)"""
+    response = _response(url, payload)
+    metrics = ScanMetrics()
+    with metrics.phase("parse"):
+        document = HTMLDocument.parse(response.text)
+    metrics.record_document(document)
+    scanner = MalwareScanner(url, metrics=metrics)
+    scanner.analyze_document(document, response.headers, verbose=False)
+    return {**_malware_keys(scanner), "metrics": metrics.to_dict()}
+
+
+def analyze_combined(url, payload) -> dict:
+    """Processus du pool : un parsing des octets pour la structure HTML du
+    WebScanner et l'analyse malware (mêmes étapes que CombinedScanner)"""
+    response = _response(url, payload)
+    metrics = ScanMetrics()
+    with metrics.phase("parse"):
+        document = HTMLDocument.parse(response.content)
+        result = {"html_structure": document.structure(), "malware": None}
+    metrics.record_document(document)
+    if response.status_code < 400:
+        scanner = MalwareScanner(url, metrics=metrics)
+        scanner.analyze_document(document, response.headers, verbose=False)
+        result["malware"] = _malware_keys(scanner)
+    result["metrics"] = metrics.to_dict()
+    return result
+
+
+class CpuStage:
+    """Pool de processus pour le parsing et l'analyse, avec contre-pression"""
+
+    def __init__(self, workers=None, max_pending=None, script_cache_options=None):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.max_pending = max(self.workers, max_pending or self.workers * PENDING_PER_WORKER)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "completed": 0, "bytes": 0, "waits": 0,
+                      "script_hits": 0, "script_misses": 0}
+        # spawn : pas de fork d'un processus déjà multithreadé (pools, SQLite)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(html_document.DEFAULT_BACKEND, script_cache_options or {})
+        )
+
+    def submit(self, function, url, response):
+        """Envoie les octets de la réponse au pool (bloque si le pool sature)"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["waits"] += 1
+            self._slots.acquire()
+        payload = (response.content, list(response.headers.items()),
+                   response.encoding, response.status_code)
+        with self._lock:
+            self.stats["submitted"] += 1
+            self.stats["bytes"] += len(response.content)
+        try:
+            future = self._executor.submit(function, url, payload)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        self._slots.release()
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        malware = result["malware"] if "html_structure" in result else result
+        with self._lock:
+            self.stats["completed"] += 1
+            if malware and "script_cache" in malware:
+                self.stats["script_hits"] += malware["script_cache"]["hits"]
+                self.stats["script_misses"] += malware["script_cache"]["misses"]
+
+    def analyze_content(self, url, response) -> dict:
+        return self.submit(analyze_content, url, response).result()
+
+    def analyze_combined(self, url, response) -> dict:
+        return self.submit(analyze_combined, url, response).result()
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        scripts = stats["script_hits"] + stats["script_misses"]
+        stats["script_hit_rate"] = round(stats["script_hits"] / scripts, 3) if scripts else 0.0
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def add_cpu_arguments(parser):
+    """Option de l'étage CPU partagée par les CLIs"""
+    parser.add_argument("--cpu-workers", type=int, default=0,
+                        help="Processus de parsing/analyse (défaut : 0, analyse dans le processus ; "
+                             "-1 : un par cœur)")
+
+
+def cpu_stage_from_args(args):
+    """CpuStage correspondant à --cpu-workers (None si désactivé)"""
+    if not args.cpu_workers:
+        return None
+    script_cache_options = {}
+    if hasattr(args, "script_cache_size"):
+        script_cache_options = {"max_entries": args.script_cache_size,
+                                "digest": args.script_digest, "path": args.script_cache}
+    workers = None if args.cpu_workers < 0 else args.cpu_workers
+    return CpuStage(workers, script_cache_options=script_cache_options)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Analyse malware par lots : téléchargements en threads, analyse en processus"
+    )
+    parser.add_argument("-i", "--input", default="-", help="Fichier d'URLs (défaut : stdin)")
+    parser.add_argument("--ndjson", default="-", help="Fichier NDJSON de sortie (défaut : stdout)")
+    parser.add_argument("--fetch-workers", type=int, default=32,
+                        help="Threads de téléchargement (défaut : 32)")
+    parser.add_argument("--parser", choices=BACKENDS, default="html.parser",
+                        help="Backend d'extraction HTML (défaut : html.parser)")
+    add_cpu_arguments(parser)
+    add_script_cache_arguments(parser)
+    add_download_arguments(parser)
+    parser.set_defaults(cpu_workers=-1)
+    args = parser.parse_args()
+    set_default_backend(args.parser)
+    configure_download_from_args(args)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    urls = [line.strip() for line in source if line.strip() and not line.startswith('#')]
+    if source is not sys.stdin:
+        source.close()
+    output = sys.stdout if args.ndjson == "-" else open(args.ndjson, "a", encoding="utf-8")
+    stage = cpu_stage_from_args(args)
+
+    def scan(url):
+        return MalwareScanner(url, cpu_stage=stage).scan(verbose=False)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.fetch_workers) as executor:
+        for result in executor.map(scan, urls):
+            output.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+    elapsed = time.perf_counter() - start
+    if stage is not None:
+        stats = stage.snapshot()
+        stage.close()
+        print(f"✓ Étage CPU : {stats['completed']} pages analysées sur {stage.workers} processus, "
+              f"{stats['bytes'] / 1e6:.1f} Mo transmis, {stats['waits']} attentes (pool saturé)",
+              file=sys.stderr)
+    print(f"✓ {len(urls)} sites en {elapsed:.1f} s ({len(urls) / elapsed:.1f} sites/s)", file=sys.stderr)
+    if output is not sys.stdout:
+        output.close()
+
+
+if __name__ == "__main__":
+    main()
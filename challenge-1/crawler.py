@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Exploration bornée d'un site (mode crawl)
+La page de départ passe par le pipeline combiné (analyse externe + malware,
+TLS et WHOIS collectés une fois) ; les pages internes découvertes ensuite
+(liens <a href>, linked-pages.internal des enregistrements archivés) ne
+coûtent qu'un téléchargement et une analyse MalwareScanner chacune.
+Frontière en largeur : URLs canonicalisées, dédupliquées (ensemble exact ou
+filtre de Bloom), budgets de profondeur, de pages et de temps, délai de
+politesse par hôte partagé entre les crawls simultanés.
+"""
+
+import sys
+import math
+import time
+import hashlib
+import argparse
+import posixpath
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, urljoin, urldefrag
+
+from scan_pipeline import CombinedScanner
+from web_scanner import WebScanner
+from malware_scanner import MalwareScanner, MALWARE_KEYS
+from html_document import HTMLDocument, BACKENDS, set_default_backend
+from http_session import get_session, configure_session, add_download_arguments, configure_download_from_args
+from domain_matcher import registrable_domain
+from whois_cache import add_whois_arguments, whois_options
+from script_cache import add_script_cache_arguments, configure_from_args
+from external_scripts import add_external_script_arguments, configure_external_from_args
+from stream_reader import iter_records
+from result_sink import NDJSONSink, DEFAULT_BATCH, add_sink_arguments, sink_from_args
+from rule_engine import add_rules_arguments, configure_rules_from_args
+
+
+DEFAULT_MAX_PAGES = 20
+DEFAULT_MAX_DEPTH = 2
+DEFAULT_DELAY = 1.0           # secondes entre deux requêtes vers un même hôte
+SCOPES = ("domain", "host")
+DEDUP = ("set", "bloom")
+# Ressources non HTML : jamais ajoutées à la frontière
+SKIPPED_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".json", ".xml",
+    ".pdf", ".zip", ".gz", ".rar", ".mp3", ".mp4", ".webm", ".woff", ".woff2", ".ttf"
+)
+# Paramètres de suivi retirés à la canonicalisation (en plus des utm_*)
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid"}
+# Collecte par hôte, reprise pour toutes les pages de cet hôte
+HOST_KEYS = ("tls", "tls_error")
+WHOIS_KEYS = ("whois", "whois_error")
+RISK_ORDER = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+
+
+# ========== URLS ==========
+
+def canonical_url(url, base=None):
+    """Forme canonique d'un lien (None hors http/https) : fragment, identifiants,
+    port par défaut, segments '.'/'..' et paramètres de suivi retirés, hôte en
+    minuscules, paramètres triés"""
+    if not url:
+        return None
+    try:
+        parts = urlsplit(urljoin(base, url.strip()) if base else url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if scheme not in ("http", "https") or not host:
+        return None
+    if ":" in host:
+        host = f"[{host}]"  # IPv6
+    if port and port != (443 if scheme == "https" else 80):
+        host = f"{host}:{port}"
+    path = parts.path or "/"
+    if "/." in path:
+        trailing = path.endswith(("/", "/.", "/.."))
+        path = posixpath.normpath(path).replace("//", "/")
+        path = path + "/" if trailing and path != "/" else path
+    query = urlencode(sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if not name.startswith("utm_") and name not in TRACKING_PARAMS))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+# ========== DÉDUPLICATION ==========
+
+class SeenSet(set):
+    """Ensemble exact d'URLs (même interface que BloomFilter)"""
+
+    def add(self, item) -> bool:
+        """Ajoute item ; False s'il était déjà présent"""
+        if item in self:
+            return False
+        super().add(item)
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self) + sum(sys.getsizeof(item) for item in self)
+
+
+class BloomFilter:
+    """Ensemble approché de taille fixe : faux positifs au taux choisi (une URL
+    nouvelle prise pour déjà vue, donc non visitée), jamais de faux négatifs"""
+
+    def __init__(self, capacity=100_000, error_rate=0.001):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hachage : k positions dérivées d'une seule empreinte de 128 bits
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item) -> bool:
+        """Ajoute item ; False s'il était (probablement) déjà présent"""
+        new = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                new = True
+        self.count += new
+        return new
+
+    def __contains__(self, item) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+def seen_set(dedup, capacity):
+    return BloomFilter(capacity) if dedup == "bloom" else SeenSet()
+
+
+# ========== FRONTIÈRE ==========
+
+class Politeness:
+    """Délai minimal entre deux requêtes vers un même hôte, partagé entre crawls"""
+
+    def __init__(self, delay=DEFAULT_DELAY):
+        self.delay = delay
+        self.waited = 0.0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        """Réserve le prochain créneau de l'hôte et attend son heure"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.delay
+            self.waited += slot - now
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Frontier:
+    """URLs à visiter en largeur d'abord, dans la portée du site de départ"""
+
+    def __init__(self, seed, scope="domain", max_depth=DEFAULT_MAX_DEPTH, seen=None):
+        self.scope = scope
+        self.max_depth = max_depth
+        self.seen = seen if seen is not None else SeenSet()
+        self.queue = deque()
+        self.stats = {"queued": 0, "duplicates": 0, "out_of_scope": 0, "too_deep": 0, "skipped": 0}
+        self.allowed = self.scope_key(seed)
+
+    def scope_key(self, url):
+        host = urlsplit(url).hostname or ""
+        return host if self.scope == "host" else registrable_domain(host)
+
+    def push(self, link, depth, parent=None, base=None):
+        """Ajoute un lien (relatif à base) ; URL à visiter retenue ou None.
+        La forme canonique sert seulement à la déduplication : la page est
+        demandée à l'URL du lien, telle que le site l'a publiée"""
+        url = canonical_url(link, base)
+        if url is None or urlsplit(url).path.lower().endswith(SKIPPED_EXTENSIONS):
+            self.stats["skipped"] += 1
+        elif depth > self.max_depth:
+            self.stats["too_deep"] += 1
+        elif self.scope_key(url) != self.allowed:
+            self.stats["out_of_scope"] += 1
+        elif not self.seen.add(url):
+            self.stats["duplicates"] += 1
+        else:
+            target = urldefrag(urljoin(base, link.strip()) if base else link.strip()).url
+            self.queue.append((target, depth, parent))
+            self.stats["queued"] += 1
+            return target
+        return None
+
+    def mark_seen(self, url):
+        """URL atteinte par redirection : ne sera pas visitée une seconde fois"""
+        url = canonical_url(url)
+        if url:
+            self.seen.add(url)
+
+    def pop(self):
+        return self.queue.popleft() if self.queue else None
+
+    def __len__(self):
+        return len(self.queue)
+
+
+# ========== CRAWL D'UN SITE ==========
+
+def _worst(levels):
+    return max((level for level in levels if level in RISK_ORDER), key=RISK_ORDER.index, default="LOW")
+
+
+class SiteCrawler:
+    """Crawl borné d'un site : page de départ complète, pages internes malware seul"""
+
+    def __init__(self, seed, hints=(), max_pages=DEFAULT_MAX_PAGES, max_depth=DEFAULT_MAX_DEPTH,
+                 scope="domain", dedup="set", time_budget=None, politeness=None, session=None,
+                 scanner_options=None):
+        self.seed = seed.strip()
+        self.hints = hints
+        self.max_pages = max_pages
+        self.time_budget = time_budget
+        self.politeness = politeness or Politeness()
+        self.session = session or get_session()
+        # Options WebScanner (cache et serveur WHOIS, délais) de la page de départ et des hôtes
+        self.options = scanner_options or {}
+        self.frontier = Frontier(self.seed, scope, max_depth,
+                                 seen=seen_set(dedup, max(10_000, max_pages * 100)))
+        self.hosts = {}     # hôte → collecte TLS
+        self.whois = {}     # domaine enregistrable → collecte WHOIS
+        self.digests = {}   # empreinte du contenu → première URL analysée
+        self.pages = []
+        self.stats = {"fetches": 0, "tls_collections": 0, "whois_collections": 0, "same_content": 0}
+
+    def run(self) -> dict:
+        start = time.perf_counter()
+        self.frontier.push(self.seed, 0)
+        for hint in self.hints:
+            self.frontier.push(hint, 1, parent=self.seed, base=self.seed)
+        seed = self.frontier.pop()
+        result = self.scan_seed(seed[0] if seed else self.seed)
+
+        stopped = "frontier"
+        while True:
+            if len(self.pages) >= self.max_pages:
+                stopped = "max_pages"
+                break
+            if self.time_budget is not None and time.perf_counter() - start >= self.time_budget:
+                stopped = "time_budget"
+                break
+            item = self.frontier.pop()
+            if item is None:
+                break
+            self.scan_page(*item)
+
+        threats = sum(len(page.get("threats_found", ())) for page in self.pages)
+        result["crawl"] = {
+            "pages_scanned": len(self.pages),
+            "stopped": stopped,
+            "risk_level": _worst(page.get("risk_level") for page in self.pages),
+            "threats_found": threats,
+            "frontier": {**self.frontier.stats, "remaining": len(self.frontier)},
+            **self.stats,
+            "hosts": {host: {**tls, **self.whois.get(registrable_domain(host), {})}
+                      for host, tls in self.hosts.items()},
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+            "pages": self.pages
+        }
+        return result
+
+    def scan_seed(self, url) -> dict:
+        """Page de départ : pipeline combiné (HTTP, TLS et WHOIS en parallèle, un parsing)"""
+        host = urlsplit(url).hostname
+        self.politeness.wait(host)
+        combined = CombinedScanner(url, quiet=True, session=self.session, **self.options)
+        result = combined.run()
+        self.stats["fetches"] += 1
+        self.stats["tls_collections"] += 1
+        self.stats["whois_collections"] += 1
+        collection = result["collection"]
+        self.hosts[host] = {key: collection[key] for key in HOST_KEYS if key in collection}
+        self.whois[registrable_domain(host)] = {key: collection[key] for key in WHOIS_KEYS if key in collection}
+
+        page = {"url": url, "depth": 0, "parent": None,
+                "status_code": collection.get("http", {}).get("status_code"), **result["malware"]}
+        self.pages.append(page)
+        response, document = combined.web.response, combined.web.document
+        if response is not None and response.status_code < 400:
+            self.frontier.mark_seen(response.url)
+            self.digests[self.digest(response.content)] = url
+            if document is None:
+                document = HTMLDocument.parse(response.content)
+            self.follow(document, url, response.url, 0)
+        return result
+
+    def scan_page(self, url, depth, parent):
+        """Page interne : un téléchargement et l'analyse malware du document"""
+        host = urlsplit(url).hostname
+        self.collect_host(url, host)
+        self.politeness.wait(host)
+        scanner = MalwareScanner(url, session=self.session)
+        content, headers, status_code = scanner.fetch_content(verbose=False)
+        self.stats["fetches"] += 1
+        page = {"url": url, "depth": depth, "parent": parent, "status_code": status_code}
+        self.pages.append(page)
+        if content is None:
+            page["error"] = "Impossible de récupérer le contenu"
+            return
+        content_type = headers.get("Content-Type", "text/html").lower()
+        if "html" not in content_type:
+            page["skipped"] = content_type
+            return
+        if getattr(scanner.response, "truncated", False):
+            page["truncated"] = True
+        self.frontier.mark_seen(scanner.response.url)
+        digest = self.digest(scanner.response.content)
+        if digest in self.digests:
+            # Autre URL d'une page déjà analysée (index.html, paramètres ignorés…)
+            page["same_content_as"] = self.digests[digest]
+            self.stats["same_content"] += 1
+            return
+        self.digests[digest] = url
+
+        document = HTMLDocument.parse(content)
+        scanner.analyze_document(document, headers, verbose=False)
+        page.update({key: scanner.results[key] for key in MALWARE_KEYS})
+        self.follow(document, url, scanner.response.url, depth)
+
+    @staticmethod
+    def digest(content):
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    def collect_host(self, url, host):
+        """TLS d'un nouvel hôte du site (WHOIS : une fois par domaine enregistrable)"""
+        if host in self.hosts:
+            return
+        web = WebScanner(url, quiet=True, session=self.session, **self.options)
+        web.collect_tls_certificate()
+        self.stats["tls_collections"] += 1
+        collection = web.results["collection"]
+        self.hosts[host] = {key: collection[key] for key in HOST_KEYS if key in collection}
+        domain = registrable_domain(host)
+        if domain not in self.whois:
+            web.collect_whois()
+            self.stats["whois_collections"] += 1
+            self.whois[domain] = {key: collection[key] for key in WHOIS_KEYS if key in collection}
+
+    def follow(self, document, url, final_url, depth):
+        """Liens du document ajoutés à la frontière (relatifs à l'URL finale)"""
+        if depth >= self.frontier.max_depth:
+            return
+        for link in document.links:
+            self.frontier.push(link.get("href"), depth + 1, parent=url, base=final_url)
+
+
+# ========== CLI ==========
+
+def crawl_seeds(args):
+    """(URL, liens internes connus) : URLs de la ligne de commande puis enregistrements"""
+    for url in args.urls:
+        yield (url if url.startswith(("http://", "https://")) else "https://" + url), ()
+    if args.input:
+        for record in iter_records(args.input):
+            if record.get("url"):
+                linked = record.get("linked-pages") or {}
+                yield record["url"], tuple(linked.get("internal") or ())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl borné de sites (analyse malware page par page)")
+    parser.add_argument("urls", nargs="*", help="URLs de départ")
+    parser.add_argument("--input", help="Enregistrements (data_stream.json, NDJSON) : url et "
+                                        "linked-pages.internal ajoutés à la frontière")
+    parser.add_argument("--max-pages", type=int, default=DEFAULT_MAX_PAGES,
+                        help=f"Pages analysées par site, page de départ comprise (défaut : {DEFAULT_MAX_PAGES})")
+    parser.add_argument("--max-depth", type=int, default=DEFAULT_MAX_DEPTH,
+                        help=f"Profondeur maximale en liens depuis la page de départ (défaut : {DEFAULT_MAX_DEPTH})")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Durée maximale du crawl d'un site en secondes")
+    parser.add_argument("--delay", type=float, default=DEFAULT_DELAY,
+                        help=f"Délai entre deux requêtes vers un même hôte (défaut : {DEFAULT_DELAY} s)")
+    parser.add_argument("--scope", choices=SCOPES, default="domain",
+                        help="Pages suivies : même domaine enregistrable ou même hôte (défaut : domain)")
+    parser.add_argument("--dedup", choices=DEDUP, default="set",
+                        help="URLs déjà vues : ensemble exact ou filtre de Bloom (défaut : set)")
+    parser.add_argument("-w", "--workers", type=int, default=4,
+                        help="Sites explorés simultanément (défaut : 4)")
+    parser.add_argument("--ndjson", default="-", help="Fichier NDJSON de sortie (défaut : stdout)")
+    parser.add_argument("--parser", choices=BACKENDS, default="html.parser",
+                        help="Backend d'extraction HTML (défaut : html.parser)")
+    add_whois_arguments(parser)
+    add_script_cache_arguments(parser)
+    add_external_script_arguments(parser)
+    add_download_arguments(parser)
+    add_rules_arguments(parser)
+    add_sink_arguments(parser)
+    args = parser.parse_args()
+    if not args.urls and not args.input:
+        parser.error("une URL ou --input est requis")
+    set_default_backend(args.parser)
+    configure_download_from_args(args)
+    configure_rules_from_args(args)
+    configure_session(pool_connections=max(100, args.workers))
+    script_cache = configure_from_args(args)
+    external_scripts = configure_external_from_args(args)
+
+    options = whois_options(args)
+    politeness = Politeness(args.delay)
+    sink = sink_from_args(args) or NDJSONSink(
+        args.ndjson, args.sink_batch or (1 if args.ndjson == "-" else DEFAULT_BATCH))
+
+    def crawl(seed):
+        url, hints = seed
+        crawler = SiteCrawler(url, hints, max_pages=args.max_pages, max_depth=args.max_depth,
+                              scope=args.scope, dedup=args.dedup, time_budget=args.time_budget,
+                              politeness=politeness, scanner_options=options)
+        return crawler.run()
+
+    totals = {"sites": 0, "pages": 0, "fetches": 0, "tls": 0, "whois": 0}
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            for result in executor.map(crawl, crawl_seeds(args)):
+                sink.write(result)
+                crawl_stats = result["crawl"]
+                totals["sites"] += 1
+                totals["pages"] += crawl_stats["pages_scanned"]
+                totals["fetches"] += crawl_stats["fetches"]
+                totals["tls"] += crawl_stats["tls_collections"]
+                totals["whois"] += crawl_stats["whois_collections"]
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Crawl interrompu par l'utilisateur", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        sink.close()
+        script_cache.close()
+        if external_scripts is not None:
+            external_scripts.close()
+        if options["whois_cache"] is not None:
+            options["whois_cache"].close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✓ {totals['sites']} sites, {totals['pages']} pages analysées en {elapsed:.1f} s "
+          f"({totals['fetches']} téléchargements, {totals['tls']} collectes TLS, "
+          f"{totals['whois']} WHOIS)", file=sys.stderr)
+    print(f"✓ Politesse : {politeness.waited:.1f} s d'attente cumulée "
+          f"({args.delay} s entre deux requêtes par hôte)", file=sys.stderr)
+    if external_scripts is not None:
+        external = external_scripts.snapshot()
+        print(f"✓ Scripts externes : {external['downloads']} téléchargés, {external['reused']} repris "
+              f"du cache, {external['errors']} échecs", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
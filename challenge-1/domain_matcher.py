@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Index de domaines suspects
+Les entrées de liste de blocage sont stockées sous forme de hachages 64 bits
+triés (8 octets par entrée) ; une URL est testée en parsant son nom d'hôte
+une fois puis en cherchant chacun de ses suffixes de labels, soit
+O(nombre de labels) recherches dichotomiques.
+"""
+
+import sys
+import time
+import random
+import string
+import argparse
+from array import array
+from bisect import bisect_left
+from urllib.parse import urlparse
+
+
+# Domaines suspects par défaut (historiquement MalwareScanner.suspicious_domains)
+SUSPICIOUS_DOMAINS = [
+    'bit.ly', 'tinyurl.com', 'goo.gl',  # Raccourcisseurs d'URL
+    '.tk', '.ml', '.ga', '.cf', '.gq',  # TLDs gratuits souvent malveillants
+]
+
+
+# Suffixes publics à deux labels les plus courants (sans dépendance à la PSL)
+MULTI_LABEL_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'me.uk', 'net.uk',
+    'com.au', 'net.au', 'org.au', 'edu.au', 'gov.au',
+    'co.jp', 'ne.jp', 'or.jp', 'ac.jp', 'co.nz', 'org.nz', 'co.za',
+    'com.br', 'net.br', 'org.br', 'com.cn', 'net.cn', 'org.cn',
+    'co.in', 'net.in', 'org.in', 'com.mx', 'com.tr', 'com.tw', 'com.hk',
+    'gouv.fr', 'asso.fr', 'com.fr', 'nom.fr', 'tm.fr',
+}
+
+
+def normalize_domain(entry: str):
+    """Forme canonique d'une entrée de liste ('*.x.com', '.tk', 'X.COM.')"""
+    entry = entry.strip().lower().rstrip('.')
+    if entry.startswith('*.'):
+        entry = entry[2:]
+    return entry.lstrip('.') or None
+
+
+def hostname_of(url_or_host: str):
+    """Nom d'hôte d'une URL absolue ou protocol-relative, ou d'un hôte nu"""
+    if not url_or_host:
+        return None
+    if '/' not in url_or_host and ':' not in url_or_host:
+        host = url_or_host
+    else:
+        host = urlparse(url_or_host).hostname
+    return normalize_domain(host) if host else None
+
+
+def registrable_domain(host: str):
+    """Domaine enregistrable (eTLD+1 approché) : 'a.b.example.co.uk' → 'example.co.uk'"""
+    host = normalize_domain(host.rsplit('@', 1)[-1].split(':', 1)[0]) or ''
+    labels = host.split('.')
+    if len(labels) <= 2 or labels[-1].isdigit():
+        return host  # domaine nu ou adresse IPv4
+    size = 3 if '.'.join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 2
+    return '.'.join(labels[-size:])
+
+
+def _label_suffixes(host: str):
+    """'a.b.c' → 'a.b.c', 'b.c', 'c'"""
+    yield host
+    pos = host.find('.')
+    while pos != -1:
+        yield host[pos + 1:]
+        pos = host.find('.', pos + 1)
+
+
+class DomainMatcher:
+    """Appartenance d'un hôte (ou d'un de ses domaines parents) à une liste"""
+
+    def __init__(self, domains=()):
+        # hash() est stable pour la durée du processus, ce qui suffit à un
+        # index construit en mémoire ; 2^64 valeurs rendent les collisions négligeables
+        hashes = {hash(d) for d in map(normalize_domain, domains) if d}
+        self._hashes = array('q', sorted(hashes))
+
+    @classmethod
+    def from_file(cls, path: str, extra=()) -> "DomainMatcher":
+        """Charge une liste (un domaine par ligne, format hosts accepté)"""
+        def entries():
+            yield from extra
+            with open(path, encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    line = line.split('#', 1)[0].strip()
+                    if line:
+                        # « 0.0.0.0 domaine » (fichier hosts) → dernier champ
+                        yield line.split()[-1]
+        return cls(entries())
+
+    def __len__(self):
+        return len(self._hashes)
+
+    @property
+    def nbytes(self) -> int:
+        return self._hashes.itemsize * len(self._hashes)
+
+    def _contains_hash(self, value: int) -> bool:
+        hashes = self._hashes
+        i = bisect_left(hashes, value)
+        return i < len(hashes) and hashes[i] == value
+
+    def match_host(self, host: str):
+        """Suffixe de liste correspondant à l'hôte, ou None"""
+        host = host.rstrip('.')
+        for suffix in _label_suffixes(host):
+            if self._contains_hash(hash(suffix)):
+                return suffix
+        return None
+
+    def match(self, url_or_host: str):
+        """Suffixe correspondant au nom d'hôte de l'URL, ou None (URL relative)"""
+        host = hostname_of(url_or_host)
+        return self.match_host(host) if host else None
+
+    def __contains__(self, url_or_host: str) -> bool:
+        return self.match(url_or_host) is not None
+
+
+_default_matcher = None
+
+
+def default_matcher() -> DomainMatcher:
+    """Index des domaines suspects par défaut, construit une fois par processus"""
+    global _default_matcher
+    if _default_matcher is None:
+        _default_matcher = DomainMatcher(SUSPICIOUS_DOMAINS)
+    return _default_matcher
+
+
+# ========== MICRO-BENCHMARK ==========
+
+def _random_domains(count, rng):
+    tlds = ['com', 'net', 'org', 'fr', 'tk', 'io', 'co.uk', 'de']
+    letters = string.ascii_lowercase + string.digits
+    for _ in range(count):
+        name = ''.join(rng.choices(letters, k=rng.randint(5, 14)))
+        yield f"{name}.{rng.choice(tlds)}"
+
+
+def benchmark(sizes=(10_000, 100_000, 1_000_000), queries=50_000, seed=42):
+    """Construction, mémoire et débit de recherche pour plusieurs tailles"""
+    rng = random.Random(seed)
+    print(f"{'entrées':>10} {'construction':>13} {'index':>10} {'recherches/s':>14} {'naïf/s':>10}")
+    for size in sizes:
+        domains = list(_random_domains(size, rng))
+        start = time.perf_counter()
+        matcher = DomainMatcher(domains)
+        build = time.perf_counter() - start
+
+        hits = [f"https://cdn.{rng.choice(domains)}/lib.js?v=1" for _ in range(queries // 2)]
+        misses = [f"https://www.{d}/index.html" for d in _random_domains(queries - len(hits), rng)]
+        urls = hits + misses
+        rng.shuffle(urls)
+
+        start = time.perf_counter()
+        found = sum(1 for url in urls if matcher.match(url))
+        rate = len(urls) / (time.perf_counter() - start)
+        assert found >= len(hits)
+
+        # Référence : any(domain in url ...) sur un échantillon de requêtes
+        sample = urls[:max(1, 2_000_000 // size)]
+        start = time.perf_counter()
+        for url in sample:
+            any(domain in url for domain in domains)
+        naive = len(sample) / (time.perf_counter() - start)
+
+        print(f"{size:>10,} {build * 1000:>11.0f}ms {matcher.nbytes / 1e6:>8.1f}MB "
+              f"{rate:>14,.0f} {naive:>10,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index de domaines suspects")
+    parser.add_argument("--bench", action="store_true",
+                        help="Micro-benchmark à 10k, 100k et 1M entrées")
+    parser.add_argument("-f", "--file", help="Liste de blocage à charger")
+    parser.add_argument("urls", nargs="*", help="URLs ou hôtes à tester")
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark()
+        return
+
+    matcher = DomainMatcher.from_file(args.file, SUSPICIOUS_DOMAINS) if args.file else default_matcher()
+    for url in args.urls:
+        suffix = matcher.match(url)
+        print(f"{'✗' if suffix else '✓'} {url}" + (f" (liste : {suffix})" if suffix else ""))
+    sys.exit(1 if any(matcher.match(url) for url in args.urls) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Scripts externes (<script src>)
+Les scripts servis par des tiers sont téléchargés en parallèle, plafonnés en
+taille, puis passent par la même analyse que les scripts inline (patterns
+suspects, obfuscation). Les mêmes bundles (jsdelivr, googletagmanager…)
+reviennent sur des milliers de sites : le cache URL → empreinte du contenu
+évite de les retélécharger, le contenu est conservé une fois par empreinte
+(même bibliothèque servie par plusieurs CDN) dans un budget mémoire borné.
+Le verdict des patterns est rangé par empreinte dans le ScriptCache : un
+bundle n'est analysé qu'une fois, quel que soit le site qui le charge.
+Désactivé par défaut : l'analyse d'un document reste sans accès réseau.
+"""
+
+import sys
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import NamedTuple, Optional
+
+import requests
+
+from http_session import get_session, fetch_bounded
+from obfuscation import minified_features
+from script_cache import digest_function
+
+
+DEFAULT_MAX_KB = 1024         # taille maximale d'un script
+DEFAULT_PER_PAGE = 20         # scripts téléchargés par page
+DEFAULT_WORKERS = 16
+DEFAULT_CACHE_MB = 64         # contenus conservés, toutes empreintes confondues
+DEFAULT_TTL = 3600            # validité d'une URL en cache (secondes)
+ERROR_TTL = 300               # échec retenté après 5 minutes
+DEFAULT_MAX_URLS = 50_000
+USER_AGENT = 'Mozilla/5.0 (Malware Scanner Bot)'
+
+
+class ExternalScript:
+    """Résultat du téléchargement d'une URL (le contenu est rangé par empreinte)"""
+
+    __slots__ = ('url', 'digest', 'size', 'truncated', 'features', 'error', 'fetched_at')
+
+    def __init__(self, url, digest=None, size=0, truncated=False, features=None, error=None):
+        self.url = url
+        self.digest = digest          # empreinte du texte (algorithme du ScriptCache)
+        self.size = size
+        self.truncated = truncated
+        self.features = features      # obfuscation.minified_features, calculé une fois
+        self.error = error
+        self.fetched_at = time.monotonic()
+
+    def expired(self, ttl) -> bool:
+        return time.monotonic() - self.fetched_at > (ERROR_TTL if self.error else ttl)
+
+
+class Fetched(NamedTuple):
+    script: ExternalScript
+    content: Optional[str]    # None si le téléchargement a échoué
+    reused: bool              # URL déjà téléchargée par un scan précédent
+
+
+class ExternalScriptFetcher:
+    """Téléchargements concurrents et cache inter-sites des scripts externes"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_KB * 1024, per_page=DEFAULT_PER_PAGE,
+                 workers=DEFAULT_WORKERS, cache_bytes=DEFAULT_CACHE_MB * 1024 * 1024,
+                 timeout=5, ttl=DEFAULT_TTL, max_urls=DEFAULT_MAX_URLS, session=None, digest='md5'):
+        self.max_bytes = max_bytes
+        self.per_page = per_page
+        self.cache_bytes = cache_bytes
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_urls = max_urls
+        self.session = session
+        # Même empreinte que le cache des verdicts (--script-digest)
+        self.digest_name = digest
+        self.digest = digest_function(digest)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="script")
+        self._urls = OrderedDict()       # URL → Future[ExternalScript]
+        self._contents = OrderedDict()   # empreinte → texte
+        self._content_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"downloads": 0, "reused": 0, "refetched": 0, "errors": 0,
+                      "bytes_downloaded": 0, "content_evictions": 0}
+
+    def resolve(self, urls) -> dict:
+        """URL → Fetched pour les scripts d'une page (au plus per_page URLs
+        distinctes), les absents du cache téléchargés en parallèle"""
+        futures = {}
+        for url in urls:
+            if url in futures or not url.startswith(('http://', 'https://')):
+                continue
+            if len(futures) >= self.per_page:
+                break
+            futures[url] = self._lookup(url)
+        wait([future for future, _ in futures.values()])
+
+        fetched = {}
+        for url, (future, reused) in futures.items():
+            script = future.result()
+            content = self._content(script.digest)
+            if script.digest and content is None:
+                # Contenu évincé du budget mémoire : nouveau téléchargement par
+                # le pool, partagé avec les scans qui trouvent la même entrée
+                future, reused = self._lookup(url, stale=future)
+                script = future.result()
+                content = self._content(script.digest)
+            fetched[url] = Fetched(script, content, reused)
+        return fetched
+
+    def _lookup(self, url, stale=None):
+        """(future, déjà en cache) ; un seul téléchargement par URL même entre
+        threads. stale : entrée dont le contenu a été évincé, à remplacer"""
+        with self._lock:
+            future = self._urls.get(url)
+            if (future is not None and future is not stale
+                    and not (future.done() and future.result().expired(self.ttl))):
+                self._urls.move_to_end(url)
+                self.stats["reused"] += 1
+                return future, True
+            if stale is not None:
+                self.stats["refetched"] += 1
+            future = self._executor.submit(self._fetch, url)
+            self._urls[url] = future
+            if len(self._urls) > self.max_urls:
+                self._urls.popitem(last=False)
+            return future, False
+
+    def _fetch(self, url) -> ExternalScript:
+        session = self.session or get_session()
+        try:
+            response = fetch_bounded(session, url, max_bytes=self.max_bytes, oversize="truncate",
+                                     headers={'User-Agent': USER_AGENT}, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            return self._failed(url, f"{type(e).__name__}: {e}"[:200])
+        if "html" in response.headers.get("Content-Type", "").lower():
+            # Page d'erreur ou de consentement à la place du script
+            return self._failed(url, f"Contenu HTML (HTTP {response.status_code})")
+
+        content = response.text
+        digest = self.digest(content)
+        truncated = getattr(response, "truncated", False)
+        with self._lock:
+            self.stats["downloads"] += 1
+            self.stats["bytes_downloaded"] += len(response.content)
+            self._store(digest, content)
+        return ExternalScript(url, digest, len(response.content), truncated, minified_features(content))
+
+    def _failed(self, url, error) -> ExternalScript:
+        with self._lock:
+            self.stats["errors"] += 1
+        return ExternalScript(url, error=error)
+
+    def _store(self, digest, content):
+        """Contenu rangé par empreinte, LRU borné en octets (verrou tenu)"""
+        if digest in self._contents:
+            self._contents.move_to_end(digest)
+            return
+        self._contents[digest] = content
+        self._content_bytes += len(content)
+        while self._content_bytes > self.cache_bytes and len(self._contents) > 1:
+            _, evicted = self._contents.popitem(last=False)
+            self._content_bytes -= len(evicted)
+            self.stats["content_evictions"] += 1
+
+    def _content(self, digest):
+        if digest is None:
+            return None
+        with self._lock:
+            content = self._contents.get(digest)
+            if content is not None:
+                self._contents.move_to_end(digest)
+            return content
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "urls": len(self._urls), "contents": len(self._contents),
+                    "content_mb": round(self._content_bytes / 1024 / 1024, 1)}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+def configure_external_scripts(**kwargs) -> ExternalScriptFetcher:
+    """Active le téléchargement des scripts externes pour tous les MalwareScanner"""
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is not None:
+            _default_fetcher.close()
+        _default_fetcher = ExternalScriptFetcher(**kwargs)
+    return _default_fetcher
+
+
+def default_external_scripts() -> Optional[ExternalScriptFetcher]:
+    """Téléchargeur partagé du processus (None : scripts externes non analysés)"""
+    return _default_fetcher
+
+
+def add_external_script_arguments(parser):
+    """Options des scripts externes partagées par les CLIs"""
+    parser.add_argument("--external-scripts", action="store_true",
+                        help="Télécharge et analyse les scripts <script src> (cache partagé entre sites)")
+    parser.add_argument("--external-max-kb", type=int, default=DEFAULT_MAX_KB,
+                        help=f"Taille maximale d'un script externe en Ko (défaut : {DEFAULT_MAX_KB})")
+    parser.add_argument("--external-per-page", type=int, default=DEFAULT_PER_PAGE,
+                        help=f"Scripts externes téléchargés par page (défaut : {DEFAULT_PER_PAGE})")
+    parser.add_argument("--external-cache-mb", type=int, default=DEFAULT_CACHE_MB,
+                        help=f"Mémoire des contenus en cache en Mo (défaut : {DEFAULT_CACHE_MB})")
+
+
+def configure_external_from_args(args) -> Optional[ExternalScriptFetcher]:
+    if not args.external_scripts:
+        return None
+    return configure_external_scripts(max_bytes=args.external_max_kb * 1024,
+                                      per_page=args.external_per_page,
+                                      cache_bytes=args.external_cache_mb * 1024 * 1024,
+                                      digest=getattr(args, "script_digest", "md5"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Téléchargement et cache des scripts externes")
+    parser.add_argument("urls", nargs="+", help="URLs de scripts")
+    parser.add_argument("--repeat", type=int, default=2, help="Passes sur la liste (défaut : 2)")
+    args = parser.parse_args()
+
+    fetcher = ExternalScriptFetcher()
+    try:
+        for i in range(args.repeat):
+            start = time.perf_counter()
+            fetched = fetcher.resolve(args.urls)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"Passe {i + 1} : {len(fetched)} scripts en {elapsed:.1f} ms")
+            for url, item in fetched.items():
+                status = item.script.error or f"{item.script.size:,} octets, {fetcher.digest_name} {item.script.digest}"
+                print(f"  {'↺' if item.reused else '↓'} {url} : {status}")
+        print(f"✓ {fetcher.snapshot()}", file=sys.stderr)
+    finally:
+        fetcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Document HTML partagé entre les scanners
+Le HTML est parsé une seule fois ; les balises utiles aux analyseurs
+(scripts, iframes, liens, meta, formulaires) sont extraites en un parcours.
+
+Deux backends :
+  - html.parser  : arbre BeautifulSoup complet (comportement historique)
+  - lxml-stream  : parseur lxml événementiel, sans arbre DOM
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+from bs4 import BeautifulSoup
+from lxml import etree
+
+
+BACKENDS = ('html.parser', 'lxml-stream')
+DEFAULT_BACKEND = 'html.parser'
+
+# Taille des blocs envoyés au parseur événementiel
+FEED_CHUNK = 64 * 1024
+
+
+def set_default_backend(backend: str):
+    """Backend utilisé par HTMLDocument.parse quand aucun n'est précisé"""
+    global DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend HTML inconnu : {backend}")
+    DEFAULT_BACKEND = backend
+
+
+class ExtractedTag:
+    """Balise extraite par le backend lxml-stream (sous-ensemble de bs4.Tag)"""
+
+    __slots__ = ('name', 'attrs', '_texts')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self._texts = []
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def has_attr(self, key):
+        return key in self.attrs
+
+    @property
+    def string(self):
+        """Texte de la balise s'il est constitué d'un seul nœud (comme bs4)"""
+        return self._texts[0] if len(self._texts) == 1 else None
+
+    def get_text(self, separator='', strip=False):
+        texts = self._texts
+        if strip:
+            texts = [t.strip() for t in texts if t.strip()]
+        return separator.join(texts)
+
+
+class _StreamCollector:
+    """Cible du parseur lxml : ne conserve que les balises utiles"""
+
+    def __init__(self, document):
+        self.document = document
+        self.open_texts = []  # balises (script, a, title) dont on collecte le texte
+        self.pending = []     # morceaux du nœud texte courant
+        self.title_seen = False
+
+    def _flush(self):
+        if self.pending:
+            text = ''.join(self.pending)
+            self.pending = []
+            for tag in self.open_texts:
+                tag._texts.append(text)
+
+    def start(self, name, attrib):
+        self._flush()
+        doc = self.document
+        if name == 'script':
+            tag = ExtractedTag(name, dict(attrib))
+            doc.scripts.append(tag)
+            self.open_texts.append(tag)
+        elif name == 'iframe':
+            doc.iframes.append(ExtractedTag(name, dict(attrib)))
+        elif name == 'a':
+            tag = ExtractedTag(name, dict(attrib))
+            if 'href' in attrib:
+                doc.links.append(tag)
+            self.open_texts.append(tag)
+        elif name == 'meta':
+            doc.meta_count += 1
+        elif name == 'form':
+            doc.form_count += 1
+        elif name == 'title' and not self.title_seen:
+            self.title_seen = True
+            self.open_texts.append(ExtractedTag(name, {}))
+
+    def end(self, name):
+        self._flush()
+        if name in ('script', 'a', 'title'):
+            for i in range(len(self.open_texts) - 1, -1, -1):
+                if self.open_texts[i].name == name:
+                    tag = self.open_texts.pop(i)
+                    if name == 'title':
+                        self.document.title = tag.string
+                    break
+
+    def data(self, text):
+        if self.open_texts:
+            self.pending.append(text)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return self.document
+
+
+class HTMLDocument:
+    """Document HTML parsé une fois et réutilisé par tous les analyze_*"""
+
+    TAGS = ['script', 'iframe', 'a', 'meta', 'form']
+
+    def __init__(self, soup: BeautifulSoup = None):
+        self.soup = soup
+        self.backend = 'html.parser'
+        self.title = None
+        self.scripts = []
+        self.iframes = []
+        self.links = []
+        self.meta_count = 0
+        self.form_count = 0
+        if soup is None:
+            return
+
+        # Un seul parcours de l'arbre pour toutes les balises
+        for tag in soup.find_all(self.TAGS):
+            if tag.name == 'script':
+                self.scripts.append(tag)
+            elif tag.name == 'iframe':
+                self.iframes.append(tag)
+            elif tag.name == 'a':
+                if tag.has_attr('href'):
+                    self.links.append(tag)
+            elif tag.name == 'meta':
+                self.meta_count += 1
+            else:
+                self.form_count += 1
+
+        self.title = soup.title.string if soup.title else None
+
+    @property
+    def script_count(self):
+        return len(self.scripts)
+
+    @property
+    def iframe_count(self):
+        return len(self.iframes)
+
+    @classmethod
+    def parse(cls, content, backend: str = None) -> "HTMLDocument":
+        """Parse du HTML (str ou bytes) avec le backend choisi"""
+        backend = backend or DEFAULT_BACKEND
+        if backend == 'lxml-stream':
+            return cls.parse_stream(content)
+        if backend != 'html.parser':
+            raise ValueError(f"Backend HTML inconnu : {backend}")
+        return cls(BeautifulSoup(content, 'html.parser'))
+
+    @classmethod
+    def parse_stream(cls, content) -> "HTMLDocument":
+        """Extraction événementielle (lxml) sans construire d'arbre"""
+        document = cls()
+        document.backend = 'lxml-stream'
+        parser = etree.HTMLParser(target=_StreamCollector(document), recover=True)
+        for start in range(0, len(content), FEED_CHUNK):
+            parser.feed(content[start:start + FEED_CHUNK])
+        if not content:
+            parser.feed(b'' if isinstance(content, bytes) else '')
+        return parser.close()
+
+    @classmethod
+    def of(cls, source) -> "HTMLDocument":
+        """Accepte un HTMLDocument, un BeautifulSoup ou du HTML brut"""
+        if isinstance(source, cls):
+            return source
+        if isinstance(source, BeautifulSoup):
+            return cls(source)
+        return cls.parse(source)
+
+    def structure(self) -> dict:
+        """Résumé de structure (format de collection["html_structure"])"""
+        return {
+            # str simple : un NavigableString retient tout l'arbre (pickle, mémoire)
+            "title": str(self.title) if self.title is not None else None,
+            "meta_tags": self.meta_count,
+            "scripts": self.script_count,
+            "iframes": self.iframe_count,
+            "forms": self.form_count
+        }
+
+
+# ========== BENCHMARK ==========
+
+def _load_pages(paths):
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            pages.extend(record['html'] for record in json.load(f) if record.get('html'))
+    return pages
+
+
+def _bench_child(backend, paths, repeat):
+    """Mesure exécutée dans un processus neuf : temps de parsing et RSS crête"""
+    pages = _load_pages(paths)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            document = HTMLDocument.parse(html, backend)
+            document.structure()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "backend": backend,
+        "pages": len(pages),
+        "bytes": sum(len(p) for p in pages),
+        "parse_ms": round(elapsed / repeat * 1000, 1),
+        "peak_rss_delta_kb": peak - baseline
+    }))
+
+
+def benchmark(paths, repeat=5):
+    """Compare les backends, chacun dans un processus séparé"""
+    print(f"{'backend':<14} {'pages':>6} {'octets':>10} {'parsing':>10} {'RSS crête':>11}")
+    for backend in BACKENDS:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--bench-child', backend,
+             '--repeat', str(repeat), *paths],
+            capture_output=True, text=True, check=True
+        ).stdout
+        r = json.loads(out)
+        print(f"{r['backend']:<14} {r['pages']:>6} {r['bytes']:>10,} "
+              f"{r['parse_ms']:>8.1f}ms {r['peak_rss_delta_kb'] / 1024:>9.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des backends d'extraction HTML")
+    parser.add_argument("files", nargs="*", default=["data.json", "data_stream.json"],
+                        help="Jeux de données JSON contenant des champs html")
+    parser.add_argument("--repeat", type=int, default=5, help="Répétitions (défaut : 5)")
+    parser.add_argument("--bench-child", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.bench_child:
+        _bench_child(args.bench_child, args.files, args.repeat)
+    else:
+        benchmark(args.files, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
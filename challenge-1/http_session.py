@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Session HTTP partagée pour les scanners
+Pool de connexions keep-alive par hôte, politique de retry/backoff,
+compteurs de réutilisation des connexions et téléchargement borné
+(lecture par blocs, taille et empreinte incrémentales, plafond)
+"""
+
+import hashlib
+import threading
+from functools import partial
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Nombre de pools d'hôtes conservés / connexions keep-alive par hôte
+DEFAULT_POOL_CONNECTIONS = 100
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Plafond du corps décodé d'une réponse : au-delà, troncature ou abandon
+DEFAULT_MAX_BODY = 10 * 1024 * 1024
+DOWNLOAD_CHUNK = 64 * 1024
+OVERSIZE_POLICIES = ("truncate", "abort")
+
+_download = {"max_bytes": DEFAULT_MAX_BODY, "oversize": "truncate"}
+
+
+class ConnectionStats:
+    """Compteurs (thread-safe) de requêtes et de nouvelles connexions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            requests_count, new = self.requests, self.new_connections
+        reused = max(0, requests_count - new)
+        return {
+            "requests": requests_count,
+            "new_connections": new,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / requests_count, 3) if requests_count else 0.0
+        }
+
+
+def _counting_pool(base, stats):
+    """Sous-classe de pool urllib3 qui compte les connexions créées/réutilisées"""
+
+    class CountingPool(base):
+        def _make_request(self, conn, *args, **kwargs):
+            # Une connexion sans socket sera (re)ouverte : handshake complet
+            stats.increment("requests")
+            if getattr(conn, "sock", None) is None:
+                stats.increment("new_connections")
+            return super()._make_request(conn, *args, **kwargs)
+
+    CountingPool.__name__ = f"Counting{base.__name__}"
+    return CountingPool
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter dont les pools alimentent un ConnectionStats"""
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: _counting_pool(pool_cls, self.stats)
+            for scheme, pool_cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+
+def build_session(pool_connections=DEFAULT_POOL_CONNECTIONS,
+                  pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                  retries=DEFAULT_RETRIES,
+                  backoff_factor=DEFAULT_BACKOFF,
+                  verify=True):
+    """Construit une session requests avec pool keep-alive et retries"""
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False  # le scanner veut voir le code HTTP final
+    )
+    stats = ConnectionStats()
+    adapter = PooledAdapter(
+        stats,
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.verify = verify
+    session.connection_stats = stats
+    # La session est partagée entre sites : aucun cookie n'est conservé
+    # d'un scan à l'autre (les cookies d'une chaîne de redirection restent gérés)
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+# ========== TÉLÉCHARGEMENT BORNÉ ==========
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """Corps de réponse au-delà du plafond (politique « abort »)"""
+
+
+class BoundedBody:
+    """Corps lu par blocs : taille et SHA-256 incrémentaux, mémoire plafonnée.
+    Un décodeur optionnel (Content-Encoding) reçoit les blocs bruts et ne
+    produit jamais plus que la place restante."""
+
+    def __init__(self, max_bytes=None, oversize=None, decoder=None):
+        self.max_bytes = max_bytes or _download["max_bytes"]
+        self.oversize = oversize or _download["oversize"]
+        self.decoder = decoder
+        self.size = 0
+        self.truncated = False
+        self._chunks = []
+        self._sha256 = hashlib.sha256()
+
+    def check_length(self, declared):
+        """Content-Length annoncé : abandon avant toute lecture si nécessaire"""
+        if self.oversize == "abort" and self.decoder is None and declared > self.max_bytes:
+            raise ResponseTooLarge(f"Réponse trop volumineuse : {declared:,} octets annoncés "
+                                   f"(plafond {self.max_bytes:,})")
+
+    def feed(self, chunk) -> bool:
+        """Ajoute un bloc ; False quand le plafond est atteint (lecture à arrêter)"""
+        room = self.max_bytes - self.size
+        if self.decoder is not None:
+            chunk = self.decoder.decompress(chunk, room + 1)
+        if len(chunk) > room:
+            if self.oversize == "abort":
+                raise ResponseTooLarge(f"Réponse trop volumineuse : plus de {self.max_bytes:,} octets")
+            chunk = chunk[:room]
+            self.truncated = True
+        if chunk:
+            self._chunks.append(chunk)
+            self._sha256.update(chunk)
+            self.size += len(chunk)
+        return not self.truncated
+
+    def attach(self, response):
+        """Installe le corps borné dans la Response (content, body_sha256, truncated)"""
+        response._content = b"".join(self._chunks)
+        response._content_consumed = True
+        response.body_sha256 = self._sha256.hexdigest()
+        response.truncated = self.truncated
+        return response
+
+
+def read_bounded(response, max_bytes=None, oversize=None, **kwargs):
+    """Lit une réponse en streaming sans dépasser le plafond. Utilisable comme
+    hook « response » de requests (appelé aussi pour chaque redirection)."""
+    body = BoundedBody(max_bytes, oversize)
+    try:
+        length = response.headers.get("Content-Length", "")
+        if length.isdigit() and not response.headers.get("Content-Encoding"):
+            body.check_length(int(length))
+        for chunk in response.iter_content(DOWNLOAD_CHUNK):
+            if not body.feed(chunk):
+                break
+    except BaseException:
+        response.close()
+        raise
+    # Corps complet : urllib3 a déjà rendu la connexion au pool ;
+    # corps tronqué : le reste n'est pas lu, la connexion est fermée
+    response.close()
+    return body.attach(response)
+
+
+def fetch_bounded(session, url, max_bytes=None, oversize=None, **kwargs):
+    """GET dont le corps (et celui des redirections) est lu par blocs et plafonné"""
+    hook = partial(read_bounded, max_bytes=max_bytes, oversize=oversize)
+    return session.get(url, stream=True, hooks={"response": hook}, **kwargs)
+
+
+def configure_download(max_bytes=None, oversize=None):
+    """Plafond et politique par défaut des téléchargements bornés"""
+    if oversize is not None and oversize not in OVERSIZE_POLICIES:
+        raise ValueError(f"Politique inconnue : {oversize}")
+    if max_bytes:
+        _download["max_bytes"] = int(max_bytes)
+    if oversize:
+        _download["oversize"] = oversize
+
+
+def add_download_arguments(parser):
+    """Options de téléchargement borné partagées par les CLIs"""
+    parser.add_argument("--max-body", type=float, default=DEFAULT_MAX_BODY / (1024 * 1024), metavar="MO",
+                        help=f"Taille maximale d'une page téléchargée en Mo "
+                             f"(défaut : {DEFAULT_MAX_BODY // (1024 * 1024)})")
+    parser.add_argument("--oversize", choices=OVERSIZE_POLICIES, default="truncate",
+                        help="Au-delà du plafond : analyser le début de la page ou abandonner "
+                             "(défaut : truncate)")
+
+
+def configure_download_from_args(args):
+    """Applique --max-body / --oversize"""
+    configure_download(args.max_body * 1024 * 1024, args.oversize)
+
+
+# ========== SESSION PARTAGÉE ==========
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Session partagée par tout le processus (créée à la première utilisation)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = build_session()
+        return _session
+
+
+def configure_session(**kwargs):
+    """Remplace la session partagée (taille des pools, retries, vérification TLS)"""
+    global _session
+    session = build_session(**kwargs)
+    with _session_lock:
+        previous, _session = _session, session
+    if previous is not None:
+        previous.close()
+    return session
+
+
+def connection_stats(session=None):
+    """Statistiques de réutilisation des connexions de la session"""
+    session = session or get_session()
+    stats = getattr(session, "connection_stats", None)
+    return stats.snapshot() if stats else {}
@@ -6,20 +6,46 @@ Analyse une URL donnée et génère un rapport détaillé
 
 import argparse
 import requests
-import re
 import json
 from urllib.parse import urlparse, urljoin
 from datetime import datetime
-from bs4 import BeautifulSoup
-import hashlib
+import time
 from typing import Dict, List, Set
 
+from http_session import get_session, fetch_bounded, add_download_arguments, configure_download_from_args
+from html_document import HTMLDocument, BACKENDS, set_default_backend
+from pattern_engine import pattern_set_for, MAX_OFFSETS
+from obfuscation import obfuscation_features
+from metrics import ScanMetrics, profiled, add_metrics_arguments, metrics_options
+from script_cache import ScriptCache, default_script_cache, add_script_cache_arguments, configure_from_args
+from external_scripts import (ExternalScriptFetcher, default_external_scripts,
+                              add_external_script_arguments, configure_external_from_args)
+from domain_matcher import DomainMatcher, SUSPICIOUS_DOMAINS, default_matcher
+from result_sink import add_sink_arguments, sink_from_args
+from scan_state import (ScanStateStore, response_digest, validators, conditional_headers,
+                        malware_current, add_state_arguments, NEW, CHANGED, UNCHANGED, NOT_MODIFIED)
+
+
+# Clés de results produites par l'analyse (reprises par le pipeline combiné
+# et l'état des rescans incrémentaux)
+MALWARE_KEYS = (
+    "risk_level", "threats_found", "suspicious_patterns", "external_links",
+    "scripts", "iframes", "obfuscated_code", "security_headers", "script_cache"
+)
+
 
 class MalwareScanner:
     """Scanner de malware pour sites web"""
     
-    def __init__(self, url: str):
+    def __init__(self, url: str, session: requests.Session = None,
+                 domain_matcher: DomainMatcher = None, state_store: ScanStateStore = None,
+                 script_cache: ScriptCache = None, cpu_stage=None,
+                 metrics: ScanMetrics = None, profiler=None,
+                 external_scripts: ExternalScriptFetcher = None):
         self.url = url
+        self.session = session or get_session()
+        self.state_store = state_store
+        self.response = None
         self.parsed_url = urlparse(url)
         self.results = {
             "url": url,
@@ -34,41 +60,46 @@ class MalwareScanner:
             "risk_level": "LOW"
         }
         
-        # Patterns suspects courants
-        self.malicious_patterns = [
-            r'eval\s*\(',  # Exécution de code dynamique
-            r'document\.write',  # Injection de contenu
-            r'fromCharCode',  # Obfuscation de caractères
-            r'unescape\s*\(',  # Décodage suspect
-            r'atob\s*\(',  # Décodage base64
-            r'<iframe[^>]*src=["\']https?://(?!{})'.format(re.escape(self.parsed_url.netloc)),  # iframes externes
-            r'window\.location\s*=',  # Redirections
-            r'\.innerHTML\s*=',  # Injection HTML
-            r'base64_decode',  # Décodage base64 (PHP)
-            r'exec\s*\(',  # Exécution de commandes
-            r'shell_exec',  # Exécution shell
-            r'system\s*\(',  # Appels système
-            r'passthru',  # Exécution de commandes
-            r'cryptocurrency|bitcoin|ethereum|mining|cryptojacking',  # Cryptomining
-        ]
+        # Patterns suspects courants (compilés une fois par processus)
+        self.pattern_set = pattern_set_for(self.parsed_url.netloc)
+        self.malicious_patterns = self.pattern_set.sources
         
-        # Domaines suspects connus
-        self.suspicious_domains = [
-            'bit.ly', 'tinyurl.com', 'goo.gl',  # Raccourcisseurs d'URL
-            '.tk', '.ml', '.ga', '.cf', '.gq',  # TLDs gratuits souvent malveillants
-        ]
+        # Domaines suspects connus (index par suffixe de labels)
+        self.domain_matcher = domain_matcher or default_matcher()
+        self.suspicious_domains = list(SUSPICIOUS_DOMAINS)
+        
+        # Verdicts des scripts inline déjà vus (partagés entre les scans)
+        self.script_cache = script_cache or default_script_cache()
+        
+        # Scripts <script src> téléchargés et analysés (désactivé par défaut)
+        self.external_scripts = external_scripts or default_external_scripts()
+        
+        # Parsing et analyse dans un pool de processus (cpu_pipeline.CpuStage)
+        self.cpu_stage = cpu_stage
+        
+        # Durées par phase (partagées avec WebScanner dans le pipeline combiné)
+        self.metrics = metrics or ScanMetrics()
+        self.profiler = profiler
     
-    def fetch_content(self) -> tuple:
-        """Récupère le contenu de la page"""
+    def fetch_content(self, extra_headers: dict = None, verbose: bool = True) -> tuple:
+        """Récupère le contenu de la page (304 retourné tel quel, sans contenu)"""
         try:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Malware Scanner Bot)'
             }
-            response = requests.get(self.url, headers=headers, timeout=10, verify=True)
+            headers.update(extra_headers or {})
+            with self.metrics.phase("fetch"):
+                response = fetch_bounded(self.session, self.url, headers=headers, timeout=10)
+            self.metrics.count("bytes_downloaded", len(response.content))
             response.raise_for_status()
+            self.response = response
+            if self.cpu_stage is not None:
+                # Décodage laissé au pool CPU
+                return response.content, response.headers, response.status_code
             return response.text, response.headers, response.status_code
         except requests.exceptions.RequestException as e:
-            print(f"❌ Erreur lors de la récupération de l'URL: {e}")
+            if verbose:
+                print(f"❌ Erreur lors de la récupération de l'URL: {e}")
             return None, None, None
     
     def check_security_headers(self, headers: dict):
@@ -92,11 +123,25 @@ class MalwareScanner:
                     "description": f"En-tête de sécurité manquant: {header}"
                 })
     
-    def analyze_scripts(self, soup: BeautifulSoup):
+    def analyze_scripts(self, document: HTMLDocument):
         """Analyse les scripts JavaScript"""
-        scripts = soup.find_all('script')
+        document = HTMLDocument.of(document)
+        cache_stats = {"hits": 0, "misses": 0}
+        
+        # Scripts externes téléchargés en parallèle avant l'analyse (si activé)
+        external = {}
+        if self.external_scripts is not None:
+            with self.metrics.phase("fetch_external_scripts"):
+                external = self.external_scripts.resolve(
+                    urljoin(self.url, script.get('src')) for script in document.scripts
+                    if not script.string and script.get('src'))
+            external_stats = {
+                "downloaded": sum(not item.reused and item.content is not None for item in external.values()),
+                "reused": sum(item.reused and item.content is not None for item in external.values()),
+                "errors": sum(item.content is None for item in external.values())
+            }
         
-        for script in scripts:
+        for script in document.scripts:
             script_info = {
                 "src": script.get('src', 'inline'),
                 "inline": script.string is not None,
@@ -107,33 +152,15 @@ class MalwareScanner:
             # Analyse du contenu inline
             if script.string:
                 content = script.string
-                script_info["content_hash"] = hashlib.md5(content.encode()).hexdigest()
+                # Empreinte de l'algorithme du cache, calculée une seule fois
+                script_info["content_hash"] = self.script_cache.digest(content)
                 
-                # Recherche de patterns suspects
-                for pattern in self.malicious_patterns:
-                    matches = re.findall(pattern, content, re.IGNORECASE)
-                    if matches:
-                        script_info["suspicious"] = True
-                        self.results["suspicious_patterns"].append({
-                            "type": "suspicious_script_pattern",
-                            "pattern": pattern,
-                            "matches": len(matches),
-                            "context": content[:200]
-                        })
+                # Patterns et obfuscation calculés une fois par contenu distinct
+                verdict, hit = self.script_cache.analyze(content, self.pattern_set,
+                                                         script_info["content_hash"], self.metrics)
+                cache_stats["hits" if hit else "misses"] += 1
                 
-                # Détection d'obfuscation
-                if self.is_obfuscated(content):
-                    script_info["obfuscated"] = True
-                    self.results["obfuscated_code"].append({
-                        "type": "obfuscated_script",
-                        "hash": script_info["content_hash"],
-                        "sample": content[:100]
-                    })
-                    self.results["threats_found"].append({
-                        "type": "obfuscated_code",
-                        "severity": "HIGH",
-                        "description": "Code JavaScript fortement obfusqué détecté"
-                    })
+                self.record_script_verdict(script_info, verdict.matches, dict(verdict.features), content)
             
             # Vérification des scripts externes
             elif script.get('src'):
@@ -141,24 +168,88 @@ class MalwareScanner:
                 if not src.startswith(('http://', 'https://', '//')):
                     src = urljoin(self.url, src)
                 
-                script_info["external_domain"] = urlparse(src).netloc
+                parsed_src = urlparse(src)
+                script_info["external_domain"] = parsed_src.netloc
                 
-                # Vérification de domaines suspects
-                if any(domain in src for domain in self.suspicious_domains):
+                # Vérification de domaines suspects (nom d'hôte uniquement)
+                if parsed_src.hostname and self.domain_matcher.match_host(parsed_src.hostname):
                     script_info["suspicious"] = True
                     self.results["threats_found"].append({
                         "type": "suspicious_external_script",
                         "severity": "HIGH",
                         "description": f"Script provenant d'un domaine suspect: {src}"
                     })
+                
+                # Chaque URL n'est analysée qu'une fois par page
+                fetched = external.pop(urljoin(self.url, src), None)
+                if fetched is not None:
+                    self.analyze_external_script(script_info, fetched)
             
             self.results["scripts"].append(script_info)
+        
+        inline = cache_stats["hits"] + cache_stats["misses"]
+        cache_stats["hit_rate"] = round(cache_stats["hits"] / inline, 3) if inline else 0.0
+        if self.external_scripts is not None:
+            cache_stats["external"] = external_stats
+        self.results["script_cache"] = cache_stats
+    
+    def analyze_external_script(self, script_info: dict, fetched):
+        """Script externe téléchargé : mêmes patterns que le contenu inline,
+        obfuscation jugée avec les critères du code minifié"""
+        script = fetched.script
+        if fetched.content is None:
+            script_info["fetch_error"] = script.error
+            return
+        script_info["content_hash"] = script.digest
+        script_info["size"] = script.size
+        if script.truncated:
+            script_info["truncated"] = True
+        # Empreinte réutilisée si le téléchargeur hache avec le même algorithme que le cache
+        digest = script.digest if self.external_scripts.digest_name == self.script_cache.digest_name else None
+        verdict, _ = self.script_cache.analyze(fetched.content, self.pattern_set, digest, self.metrics)
+        self.record_script_verdict(script_info, verdict.matches, script.features, fetched.content, script.url)
     
-    def analyze_iframes(self, soup: BeautifulSoup):
+    def record_script_verdict(self, script_info: dict, matches, features: dict, content: str,
+                              src: str = None):
+        """Patterns suspects et obfuscation d'un script (src : script externe)"""
+        # Recherche de patterns suspects (une passe pour tout le jeu)
+        for pattern, count, offsets in matches:
+            script_info["suspicious"] = True
+            match = {
+                "type": "suspicious_script_pattern",
+                "pattern": pattern,
+                "matches": count,
+                "offsets": offsets[:MAX_OFFSETS],
+                "context": content[:200]
+            }
+            if src:
+                match["src"] = src
+            self.results["suspicious_patterns"].append(match)
+        
+        # Détection d'obfuscation
+        if features["obfuscated"]:
+            script_info["obfuscated"] = True
+            sample = {
+                "type": "obfuscated_script",
+                "hash": script_info["content_hash"],
+                "sample": content[:100],
+                "features": features
+            }
+            if src:
+                sample["src"] = src
+            self.results["obfuscated_code"].append(sample)
+            self.results["threats_found"].append({
+                "type": "obfuscated_code",
+                "severity": "HIGH",
+                "description": f"Script externe fortement obfusqué: {src}" if src
+                               else "Code JavaScript fortement obfusqué détecté"
+            })
+    
+    def analyze_iframes(self, document: HTMLDocument):
         """Analyse les iframes"""
-        iframes = soup.find_all('iframe')
+        document = HTMLDocument.of(document)
         
-        for iframe in iframes:
+        for iframe in document.iframes:
             src = iframe.get('src', '')
             iframe_info = {
                 "src": src,
@@ -170,7 +261,7 @@ class MalwareScanner:
                 iframe_info["external"] = True
                 iframe_domain = urlparse(src).netloc if src.startswith('http') else 'unknown'
                 
-                if any(domain in src for domain in self.suspicious_domains):
+                if self.domain_matcher.match(src):
                     iframe_info["suspicious"] = True
                     self.results["threats_found"].append({
                         "type": "suspicious_iframe",
@@ -190,15 +281,16 @@ class MalwareScanner:
             
             self.results["iframes"].append(iframe_info)
     
-    def analyze_links(self, soup: BeautifulSoup):
+    def analyze_links(self, document: HTMLDocument):
         """Analyse les liens externes"""
-        links = soup.find_all('a', href=True)
+        document = HTMLDocument.of(document)
         external_links = []
         
-        for link in links:
+        for link in document.links:
             href = link.get('href')
             if href.startswith(('http://', 'https://')):
-                link_domain = urlparse(href).netloc
+                parsed_href = urlparse(href)
+                link_domain = parsed_href.netloc
                 if link_domain != self.parsed_url.netloc:
                     external_links.append({
                         "url": href,
@@ -207,7 +299,7 @@ class MalwareScanner:
                     })
                     
                     # Vérification de domaines suspects
-                    if any(domain in href for domain in self.suspicious_domains):
+                    if parsed_href.hostname and self.domain_matcher.match_host(parsed_href.hostname):
                         self.results["threats_found"].append({
                             "type": "suspicious_link",
                             "severity": "MEDIUM",
@@ -218,76 +310,135 @@ class MalwareScanner:
     
     def is_obfuscated(self, code: str) -> bool:
         """Détecte si le code est obfusqué"""
-        # Critères d'obfuscation
-        if len(code) < 100:
-            return False
-        
-        # Ratio de caractères non-alphanumériques élevé
-        non_alnum = sum(1 for c in code if not c.isalnum() and c not in ' \n\t')
-        ratio = non_alnum / len(code)
-        
-        # Présence de chaînes hexadécimales longues
-        hex_strings = re.findall(r'\\x[0-9a-fA-F]{2}', code)
-        
-        # Noms de variables suspects (très courts ou aléatoires)
-        short_vars = re.findall(r'\b[a-zA-Z_][a-zA-Z0-9_]{0,2}\b', code)
-        
-        return ratio > 0.4 or len(hex_strings) > 10 or len(short_vars) > 50
+        return obfuscation_features(code)["obfuscated"]
     
-    def calculate_risk_level(self):
-        """Calcule le niveau de risque global"""
-        high_threats = sum(1 for t in self.results["threats_found"] if t["severity"] == "HIGH")
-        medium_threats = sum(1 for t in self.results["threats_found"] if t["severity"] == "MEDIUM")
+    @staticmethod
+    def risk_level_for(threats) -> str:
+        """Niveau de risque d'une liste de menaces (règle reprise par bulk_scoring)"""
+        high_threats = sum(1 for t in threats if t["severity"] == "HIGH")
+        medium_threats = sum(1 for t in threats if t["severity"] == "MEDIUM")
         
         if high_threats >= 3 or (high_threats >= 1 and medium_threats >= 3):
-            self.results["risk_level"] = "CRITICAL"
+            return "CRITICAL"
         elif high_threats >= 1 or medium_threats >= 3:
-            self.results["risk_level"] = "HIGH"
+            return "HIGH"
         elif medium_threats >= 1:
-            self.results["risk_level"] = "MEDIUM"
-        else:
-            self.results["risk_level"] = "LOW"
+            return "MEDIUM"
+        return "LOW"
+    
+    def calculate_risk_level(self):
+        """Calcule le niveau de risque global"""
+        self.results["risk_level"] = self.risk_level_for(self.results["threats_found"])
     
-    def scan(self) -> Dict:
+    def scan(self, verbose: bool = True) -> Dict:
         """Effectue le scan complet"""
-        print(f"🔍 Début du scan de: {self.url}")
-        
-        # Récupération du contenu
-        content, headers, status_code = self.fetch_content()
+        if verbose:
+            print(f"🔍 Début du scan de: {self.url}")
+        
+        with profiled(self.profiler, self.parsed_url.netloc, self.metrics), self.metrics.phase("scan"):
+            # Récupération du contenu (conditionnelle si un résultat est réutilisable)
+            previous, extra_headers = self.previous_scan()
+            content, headers, status_code = self.fetch_content(extra_headers, verbose)
+            self.process_content(content, headers, status_code, previous, verbose)
+        self.results["metrics"] = self.metrics.to_dict()
+        return self.results
+    
+    def previous_scan(self) -> tuple:
+        """(état précédent, en-têtes conditionnels) pour un rescan incrémental"""
+        previous = self.state_store.get(self.url) if self.state_store else None
+        return previous, (conditional_headers(previous) if malware_current(previous) else None)
+    
+    def process_content(self, content, headers, status_code, previous, verbose: bool = True) -> Dict:
+        """Analyse du contenu récupéré (moteurs synchrone et asyncio)"""
+        echo = print if verbose else (lambda *args: None)
+        reusable = malware_current(previous)
+        if status_code == 304 and reusable:
+            return self.reuse_previous(previous, NOT_MODIFIED, echo)
         if not content:
             self.results["error"] = "Impossible de récupérer le contenu"
             return self.results
         
-        print(f"✓ Contenu récupéré (Code: {status_code})")
+        echo(f"✓ Contenu récupéré (Code: {status_code})")
+        if getattr(self.response, "truncated", False):
+            # Seul le début de la page (plafond de téléchargement) est analysé
+            self.results["truncated"] = True
+            echo(f"⚠️  Page tronquée à {len(self.response.content):,} octets")
+        
+        digest = None
+        if self.state_store is not None:
+            digest = response_digest(self.response)
+            if reusable and digest == previous["digest"]:
+                return self.reuse_previous(previous, UNCHANGED, echo)
+        
+        if self.cpu_stage is not None:
+            # Parsing et analyse dans un processus du pool CPU
+            with self.metrics.phase("cpu_stage"):
+                result = self.cpu_stage.analyze_content(self.url, self.response)
+            self.metrics.merge(result.pop("metrics"))
+            self.results.update(result)
+        else:
+            # Parsing HTML
+            with self.metrics.phase("parse"):
+                document = HTMLDocument.parse(content)
+            self.metrics.record_document(document)
+            
+            self.analyze_document(document, headers, verbose)
         
-        # Analyse des en-têtes de sécurité
-        print("🔒 Vérification des en-têtes de sécurité...")
-        self.check_security_headers(headers)
+        if self.state_store is not None:
+            status = CHANGED if previous else NEW
+            self.state_store.record(status)
+            self.results["incremental"] = {"status": status}
+            self.state_store.save(self.url, validators(headers), digest,
+                                  malware={key: self.results[key] for key in MALWARE_KEYS})
         
-        # Parsing HTML
-        soup = BeautifulSoup(content, 'html.parser')
+        echo(f"✅ Scan terminé - Niveau de risque: {self.results['risk_level']}")
+        
+        return self.results
+    
+    def reuse_previous(self, previous: dict, status: str, echo=print) -> Dict:
+        """Contenu inchangé depuis le dernier scan : résultat précédent repris"""
+        self.results.update(previous["malware"])
+        self.results["incremental"] = {"status": status}
+        self.state_store.record(status)
+        reason = "304 Not Modified" if status == NOT_MODIFIED else "empreinte identique"
+        echo(f"✓ Contenu inchangé ({reason}) : résultat précédent réutilisé")
+        echo(f"✅ Scan terminé - Niveau de risque: {self.results['risk_level']}")
+        return self.results
+    
+    def analyze_document(self, document: HTMLDocument, headers: dict, verbose: bool = True) -> Dict:
+        """Analyse un document déjà récupéré et parsé (aucun accès réseau, hors
+        scripts externes si leur téléchargement est activé)"""
+        echo = print if verbose else (lambda *args: None)
+        
+        # Analyse des en-têtes de sécurité
+        echo("🔒 Vérification des en-têtes de sécurité...")
+        with self.metrics.phase("check_security_headers"):
+            self.check_security_headers(headers)
         
         # Analyse des scripts
-        print("📜 Analyse des scripts JavaScript...")
-        self.analyze_scripts(soup)
+        echo("📜 Analyse des scripts JavaScript...")
+        with self.metrics.phase("analyze_scripts"):
+            self.analyze_scripts(document)
         
         # Analyse des iframes
-        print("🖼️  Analyse des iframes...")
-        self.analyze_iframes(soup)
+        echo("🖼️  Analyse des iframes...")
+        with self.metrics.phase("analyze_iframes"):
+            self.analyze_iframes(document)
         
         # Analyse des liens
-        print("🔗 Analyse des liens externes...")
-        self.analyze_links(soup)
+        echo("🔗 Analyse des liens externes...")
+        with self.metrics.phase("analyze_links"):
+            self.analyze_links(document)
         
         # Calcul du niveau de risque
-        self.calculate_risk_level()
-        
-        print(f"✅ Scan terminé - Niveau de risque: {self.results['risk_level']}")
+        with self.metrics.phase("calculate_risk_level"):
+            self.calculate_risk_level()
         
         return self.results
     
-    def generate_report(self, output_file: str = None):
-        """Génère un rapport détaillé"""
+    def generate_report(self, output_file: str = None, save_files: bool = True):
+        """Génère un rapport détaillé (fichiers texte / JSON sauf save_files=False)"""
+        start, cpu_start = time.perf_counter(), time.thread_time()
         risk_colors = {
             "LOW": "🟢",
             "MEDIUM": "🟡",
@@ -325,6 +476,10 @@ class MalwareScanner:
         # Scripts analysés
         report.append(f"\n\n📜 SCRIPTS ANALYSÉS: {len(self.results['scripts'])}")
         report.append("-" * 80)
+        external = self.results.get('script_cache', {}).get('external')
+        if external:
+            report.append(f"Scripts externes analysés: {external['downloaded']} téléchargés, "
+                          f"{external['reused']} en cache, {external['errors']} échecs")
         suspicious_scripts = [s for s in self.results['scripts'] if s.get('suspicious', False)]
         if suspicious_scripts:
             report.append(f"⚠️  Scripts suspects: {len(suspicious_scripts)}")
@@ -391,10 +546,14 @@ class MalwareScanner:
         print("\n" + report_text)
         
         # Sauvegarde dans un fichier
-        if output_file:
+        if output_file and save_files:
             with open(output_file, 'w', encoding='utf-8') as f:
                 f.write(report_text)
             print(f"\n💾 Rapport sauvegardé dans: {output_file}")
+        self.metrics.add_phase("report", time.perf_counter() - start, time.thread_time() - cpu_start)
+        self.results["metrics"] = self.metrics.to_dict()
+        if not save_files:
+            return report_text
         
         # Sauvegarde JSON
         json_file = output_file.replace('.txt', '.json') if output_file else 'scan_results.json'
@@ -421,8 +580,23 @@ Exemples d'utilisation:
     parser.add_argument('url', help='URL du site à analyser')
     parser.add_argument('-o', '--output', help='Fichier de sortie pour le rapport (optionnel)')
     parser.add_argument('-v', '--verbose', action='store_true', help='Mode verbeux')
+    parser.add_argument('--blocklist', help='Liste de domaines suspects supplémentaires (un par ligne)')
+    parser.add_argument('--parser', choices=BACKENDS, default='html.parser',
+                        help="Backend d'extraction HTML (défaut : html.parser)")
+    add_state_arguments(parser)
+    add_script_cache_arguments(parser)
+    add_external_script_arguments(parser)
+    add_metrics_arguments(parser)
+    add_download_arguments(parser)
+    add_sink_arguments(parser)
+    parser.add_argument('--no-files', action='store_true',
+                        help="N'écrit pas les fichiers texte / JSON du rapport (résultat via --sink)")
     
     args = parser.parse_args()
+    set_default_backend(args.parser)
+    configure_from_args(args)
+    configure_external_from_args(args)
+    configure_download_from_args(args)
     
     # Validation de l'URL
     if not args.url.startswith(('http://', 'https://')):
@@ -430,7 +604,10 @@ Exemples d'utilisation:
         return
     
     # Création du scanner
-    scanner = MalwareScanner(args.url)
+    matcher = DomainMatcher.from_file(args.blocklist, SUSPICIOUS_DOMAINS) if args.blocklist else None
+    state_store = ScanStateStore(args.state_db) if args.state_db else None
+    scanner = MalwareScanner(args.url, domain_matcher=matcher, state_store=state_store,
+                             **metrics_options(args))
     
     # Exécution du scan
     try:
@@ -438,7 +615,11 @@ Exemples d'utilisation:
         
         # Génération du rapport
         output_file = args.output or f"malware_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-        scanner.generate_report(output_file)
+        scanner.generate_report(output_file, save_files=not args.no_files)
+        sink = sink_from_args(args)
+        if sink is not None:
+            with sink:
+                sink.write(results)
         
     except Exception as e:
         print(f"❌ Erreur lors de l'analyse: {e}")
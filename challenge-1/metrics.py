@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Instrumentation des scans
+Durées par phase (temps mur et temps CPU du thread), octets téléchargés,
+balises extraites et temps passé dans les expressions régulières, écrits
+dans results["metrics"]. Profilage optionnel d'un scan complet : cProfile
+(un fichier .prof par scan) et tracemalloc (pic mémoire).
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import pstats
+import argparse
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+
+class ScanMetrics:
+    """Mesures d'un scan ; les phases peuvent être mesurées depuis plusieurs threads"""
+
+    def __init__(self):
+        self.phases = {}      # nom → {"wall_ms", "cpu_ms", "calls"}
+        self.counters = {}    # bytes_downloaded, regex_ms, obfuscation_ms...
+        self.tags = {}
+        self.profile = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name, cpu=True):
+        """Mesure un bloc ; cpu=False pour une coroutine (le temps CPU du thread
+        de la boucle inclurait les autres scans)"""
+        wall = time.perf_counter()
+        cpu_start = time.thread_time() if cpu else None
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - wall,
+                           time.thread_time() - cpu_start if cpu else None)
+
+    def add_phase(self, name, wall, cpu=None):
+        with self._lock:
+            entry = self.phases.setdefault(name, {"wall_ms": 0.0, "cpu_ms": 0.0 if cpu is not None else None,
+                                                  "calls": 0})
+            entry["wall_ms"] += wall * 1000
+            if cpu is not None:
+                entry["cpu_ms"] = (entry["cpu_ms"] or 0.0) + cpu * 1000
+            entry["calls"] += 1
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_document(self, document):
+        """Balises extraites par le parsing (HTMLDocument)"""
+        self.tags = {
+            "scripts": document.script_count,
+            "iframes": document.iframe_count,
+            "links": len(document.links),
+            "meta": document.meta_count,
+            "forms": document.form_count
+        }
+
+    def merge(self, other: dict):
+        """Intègre les mesures d'un autre processus (étage CPU)"""
+        for name, entry in other.get("phases", {}).items():
+            with self._lock:
+                self.phases[name] = dict(entry)
+        for name, value in other.get("counters", {}).items():
+            self.count(name, value)
+        if other.get("tags"):
+            self.tags = dict(other["tags"])
+
+    def to_dict(self):
+        with self._lock:
+            phases = {name: {"wall_ms": round(entry["wall_ms"], 2),
+                             "cpu_ms": None if entry["cpu_ms"] is None else round(entry["cpu_ms"], 2),
+                             "calls": entry["calls"]}
+                      for name, entry in self.phases.items()}
+            counters = {name: round(value, 2) if isinstance(value, float) else value
+                        for name, value in self.counters.items()}
+        metrics = {"phases": phases, "counters": counters, "tags": dict(self.tags)}
+        if self.profile is not None:
+            metrics["profile"] = self.profile
+        return metrics
+
+
+class Profiler:
+    """Profilage optionnel de scans entiers (cProfile, tracemalloc)"""
+
+    def __init__(self, profile_dir=None, trace_memory=False):
+        self.profile_dir = profile_dir
+        self.trace_memory = trace_memory
+        # cProfile et tracemalloc sont globaux au thread / au processus :
+        # un seul scan profilé à la fois
+        self._lock = threading.Lock()
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    @property
+    def sequential(self):
+        """cProfile ne voit que le thread courant : collecte séquentielle"""
+        return bool(self.profile_dir)
+
+    @contextmanager
+    def scan(self, label, metrics: ScanMetrics):
+        with self._lock:
+            profiler = cProfile.Profile() if self.profile_dir else None
+            if self.trace_memory:
+                tracemalloc.start()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                yield
+            finally:
+                info = {}
+                if profiler is not None:
+                    profiler.disable()
+                    path = os.path.join(self.profile_dir, f"{_safe_name(label)}_{int(time.time() * 1000)}.prof")
+                    profiler.dump_stats(path)
+                    info["cprofile"] = path
+                if self.trace_memory:
+                    current, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    info["memory_peak_kb"] = round(peak / 1024, 1)
+                    info["memory_retained_kb"] = round(current / 1024, 1)
+                metrics.profile = info
+
+
+@contextmanager
+def profiled(profiler, label, metrics):
+    """Contexte de profilage si un Profiler est configuré, sinon rien"""
+    if profiler is None:
+        yield
+    else:
+        with profiler.scan(label, metrics):
+            yield
+
+
+def _safe_name(label):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', label)[:100]
+
+
+def add_metrics_arguments(parser):
+    """Options de profilage partagées par les CLIs"""
+    parser.add_argument("--profile-dir", metavar="DOSSIER",
+                        help="Profil cProfile de chaque scan (un fichier .prof par site, collecte séquentielle)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Pic mémoire de chaque scan via tracemalloc (scans profilés un par un)")
+
+
+def metrics_options(args):
+    """Arguments de scanner correspondant aux options de profilage"""
+    if not (getattr(args, "profile_dir", None) or getattr(args, "trace_memory", False)):
+        return {"profiler": None}
+    return {"profiler": Profiler(args.profile_dir, args.trace_memory)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthèse des mesures d'un fichier NDJSON de résultats")
+    parser.add_argument("ndjson", help="Résultats de scan (une ligne JSON par site)")
+    parser.add_argument("--top", type=int, default=10, help="Sites les plus lents affichés (défaut : 10)")
+    parser.add_argument("--prof", metavar="FICHIER", help="Affiche un profil cProfile (.prof)")
+    args = parser.parse_args()
+
+    if args.prof:
+        pstats.Stats(args.prof).sort_stats("cumulative").print_stats(25)
+        return
+
+    totals, slowest = {}, []
+    with open(args.ndjson, encoding="utf-8") as f:
+        for line in f:
+            result = json.loads(line)
+            phases = (result.get("metrics") or {}).get("phases", {})
+            for name, entry in phases.items():
+                total = totals.setdefault(name, {"wall_ms": 0.0, "cpu_ms": 0.0, "sites": 0})
+                total["wall_ms"] += entry["wall_ms"]
+                total["cpu_ms"] += entry["cpu_ms"] or 0.0
+                total["sites"] += 1
+            if "scan" in phases:
+                slowest.append((phases["scan"]["wall_ms"], result.get("url")))
+
+    print(f"{'phase':<28} {'sites':>6} {'mur moy. ms':>12} {'CPU moy. ms':>12}")
+    for name, total in sorted(totals.items(), key=lambda item: -item[1]["wall_ms"]):
+        print(f"{name:<28} {total['sites']:>6} {total['wall_ms'] / total['sites']:>12.1f} "
+              f"{total['cpu_ms'] / total['sites']:>12.1f}")
+    print(f"\n🐢 {args.top} scans les plus lents :")
+    for scan_ms, url in sorted(slowest, reverse=True)[:args.top]:
+        print(f"   {scan_ms:>9.1f} ms  {url}")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Détection d'obfuscation JavaScript
+Calcule le vecteur de caractéristiques (ratio non alphanumérique, séquences
+hexadécimales, identifiants courts, entropie) sans construire de listes :
+comptages d'octets en C pour le ratio, puis un seul parcours de tokens avec
+sortie anticipée dès qu'un seuil est franchi.
+"""
+
+import re
+import math
+import string
+from collections import Counter
+
+
+# Seuils historiques de MalwareScanner.is_obfuscated
+MIN_LENGTH = 100
+MAX_NON_ALNUM_RATIO = 0.4
+MAX_HEX_ESCAPES = 10
+MAX_SHORT_IDENTIFIERS = 50
+
+# Un seul scanner de tokens :
+#   groupe 1 : le « \ » d'une séquence \xHH (le mot « xHH » reste un token)
+#   groupe 2 : identifiant court complet, équivalent à \b[a-zA-Z_][a-zA-Z0-9_]{0,2}\b
+#   sinon    : mot plus long consommé en entier
+_TOKENS = re.compile(r'(\\)(?=x[0-9a-fA-F]{2})|\b([a-zA-Z_][a-zA-Z0-9_]{0,2})\b|\w+')
+
+_ASCII_ALNUM = (string.ascii_letters + string.digits).encode()
+_ASCII_RUNS = re.compile(r'[\x00-\x7f]+')
+
+# L'entropie est estimée sur un préfixe borné du script
+ENTROPY_SAMPLE = 8192
+
+# Code minifié (scripts externes) : identifiants courts et ponctuation dense
+# y sont la norme, seuls les échappements \xHH et les identifiants _0x…
+# (générateurs d'obfuscation) comptent, rapportés à la taille
+MAX_HEX_DENSITY = 2.0    # occurrences par Ko
+_HEX_ESCAPES = re.compile(r'\\x[0-9a-fA-F]{2}')
+_HEX_IDENTIFIERS = re.compile(r'\b_0x[0-9a-fA-F]{3,}')
+
+
+def _alnum_and_whitespace(code: str):
+    """Nombre de caractères alphanumériques et d'espaces ignorés (' ', \\n, \\t)"""
+    data = code.encode('utf-8', 'surrogatepass')
+    # Les octets d'un caractère multi-octets sont >= 0x80 : translate ne
+    # retire que les alphanumériques ASCII
+    alnum = len(data) - len(data.translate(None, _ASCII_ALNUM))
+    whitespace = data.count(b' ') + data.count(b'\n') + data.count(b'\t')
+    if not code.isascii():
+        alnum += sum(1 for char in _ASCII_RUNS.sub('', code) if char.isalnum())
+    return alnum, whitespace
+
+
+def _entropy(sample: str) -> float:
+    """Entropie de Shannon (bits par caractère)"""
+    length = len(sample)
+    return -sum((count / length) * math.log2(count / length)
+                for count in Counter(sample).values())
+
+
+def obfuscation_features(code: str, early_exit: bool = True) -> dict:
+    """Vecteur de caractéristiques d'obfuscation et verdict
+
+    Avec early_exit, le parcours s'arrête dès qu'un critère est atteint :
+    les compteurs retournés sont alors des minorants.
+    """
+    length = len(code)
+    features = {
+        "obfuscated": False,
+        "length": length,
+        "non_alnum_ratio": 0.0,
+        "hex_escapes": 0,
+        "short_identifiers": 0,
+        "entropy": 0.0,
+        "early_exit": False
+    }
+    if length < MIN_LENGTH:
+        return features
+
+    alnum, whitespace = _alnum_and_whitespace(code)
+    ratio = (length - alnum - whitespace) / length
+    features["non_alnum_ratio"] = round(ratio, 4)
+    features["entropy"] = round(_entropy(code[:ENTROPY_SAMPLE]), 4)
+
+    if ratio > MAX_NON_ALNUM_RATIO:
+        features["obfuscated"] = True
+        if early_exit:
+            features["early_exit"] = True
+            return features
+
+    hex_escapes = short_identifiers = 0
+    for match in _TOKENS.finditer(code):
+        group = match.lastindex
+        if group == 1:
+            hex_escapes += 1
+        elif group == 2:
+            short_identifiers += 1
+        else:
+            continue
+        if hex_escapes > MAX_HEX_ESCAPES or short_identifiers > MAX_SHORT_IDENTIFIERS:
+            features["obfuscated"] = True
+            if early_exit:
+                features["early_exit"] = True
+                break
+
+    features["hex_escapes"] = hex_escapes
+    features["short_identifiers"] = short_identifiers
+    return features
+
+
+def minified_features(code: str) -> dict:
+    """Caractéristiques et verdict d'obfuscation pour du code minifié
+    (bibliothèques externes), indépendants de la taille du script"""
+    kilobytes = max(len(code) / 1024, 1.0)
+    hex_escapes = len(_HEX_ESCAPES.findall(code))
+    hex_identifiers = len(_HEX_IDENTIFIERS.findall(code))
+    escape_density = hex_escapes / kilobytes
+    identifier_density = hex_identifiers / kilobytes
+    return {
+        "obfuscated": escape_density > MAX_HEX_DENSITY or identifier_density > MAX_HEX_DENSITY,
+        "length": len(code),
+        "hex_escapes": hex_escapes,
+        "hex_identifiers": hex_identifiers,
+        "hex_density": round(max(escape_density, identifier_density), 2),
+        "entropy": round(_entropy(code[:ENTROPY_SAMPLE]), 4)
+    }
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Analyse hors ligne d'enregistrements pré-collectés
+Reconstruit results["collection"] et le HTML à partir d'un enregistrement
+de type data.json / data_stream.json (html, ssl, whois, http_sec, cookies,
+TLS_expiry_days, Domain_age_days), puis exécute tous les analyze_* et le
+calcul de risque sans aucun accès réseau.
+"""
+
+import ast
+import sys
+import json
+import argparse
+from datetime import datetime
+from urllib.parse import urlparse
+
+from web_scanner import WebScanner
+from malware_scanner import MalwareScanner
+from html_document import HTMLDocument, BACKENDS, set_default_backend
+from scan_pipeline import MALWARE_KEYS
+from stream_reader import iter_records
+from script_cache import add_script_cache_arguments, configure_from_args
+from rule_engine import add_rules_arguments, configure_rules_from_args
+
+
+# Champs http_sec de l'enregistrement → en-têtes HTTP correspondants
+HTTP_SEC_HEADERS = {
+    "strictTransportPolicy": "Strict-Transport-Security",
+    "contentSecurityPolicy": "Content-Security-Policy",
+    "xFrameOptions": "X-Frame-Options",
+    "xContentTypeOptions": "X-Content-Type-Options",
+    "xXSSProtection": "X-XSS-Protection"
+}
+
+# Repli sur les indicateurs à plat quand http_sec est absent
+FLAT_HEADER_FLAGS = {
+    "HSTS_header": "Strict-Transport-Security",
+    "CSP_header": "Content-Security-Policy",
+    "X_Frame_Options": "X-Frame-Options"
+}
+
+# Valeur des en-têtes dont seule la présence est archivée
+ARCHIVED_HEADER_VALUE = "present"
+
+CERT_DATE_FORMAT = "%b %d %H:%M:%S %Y GMT"
+
+
+def _value(raw):
+    """Normalise les valeurs sérialisées en texte ("303", "None", "False")"""
+    if isinstance(raw, str):
+        text = raw.strip()
+        if text in ("", "None", "null"):
+            return None
+        if text in ("True", "true"):
+            return True
+        if text in ("False", "false"):
+            return False
+        try:
+            return int(text)
+        except ValueError:
+            try:
+                return float(text)
+            except ValueError:
+                return raw
+    return raw
+
+
+def numeric_value(raw):
+    """Valeur numérique d'un champ archivé (None si absente ou non numérique)"""
+    value = _value(raw)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def _mapping(raw):
+    """Dictionnaire d'un bloc JSON, ou repr Python (format de data.json)"""
+    if isinstance(raw, dict):
+        return raw
+    if isinstance(raw, str) and raw.strip().startswith("{"):
+        try:
+            return ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            try:
+                return json.loads(raw)
+            except ValueError:
+                return {}
+    return {}
+
+
+def _cert_date(text):
+    try:
+        return datetime.strptime(text, CERT_DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_date(text):
+    if not isinstance(text, str):
+        return None
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return _cert_date(text)
+
+
+def http_from_record(record, html_size):
+    """collection["http"] reconstruit (pas de redirections archivées)"""
+    http_sec = _mapping(record.get("http_sec"))
+    headers = {}
+    if http_sec and "error" not in http_sec:
+        for field, header in HTTP_SEC_HEADERS.items():
+            if _value(http_sec.get(field)):
+                headers[header] = ARCHIVED_HEADER_VALUE
+    else:
+        for field, header in FLAT_HEADER_FLAGS.items():
+            if _value(record.get(field)):
+                headers[header] = ARCHIVED_HEADER_VALUE
+
+    cookies = _mapping(record.get("cookies")).get("headerCookies") or []
+    if cookies:
+        headers["Set-Cookie"] = ", ".join(cookies)
+    headers["Content-Type"] = "text/html"
+
+    return {
+        "status_code": _value(record.get("status_code")),
+        "final_url": record.get("final_url") or record["url"],
+        "redirects": record.get("redirects") or [],
+        "headers": headers,
+        "html_size": html_size,
+        "content_type": "text/html",
+        "source": "offline"
+    }
+
+
+def tls_from_record(record, now):
+    """collection["tls"] à partir du bloc ssl et de TLS_expiry_days"""
+    ssl_info = _mapping(record.get("ssl"))
+    days = _value(record.get("TLS_expiry_days"))
+    if not ssl_info or "error" in ssl_info:
+        if days is None:
+            return None
+        ssl_info = {}
+
+    not_before = _cert_date(ssl_info.get("valid_from"))
+    not_after = _cert_date(ssl_info.get("valid_to"))
+    if not isinstance(days, (int, float)) and not_after:
+        days = (not_after - now).days
+    if not isinstance(days, (int, float)):
+        return None
+
+    return {
+        "subject": ssl_info.get("subject", {}),
+        "issuer": ssl_info.get("issuer", {}),
+        "version": None,
+        "serial_number": ssl_info.get("serialNumber"),
+        "not_before": not_before.isoformat() if not_before else None,
+        "not_after": not_after.isoformat() if not_after else None,
+        "days_until_expiry": int(days),
+        "signature_algorithm": ssl_info.get("signature_algorithm", ""),
+        "has_expired": days < 0,
+        "source": "offline"
+    }
+
+
+def whois_from_record(record, now):
+    """collection["whois"] à partir de Domain_age_days ou du bloc whois"""
+    whois_info = _mapping(record.get("whois"))
+    age_days = _value(record.get("Domain_age_days"))
+    creation = expiration = None
+    if whois_info and "error" not in whois_info:
+        creation = _parse_date(whois_info.get("creation_date") or whois_info.get("created"))
+        expiration = _parse_date(whois_info.get("expiration_date") or whois_info.get("expires"))
+    if not isinstance(age_days, (int, float)):
+        age_days = (now - creation).days if creation else None
+    if age_days is None and not creation:
+        return None
+
+    return {
+        "domain_name": whois_info.get("domain_name"),
+        "registrar": whois_info.get("registrar"),
+        "creation_date": creation.isoformat() if creation else None,
+        "expiration_date": expiration.isoformat() if expiration else None,
+        "updated_date": None,
+        "age_days": int(age_days) if age_days is not None else None,
+        "days_until_expiry": (expiration - now).days if expiration else None,
+        "name_servers": whois_info.get("name_servers") or [],
+        "status": whois_info.get("status") or [],
+        "source": "offline"
+    }
+
+
+def record_to_collection(record, document=None, now=None):
+    """results["collection"] complet à partir d'un enregistrement archivé"""
+    now = now or datetime.now()
+    html = record.get("html") or ""
+    document = document or HTMLDocument.parse(html)
+    collection = {
+        "http": http_from_record(record, len(html.encode("utf-8"))),
+        "html_structure": document.structure()
+    }
+
+    if urlparse(record["url"]).scheme != "https":
+        collection["tls"] = {"error": "Non-HTTPS"}
+    else:
+        tls = tls_from_record(record, now)
+        if tls:
+            collection["tls"] = tls
+        else:
+            collection["tls_error"] = "Certificat absent de l'enregistrement"
+
+    whois_data = whois_from_record(record, now)
+    if whois_data:
+        collection["whois"] = whois_data
+    else:
+        collection["whois_error"] = _mapping(record.get("whois")).get("error", "WHOIS absent de l'enregistrement")
+    return collection
+
+
+class OfflineScanner:
+    """Rejoue WebScanner (et MalwareScanner) sur un enregistrement archivé"""
+
+    def __init__(self, record, with_malware=True):
+        self.record = record
+        self.with_malware = with_malware
+        self.web = WebScanner(record["url"], quiet=True)
+        self.results = self.web.results
+
+    def run(self):
+        html = self.record.get("html") or ""
+        document = HTMLDocument.parse(html)
+        self.results["source"] = "offline"
+        self.results["collection"] = record_to_collection(self.record, document)
+        self.web.analyze()
+
+        if self.with_malware:
+            malware = MalwareScanner(self.record["url"])
+            headers = self.results["collection"]["http"]["headers"]
+            malware.analyze_document(document, headers, verbose=False)
+            self.results["malware"] = {key: malware.results[key] for key in MALWARE_KEYS}
+        return self.results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Analyse hors ligne d'enregistrements archivés (tableau JSON ou NDJSON)"
+    )
+    parser.add_argument("input", help="Jeu de données ('-' pour stdin, .gz accepté)")
+    parser.add_argument("--ndjson", default="-", help="Fichier NDJSON de sortie (défaut : stdout)")
+    parser.add_argument("--no-malware", action="store_true", help="Analyse externe uniquement")
+    parser.add_argument("--parser", choices=BACKENDS, default="html.parser",
+                        help="Backend d'extraction HTML (défaut : html.parser)")
+    add_script_cache_arguments(parser)
+    add_rules_arguments(parser)
+    args = parser.parse_args()
+    set_default_backend(args.parser)
+    configure_rules_from_args(args)
+    script_cache = configure_from_args(args)
+
+    output = sys.stdout if args.ndjson == "-" else open(args.ndjson, "a", encoding="utf-8")
+    count = 0
+    try:
+        for record in iter_records(args.input):
+            if not record.get("url"):
+                continue
+            results = OfflineScanner(record, with_malware=not args.no_malware).run()
+            output.write(json.dumps(results, ensure_ascii=False, default=str) + "\n")
+            count += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"✓ {count} enregistrements analysés hors ligne", file=sys.stderr)
+    if not args.no_malware:
+        scripts = script_cache.snapshot()
+        print(f"✓ Verdicts de scripts : {scripts['hit_rate']:.0%} réutilisés "
+              f"({scripts['misses']} calculés)", file=sys.stderr)
+    script_cache.close()
+
+
+if __name__ == "__main__":
+    main()
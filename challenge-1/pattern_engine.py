@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Moteur de patterns malveillants précompilés
+Préfiltre par littéraux (une recherche C sur le texte) puis confirmation
+par regex uniquement pour les patterns dont un littéral est présent.
+Les patterns sont compilés une seule fois par processus.
+"""
+
+import re
+import hashlib
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+
+# (pattern, littéraux dont au moins un doit apparaître, description)
+STATIC_PATTERNS = [
+    (r'eval\s*\(', ('eval',), "Exécution de code dynamique"),
+    (r'document\.write', ('document.write',), "Injection de contenu"),
+    (r'fromCharCode', ('fromcharcode',), "Obfuscation de caractères"),
+    (r'unescape\s*\(', ('unescape',), "Décodage suspect"),
+    (r'atob\s*\(', ('atob',), "Décodage base64"),
+    (r'window\.location\s*=', ('window.location',), "Redirections"),
+    (r'\.innerHTML\s*=', ('.innerhtml',), "Injection HTML"),
+    (r'base64_decode', ('base64_decode',), "Décodage base64 (PHP)"),
+    (r'exec\s*\(', ('exec',), "Exécution de commandes"),
+    (r'shell_exec', ('shell_exec',), "Exécution shell"),
+    (r'system\s*\(', ('system',), "Appels système"),
+    (r'passthru', ('passthru',), "Exécution de commandes"),
+    (r'cryptocurrency|bitcoin|ethereum|mining|cryptojacking',
+     ('cryptocurrency', 'bitcoin', 'ethereum', 'mining', 'cryptojacking'), "Cryptomining"),
+]
+
+# iframes externes : dépend du domaine scanné, inséré après atob (ordre historique)
+IFRAME_PATTERN = r'<iframe[^>]*src=["\']https?://(?!{})'
+IFRAME_POSITION = 5
+
+# Nombre maximal d'offsets conservés par pattern dans les résultats
+MAX_OFFSETS = 20
+
+
+class CompiledPattern(NamedTuple):
+    source: str
+    regex: re.Pattern
+    literals: Tuple[str, ...]
+
+
+class PatternMatch(NamedTuple):
+    pattern: str
+    count: int
+    offsets: List[int]
+
+
+def _compile(source, literals):
+    return CompiledPattern(source, re.compile(source, re.IGNORECASE), literals)
+
+
+# Compilés une fois à l'import, partagés par toutes les instances
+_COMPILED_STATIC = [_compile(source, literals) for source, literals, _ in STATIC_PATTERNS]
+
+
+def ascii_folded(text: str):
+    """Texte en minuscules pour le préfiltre, None si le texte n'est pas ASCII.
+
+    re.IGNORECASE rapproche aussi des caractères hors ASCII des lettres des
+    littéraux (« İ » et « ı » de « i », « ſ » de « s », « K » de « k ») ; ni
+    lower() ni casefold() ne reproduisent ces équivalences, les textes non
+    ASCII passent donc directement par les regex."""
+    return text.lower() if text.isascii() else None
+
+
+def may_match(pattern: CompiledPattern, folded) -> bool:
+    """Faux seulement si aucun littéral du pattern ne figure dans le texte"""
+    return folded is None or any(literal in folded for literal in pattern.literals)
+
+
+class PatternSet:
+    """Ensemble de patterns évalués en une passe de préfiltre + confirmation"""
+
+    def __init__(self, patterns: List[CompiledPattern]):
+        self.patterns = patterns
+        self.sources = [p.source for p in patterns]
+        # Identifiant stable du jeu (clé des caches de verdicts)
+        self.signature = hashlib.sha1('\n'.join(self.sources).encode()).hexdigest()[:16]
+
+    def scan(self, text: str) -> List[PatternMatch]:
+        """Retourne les patterns trouvés (ordre du jeu) avec nombre et offsets"""
+        folded = ascii_folded(text)
+        found = []
+        for pattern in self.patterns:
+            if not may_match(pattern, folded):
+                continue
+            offsets = [m.start() for m in pattern.regex.finditer(text)]
+            if offsets:
+                found.append(PatternMatch(pattern.source, len(offsets), offsets))
+        return found
+
+
+# Jeu indépendant du domaine : ses verdicts sont partagés entre tous les sites
+STATIC_SET = PatternSet(_COMPILED_STATIC)
+
+# Préfiltre du pattern iframe (insensible à la casse comme le pattern)
+_IFRAME_TAG = re.compile(r'<iframe', re.IGNORECASE)
+
+
+class SitePatterns:
+    """Patterns d'un domaine : le jeu statique partagé et le pattern iframe,
+    seul à dépendre du domaine, évalué à part"""
+
+    def __init__(self, static: PatternSet, iframe: CompiledPattern):
+        self.static = static
+        self.iframe = iframe
+        self.sources = list(static.sources)
+        self.sources.insert(IFRAME_POSITION, iframe.source)
+        self._before_iframe = frozenset(static.sources[:IFRAME_POSITION])
+
+    def scan_iframe(self, text: str) -> List[PatternMatch]:
+        """Iframes externes au domaine (regex lancée seulement si une balise est présente)"""
+        if not _IFRAME_TAG.search(text):
+            return []
+        offsets = [m.start() for m in self.iframe.regex.finditer(text)]
+        return [PatternMatch(self.iframe.source, len(offsets), offsets)] if offsets else []
+
+    def merge(self, static_matches, iframe_matches):
+        """Résultats des deux passes dans l'ordre historique des patterns"""
+        rank = sum(1 for match in static_matches if match[0] in self._before_iframe)
+        return static_matches[:rank] + iframe_matches + static_matches[rank:]
+
+    def scan(self, text: str) -> List[PatternMatch]:
+        """Retourne les patterns trouvés (ordre historique) avec nombre et offsets"""
+        return self.merge(self.static.scan(text), self.scan_iframe(text))
+
+
+@lru_cache(maxsize=4096)
+def pattern_set_for(netloc: str) -> SitePatterns:
+    """Patterns pour un domaine (mis en cache pour tout le processus)"""
+    iframe = _compile(IFRAME_PATTERN.format(re.escape(netloc)), ('<iframe',))
+    return SitePatterns(STATIC_SET, iframe)
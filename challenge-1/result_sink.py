@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Destinations des résultats de scan
+Au lieu d'un fichier .txt et d'un fichier .json par site, les résultats
+sont écrits par lots dans une destination unique :
+  - ndjson   : un résultat JSON par ligne (flux ou fichier en ajout)
+  - sqlite   : table indexée par domaine et niveau de risque, JSON complet
+  - columnar : caractéristiques plates (score, anomalies, jours TLS, âge du
+               domaine...) en colonnes ; Parquet si pyarrow est installé
+               (extension .parquet), sinon format .scol intégré
+"""
+
+import sys
+import json
+import math
+import time
+import zlib
+import struct
+import sqlite3
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from itertools import accumulate
+from urllib.parse import urlparse
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # dépendance optionnelle
+    pyarrow = None
+
+
+DEFAULT_BATCH = 200
+DEFAULT_ROW_GROUP = 10_000
+KINDS = ("ndjson", "sqlite", "columnar")
+EXTENSIONS = {
+    ".ndjson": "ndjson", ".jsonl": "ndjson",
+    ".sqlite": "sqlite", ".sqlite3": "sqlite", ".db": "sqlite",
+    ".scol": "columnar", ".parquet": "columnar"
+}
+
+# Colonnes plates : nom → type (str, ou f8 avec NaN pour valeur absente)
+FEATURES = {
+    "url": "str",
+    "domain": "str",
+    "scan_date": "str",
+    "risk_level": "str",
+    "risk_score": "f8",
+    "anomalies_count": "f8",
+    "status_code": "f8",
+    "html_size": "f8",
+    "tls_days_until_expiry": "f8",
+    "domain_age_days": "f8",
+    "malware_risk_level": "str",
+    "error": "str"
+}
+
+SCOL_MAGIC = b"SCOL1\n"
+
+
+def flat_features(result) -> dict:
+    """Caractéristiques plates d'un résultat (WebScanner, combiné ou malware seul)"""
+    analysis = result.get("analysis") or {}
+    collection = result.get("collection") or {}
+    http = collection.get("http") or {}
+    tls = collection.get("tls") or {}
+    whois_data = collection.get("whois") or {}
+    malware = result.get("malware") or {}
+    url = result.get("url") or ""
+    return {
+        "url": url,
+        "domain": result.get("domain") or urlparse(url).netloc,
+        "scan_date": result.get("scan_date") or result.get("timestamp"),
+        # Résultat MalwareScanner : niveau de risque à la racine
+        "risk_level": analysis.get("risk_level") or result.get("risk_level"),
+        "risk_score": analysis.get("risk_score"),
+        "anomalies_count": analysis.get("anomalies_count"),
+        "status_code": http.get("status_code"),
+        "html_size": http.get("html_size"),
+        "tls_days_until_expiry": tls.get("days_until_expiry"),
+        "domain_age_days": whois_data.get("age_days"),
+        "malware_risk_level": malware.get("risk_level"),
+        "error": result.get("error") or collection.get("http_error")
+    }
+
+
+def _json_default(value):
+    """Enregistrements compacts (compact_results) restitués tels quels, sinon str"""
+    to_dict = getattr(value, "to_dict", None)
+    return to_dict() if to_dict is not None else str(value)
+
+
+# ========== DESTINATIONS ==========
+
+class ResultSink(ABC):
+    """Destination de résultats ; les écritures sont regroupées par lots"""
+
+    def __init__(self, batch_size=DEFAULT_BATCH):
+        self.batch_size = max(1, batch_size)
+        self.written = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def write(self, result):
+        # Conversion immédiate : le résultat peut être modifié ensuite
+        row = self._row(result)
+        with self._lock:
+            self._pending.append(row)
+            self.written += 1
+            if len(self._pending) >= self.batch_size:
+                self._flush_pending()
+
+    def flush(self):
+        with self._lock:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        if self._pending:
+            rows, self._pending = self._pending, []
+            self._write_batch(rows)
+
+    def _row(self, result):
+        return result
+
+    @abstractmethod
+    def _write_batch(self, rows):
+        """Écrit un lot de lignes (appelé verrou tenu)"""
+
+    def _close(self):
+        pass
+
+    def close(self):
+        self.flush()
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NDJSONSink(ResultSink):
+    """Une ligne JSON par résultat ; chemin (ajout), '-' (stdout) ou flux texte"""
+
+    def __init__(self, target="-", batch_size=DEFAULT_BATCH):
+        super().__init__(batch_size)
+        if isinstance(target, str):
+            self._owned = target != "-"
+            self.stream = open(target, "a", encoding="utf-8") if self._owned else sys.stdout
+        else:
+            self._owned = False
+            self.stream = target
+
+    def _row(self, result):
+        return json.dumps(result, ensure_ascii=False, default=_json_default) + "\n"
+
+    def _write_batch(self, rows):
+        self.stream.write("".join(rows))
+        self.stream.flush()
+
+    def _close(self):
+        if self._owned:
+            self.stream.close()
+
+
+class SQLiteSink(ResultSink):
+    """Table results : colonnes plates indexées et résultat JSON complet"""
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH):
+        super().__init__(batch_size)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = ",\n".join(f"{name} {'TEXT' if kind == 'str' else 'REAL'}"
+                             for name, kind in FEATURES.items())
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY,
+                {columns},
+                result TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_domain ON results (domain)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_risk ON results (risk_level, risk_score)")
+        names = ", ".join(FEATURES)
+        self._insert = f"INSERT INTO results ({names}, result) VALUES ({'?, ' * len(FEATURES)}?)"
+
+    def _row(self, result):
+        features = flat_features(result)
+        return (*features.values(), json.dumps(result, ensure_ascii=False, default=_json_default))
+
+    def _write_batch(self, rows):
+        # Une transaction par lot
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(self._insert, rows)
+
+    def _close(self):
+        self._conn.close()
+
+
+class ColumnarSink(ResultSink):
+    """Caractéristiques plates en colonnes, un groupe de lignes par lot"""
+
+    def __init__(self, path, batch_size=DEFAULT_ROW_GROUP):
+        super().__init__(batch_size)
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._writer = None
+        if self.parquet:
+            if pyarrow is None:
+                raise RuntimeError("Écriture Parquet impossible : pyarrow n'est pas installé "
+                                   "(utiliser une extension .scol)")
+            schema = pyarrow.schema([(name, pyarrow.string() if kind == "str" else pyarrow.float64())
+                                     for name, kind in FEATURES.items()])
+            self._writer = pyarrow.parquet.ParquetWriter(path, schema, compression="zstd")
+        else:
+            self._file = open(path, "ab")
+            if self._file.tell() == 0:
+                self._file.write(SCOL_MAGIC)
+
+    def _row(self, result):
+        return flat_features(result)
+
+    def _write_batch(self, rows):
+        columns = {name: [row[name] for row in rows] for name in FEATURES}
+        if self.parquet:
+            self._writer.write_table(pyarrow.table(
+                {name: _numbers(values) if FEATURES[name] == "f8" else _strings(values)
+                 for name, values in columns.items()},
+                schema=self._writer.schema
+            ))
+        else:
+            self._file.write(_encode_group(columns, len(rows)))
+            self._file.flush()
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+        else:
+            self._file.close()
+
+
+class MultiSink(ResultSink):
+    """Plusieurs destinations alimentées par les mêmes résultats"""
+
+    def __init__(self, sinks):
+        super().__init__(1)
+        self.sinks = list(sinks)
+
+    def write(self, result):
+        for sink in self.sinks:
+            sink.write(result)
+        self.written += 1
+
+    def _write_batch(self, rows):
+        # write() transmet chaque résultat aux destinations, qui regroupent
+        # elles-mêmes leurs écritures : aucun lot ne passe par ici
+        raise RuntimeError("MultiSink ne met aucun résultat en lot")
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def _numbers(values):
+    return [None if value is None else float(value) for value in values]
+
+
+def _strings(values):
+    return [None if value is None else str(value) for value in values]
+
+
+# ========== FORMAT .scol ==========
+# Fichier : SCOL_MAGIC puis des groupes de lignes. Groupe : longueur de
+# l'en-tête (uint32 LE), en-tête JSON {"rows", "columns": [{"name", "type",
+# "buffers": [tailles]}]}, puis les tampons compressés (zlib) de chaque
+# colonne : f8 → float64 LE (NaN = absent) ; str → validité (1 octet par
+# ligne), offsets int64 LE, octets UTF-8 concaténés (disposition Arrow).
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _encode_group(columns, rows) -> bytes:
+    meta, buffers = [], []
+    for name, kind in FEATURES.items():
+        values = columns[name]
+        if kind == "f8":
+            parts = [_little_endian(array("d", (math.nan if value is None else float(value)
+                                                for value in values)))]
+        else:
+            encoded = [b"" if value is None else str(value).encode("utf-8") for value in values]
+            offsets = array("q", accumulate((len(item) for item in encoded), initial=0))
+            parts = [bytes(value is not None for value in values), _little_endian(offsets),
+                     b"".join(encoded)]
+        parts = [zlib.compress(part) for part in parts]
+        meta.append({"name": name, "type": kind, "buffers": [len(part) for part in parts]})
+        buffers.extend(parts)
+    header = json.dumps({"rows": rows, "columns": meta}).encode()
+    return struct.pack("<I", len(header)) + header + b"".join(buffers)
+
+
+def _decode_column(kind, rows, parts):
+    if kind == "f8":
+        values = array("d")
+        values.frombytes(parts[0])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return [None if math.isnan(value) else value for value in values]
+    validity, raw_offsets, data = parts
+    offsets = array("q")
+    offsets.frombytes(raw_offsets)
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    return [data[offsets[i]:offsets[i + 1]].decode("utf-8") if validity[i] else None
+            for i in range(rows)]
+
+
+def read_columnar(path, columns=None) -> dict:
+    """Colonnes d'un fichier .scol ou .parquet (toutes, ou celles demandées)"""
+    wanted = list(columns or FEATURES)
+    if path.endswith(".parquet"):
+        if pyarrow is None:
+            raise RuntimeError("Lecture Parquet impossible : pyarrow n'est pas installé")
+        return pyarrow.parquet.read_table(path, columns=wanted).to_pydict()
+    table = {name: [] for name in wanted}
+    with open(path, "rb") as f:
+        if f.read(len(SCOL_MAGIC)) != SCOL_MAGIC:
+            raise ValueError(f"{path} n'est pas un fichier .scol")
+        while True:
+            size = f.read(4)
+            if not size:
+                break
+            header = json.loads(f.read(struct.unpack("<I", size)[0]))
+            for column in header["columns"]:
+                if column["name"] not in table:
+                    # Projection : les colonnes non demandées ne sont pas décompressées
+                    f.seek(sum(column["buffers"]), 1)
+                    continue
+                parts = [zlib.decompress(f.read(length)) for length in column["buffers"]]
+                table[column["name"]].extend(_decode_column(column["type"], header["rows"], parts))
+    return table
+
+
+# ========== CONFIGURATION ==========
+
+def open_sink(spec, batch_size=None) -> ResultSink:
+    """'type:chemin' (ndjson, sqlite, columnar) ou chemin dont l'extension indique le type"""
+    kind, sep, path = spec.partition(":")
+    if not sep or kind not in KINDS:
+        path = spec
+        kind = next((kind for ext, kind in EXTENSIONS.items() if spec.endswith(ext)), "ndjson")
+    if kind == "sqlite":
+        return SQLiteSink(path, batch_size or DEFAULT_BATCH)
+    if kind == "columnar":
+        return ColumnarSink(path, batch_size or DEFAULT_ROW_GROUP)
+    return NDJSONSink(path, batch_size or DEFAULT_BATCH)
+
+
+def add_sink_arguments(parser):
+    """Options de destination des résultats partagées par les CLIs"""
+    parser.add_argument("--sink", action="append", metavar="TYPE:CHEMIN",
+                        help="Destination des résultats : ndjson:, sqlite: ou columnar: "
+                             "(.parquet avec pyarrow, sinon .scol) ; répétable")
+    parser.add_argument("--sink-batch", type=int, default=None, metavar="N",
+                        help=f"Résultats par écriture groupée (défaut : {DEFAULT_BATCH}, "
+                             f"{DEFAULT_ROW_GROUP:,} en colonnes)")
+
+
+def sink_from_args(args):
+    """ResultSink correspondant aux options --sink (None si aucune)"""
+    if not getattr(args, "sink", None):
+        return None
+    sinks = [open_sink(spec, args.sink_batch) for spec in args.sink]
+    return sinks[0] if len(sinks) == 1 else MultiSink(sinks)
+
+
+# ========== LECTURE ==========
+
+def _load(path, columns):
+    """Colonnes plates d'un fichier de résultats, quel que soit son format"""
+    kind = next((kind for ext, kind in EXTENSIONS.items() if path.endswith(ext)), "ndjson")
+    if kind == "columnar":
+        return read_columnar(path, columns)
+    if kind == "sqlite":
+        conn = sqlite3.connect(path)
+        rows = conn.execute(f"SELECT {', '.join(columns)} FROM results ORDER BY id").fetchall()
+        conn.close()
+        return {name: [row[i] for row in rows] for i, name in enumerate(columns)}
+    table = {name: [] for name in columns}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            features = flat_features(json.loads(line))
+            for name in columns:
+                table[name].append(features[name])
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthèse d'un fichier de résultats (NDJSON, SQLite, colonnes)")
+    parser.add_argument("path", help="Fichier .ndjson, .sqlite ou .scol / .parquet")
+    parser.add_argument("--top", type=int, default=10, help="Sites au score le plus élevé (défaut : 10)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = _load(args.path, ["url", "risk_level", "risk_score", "error"])
+    elapsed = time.perf_counter() - start
+    rows = len(table["url"])
+    print(f"📋 {rows} résultats lus en {elapsed * 1000:.0f} ms")
+
+    levels = {}
+    for level in table["risk_level"]:
+        levels[level or "ERREUR"] = levels.get(level or "ERREUR", 0) + 1
+    for level, count in sorted(levels.items(), key=lambda item: -item[1]):
+        print(f"   {level:<10} {count:>8}")
+    errors = sum(1 for error in table["error"] if error)
+    print(f"   erreurs    {errors:>8}")
+
+    scored = sorted(((score, url) for score, url in zip(table["risk_score"], table["url"])
+                     if score is not None), reverse=True)
+    print(f"\n🔥 {args.top} scores les plus élevés :")
+    for score, url in scored[:args.top]:
+        print(f"   {score:>6.0f}  {url}")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,864 @@
+#!/usr/bin/env python3
+"""
+Moteur de règles de détection (analyses WebScanner)
+Les seuils, sévérités et messages des analyses sont décrits dans rules.json
+et compilés une fois en plan d'évaluation :
+- champs nommés, lus au plus une fois par résultat et partagés entre règles ;
+- garde par section (plus aucune règle évaluée quand elle échoue) ;
+- chaînes « premier match » (if / elif) de seuils sur un même champ réduites
+  à une table consultée par dichotomie, quel que soit le nombre de paliers.
+Le même plan s'évalue sur un résultat (WebScanner.analyze) ou sur un lot en
+colonnes (masques NumPy par règle). Un corpus se réévalue en changeant de
+fichier de règles, sans toucher au code.
+"""
+
+import os
+import ast
+import sys
+import json
+import time
+import bisect
+import string
+import hashlib
+import argparse
+import operator
+from collections.abc import Mapping
+from functools import lru_cache, reduce
+from typing import Callable, FrozenSet, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+try:
+    import numpy as np
+except ImportError:  # dépendance optionnelle (évaluation en colonnes)
+    np = None
+
+
+DEFAULT_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+SEVERITIES = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+
+
+class RuleError(ValueError):
+    """Fichier de règles invalide (expression, champ ou règle incorrects)"""
+
+
+class _Unavailable(Exception):
+    """Valeur non calculable sur un lot en colonnes"""
+
+
+# ========== EXPRESSIONS ==========
+
+def _any_contains(items, text):
+    return any(text in item for item in items)
+
+
+def _absent(container, labels):
+    """Libellés des clés de labels absentes de container (ordre de labels)"""
+    return [label for name, label in labels.items() if name not in container]
+
+
+# Fonctions utilisables dans les expressions (get et has lisent le résultat)
+FUNCTIONS = {
+    "len": len,
+    "lower": lambda text: text.lower(),
+    "scheme": lambda url: urlparse(url).scheme,
+    "netloc": lambda url: urlparse(url).netloc,
+    "any_contains": _any_contains,
+    "join": lambda items, separator: separator.join(items),
+    "absent": _absent,
+}
+
+_COMPARE = {
+    ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+    ast.In: lambda a, b: a in b, ast.NotIn: lambda a, b: a not in b,
+    ast.Is: operator.is_, ast.IsNot: operator.is_not,
+}
+_BINARY = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+           ast.Div: operator.truediv, ast.Mod: operator.mod}
+_ARITHMETIC = frozenset(_BINARY.values()) | {operator.neg}
+# Comparaisons d'un champ numérique à des constantes (éligibles aux tables de seuils)
+_THRESHOLD_NODES = (ast.Compare, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub,
+                    ast.Name, ast.Load, ast.Constant, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+
+
+def _lookup(results, keys):
+    """(trouvé, valeur) du chemin keys dans le résultat"""
+    value = results
+    try:
+        for key in keys:
+            value = value[key]
+    except (KeyError, TypeError, IndexError):
+        return False, None
+    return True, value
+
+
+class Expr(NamedTuple):
+    text: str
+    tree: ast.AST
+    names: FrozenSet[str]                  # champs (ou colonnes) référencés
+    paths: FrozenSet[Tuple[str, ...]]      # chemins lus par get / has
+    scalar: Callable                       # scope → valeur (un résultat)
+    vector: Callable                       # scope → tableau (un lot)
+
+
+def _unavailable(scope):
+    raise _Unavailable("lecture du résultat")
+
+
+class _Compiler:
+    """Traduit une expression (sous-ensemble de Python) en fonctions unitaire et en colonnes"""
+
+    def __init__(self, fields, constants, columns=False):
+        self.fields = fields
+        self.constants = constants
+        # Expressions "batch" : les noms qui ne sont pas des champs désignent des colonnes
+        self.columns = columns
+
+    def compile(self, text) -> Expr:
+        if not isinstance(text, str):
+            raise RuleError(f"Expression attendue, reçu {text!r}")
+        try:
+            tree = ast.parse(text.strip(), mode="eval")
+        except SyntaxError as e:
+            raise RuleError(f"Expression invalide {text!r} : {e.msg}") from None
+        self.text, self.names, self.paths = text, set(), set()
+        scalar, vector = self.node(tree.body)
+        return Expr(text, tree, frozenset(self.names), frozenset(self.paths), scalar, vector)
+
+    def fail(self, message):
+        raise RuleError(f"{message} dans {self.text!r}")
+
+    def node(self, node):
+        if isinstance(node, ast.Constant):
+            return self.constant(node.value)
+        if isinstance(node, (ast.List, ast.Tuple, ast.Dict)):
+            try:
+                return self.constant(ast.literal_eval(node))
+            except ValueError:
+                self.fail("Seules les listes et dictionnaires constants sont acceptés")
+        if isinstance(node, ast.Name):
+            return self.name(node.id)
+        if isinstance(node, ast.BoolOp):
+            return self.bool_op(node)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+            return self.unary(node)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            return self.binary(node)
+        if isinstance(node, ast.Compare):
+            return self.compare(node)
+        if isinstance(node, ast.Call):
+            return self.call(node)
+        self.fail(f"Construction non autorisée ({type(node).__name__})")
+
+    def constant(self, value):
+        vector_value = value
+        if not (value is None or isinstance(value, (bool, int, float, str))):
+            # Liste ou dictionnaire : un seul objet, diffusé sur tout le lot
+            vector_value = np.empty((), dtype=object) if np is not None else value
+            if np is not None:
+                vector_value[()] = value
+        return (lambda scope: value), (lambda scope: vector_value)
+
+    def name(self, name):
+        if name in self.constants:
+            return self.constant(self.constants[name])
+        if name in FUNCTIONS or name in ("get", "has"):
+            self.fail(f"Fonction {name} utilisée sans appel")
+        if name not in self.fields and not self.columns:
+            self.fail(f"Champ inconnu : {name}")
+        self.names.add(name)
+
+        def scalar(scope):
+            # Champ déjà calculé : lu sans appel supplémentaire
+            values = scope.values
+            return values[name] if name in values else scope.value(name)
+
+        return scalar, lambda scope: scope.value(name)
+
+    def bool_op(self, node):
+        parts = [self.node(value) for value in node.values]
+        scalars = [scalar for scalar, _ in parts]
+        vectors = [vector for _, vector in parts]
+        if isinstance(node.op, ast.And):
+            def scalar(scope):
+                for fn in scalars:
+                    value = fn(scope)
+                    if not value:
+                        return value
+                return value
+            combine = operator.and_
+        else:
+            def scalar(scope):
+                for fn in scalars:
+                    value = fn(scope)
+                    if value:
+                        return value
+                return value
+            combine = operator.or_
+        return scalar, lambda scope: reduce(combine, [_truth(fn(scope)) for fn in vectors])
+
+    def unary(self, node):
+        scalar, vector = self.node(node.operand)
+        if isinstance(node.op, ast.Not):
+            return (lambda scope: not scalar(scope)), (lambda scope: ~_truth(vector(scope)))
+        return (lambda scope: -scalar(scope)), (lambda scope: _apply(operator.neg, vector(scope)))
+
+    def binary(self, node):
+        op = _BINARY[type(node.op)]
+        left, right = self.node(node.left), self.node(node.right)
+        return ((lambda scope: op(left[0](scope), right[0](scope))),
+                (lambda scope: _apply(op, left[1](scope), right[1](scope))))
+
+    def compare(self, node):
+        kinds = [type(op) for op in node.ops]
+        for kind, comparator in zip(kinds, node.comparators):
+            if kind in (ast.Is, ast.IsNot) and not (isinstance(comparator, ast.Constant)
+                                                    and comparator.value is None):
+                self.fail("'is' n'est accepté que devant None")
+        operands = [self.node(item) for item in (node.left, *node.comparators)]
+        ops = [_COMPARE[kind] for kind in kinds]
+
+        def scalar(scope):
+            left = operands[0][0](scope)
+            for op, (fn, _) in zip(ops, operands[1:]):
+                right = fn(scope)
+                if not op(left, right):
+                    return False
+                left = right
+            return True
+
+        def vector(scope):
+            values = [fn(scope) for _, fn in operands]
+            result = True
+            for kind, left, right in zip(kinds, values, values[1:]):
+                result = result & _compare(kind, left, right)
+            return result
+
+        return scalar, vector
+
+    def call(self, node):
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            self.fail("Appel non autorisé")
+        name = node.func.id
+        if name in ("get", "has"):
+            return self.lookup(name, node.args)
+        if name not in FUNCTIONS:
+            self.fail(f"Fonction inconnue : {name}")
+        fn = FUNCTIONS[name]
+        args = [self.node(arg) for arg in node.args]
+        return ((lambda scope: fn(*[scalar(scope) for scalar, _ in args])),
+                (lambda scope: _apply(fn, *[vector(scope) for _, vector in args])))
+
+    def lookup(self, name, args):
+        """get('a.b.c', défaut) / has('a.b.c') : lecture d'un chemin du résultat"""
+        if not args or len(args) > (2 if name == "get" else 1) or not (
+                isinstance(args[0], ast.Constant) and isinstance(args[0].value, str)):
+            self.fail(f"{name}() attend un chemin constant, ex. {name}('collection.tls.has_expired')")
+        keys = tuple(args[0].value.split("."))
+        self.paths.add(keys)
+        if name == "has":
+            return (lambda scope: _lookup(scope.results, keys)[0]), _unavailable
+        default = self.node(args[1])[0] if len(args) == 2 else (lambda scope: None)
+
+        def scalar(scope):
+            found, value = _lookup(scope.results, keys)
+            return value if found else default(scope)
+
+        return scalar, _unavailable
+
+
+# ========== OPÉRATIONS EN COLONNES ==========
+
+def _column(values):
+    """Colonne NumPy : f8 (NaN pour None) si numérique, objets sinon"""
+    if isinstance(values, np.ndarray):
+        return values if values.dtype.kind in "fbO" else values.astype(object)
+    values = list(values)
+    if all(value is None or (isinstance(value, (int, float)) and not isinstance(value, bool))
+           for value in values):
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    column = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        column[i] = value
+    return column
+
+
+def _numeric(value) -> bool:
+    if isinstance(value, np.ndarray):
+        return value.dtype.kind in "fiub"
+    return isinstance(value, (int, float, np.number))
+
+
+def _objects(value):
+    """Tableau d'objets (None à la place des NaN) pour l'application élément par élément"""
+    if isinstance(value, np.ndarray) and value.dtype.kind == "f":
+        objects = value.astype(object)
+        objects[np.isnan(value)] = None
+        return objects
+    return value
+
+
+def _apply(fn, *args):
+    """fn sur chaque ligne ; None si un argument manque"""
+    if fn in _ARITHMETIC and all(_numeric(arg) for arg in args):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return fn(*args)
+
+    def safe(*values):
+        if any(value is None for value in values):
+            return None
+        return fn(*values)
+
+    return np.frompyfunc(safe, len(args), 1)(*[_objects(arg) for arg in args])
+
+
+def _isnull(value):
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "f":
+            return np.isnan(value)
+        if value.dtype == object:
+            return np.asarray(np.frompyfunc(lambda item: item is None, 1, 1)(value), dtype=bool)
+        return np.zeros(value.shape, dtype=bool)
+    return np.bool_(value is None or (isinstance(value, float) and value != value))
+
+
+def _truth(value):
+    """Vérité ligne par ligne (valeur absente → faux)"""
+    if isinstance(value, np.ndarray):
+        if value.dtype == bool:
+            return value
+        if value.dtype.kind == "f":
+            return ~np.isnan(value) & (value != 0)
+        if value.dtype.kind in "iu":
+            return value != 0
+        return np.asarray(np.frompyfunc(lambda item: item is not None and bool(item), 1, 1)(value), dtype=bool)
+    return np.bool_(value is not None and not _isnull(value) and bool(value))
+
+
+def _compare(kind, left, right):
+    if kind in (ast.Is, ast.IsNot):
+        null = _isnull(left)
+        return null if kind is ast.Is else ~null
+    if kind not in (ast.In, ast.NotIn) and _numeric(left) and _numeric(right):
+        return _COMPARE[kind](left, right)
+    return _truth(_apply(_COMPARE[kind], left, right))
+
+
+# ========== RÈGLES ==========
+
+class Field(NamedTuple):
+    name: str
+    expr: Expr               # sur un résultat
+    batch: Optional[Expr]    # sur les colonnes d'un lot (result_sink.FEATURES)
+
+
+class Rule(NamedTuple):
+    id: str
+    section: str
+    severity: str
+    title: str
+    description: str
+    when: Optional[Expr]     # None : règle émise quand la garde de section échoue
+    fields: FrozenSet[str]   # champs du message
+
+    def describe(self, scope) -> str:
+        return self.description.format_map(_Fields(scope))
+
+
+class _Fields:
+    """Champs d'une évaluation, pour str.format_map"""
+
+    def __init__(self, scope):
+        self.scope = scope
+
+    def __getitem__(self, name):
+        return self.scope.value(name)
+
+
+def _region(bounds, value) -> int:
+    """Région de value : 2i sous bounds[i], 2i+1 sur bounds[i], 2k au-delà"""
+    i = bisect.bisect_left(bounds, value)
+    return 2 * i + 1 if i < len(bounds) and bounds[i] == value else 2 * i
+
+
+class Chain:
+    """Règles exclusives : la première condition vraie l'emporte (if / elif)"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.field, self.bounds, self.table = self.threshold_table(rules)
+
+    @staticmethod
+    def threshold_table(rules):
+        """Table de seuils quand toutes les conditions comparent un même champ à des
+        constantes : la règle retenue ne change qu'aux constantes, calculée une fois
+        par région puis retrouvée par dichotomie"""
+        names, numbers = set(), set()
+        for rule in rules:
+            for node in ast.walk(rule.when.tree.body):
+                if not isinstance(node, _THRESHOLD_NODES):
+                    return None, None, None
+                if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) \
+                        and not isinstance(node.operand, ast.Constant):
+                    return None, None, None
+                if isinstance(node, ast.Name):
+                    names.add(node.id)
+                elif isinstance(node, ast.Constant):
+                    if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                        return None, None, None
+                    numbers.update((node.value, -node.value))
+        if len(names) != 1 or not numbers:
+            return None, None, None
+        field = names.pop()
+        if any(rule.when.names != {field} for rule in rules):
+            return None, None, None   # nom de constante : pas une table sur un champ
+        bounds = sorted(numbers)
+        samples = []
+        for i, bound in enumerate(bounds):
+            samples.append(((bounds[i - 1] if i else bound - 1) + bound) / 2)
+            samples.append(bound)
+        samples.append(bounds[-1] + 1)
+        table = []
+        for sample in samples:
+            scope = _Sample(field, sample)
+            table.append(next((i for i, rule in enumerate(rules) if rule.when.scalar(scope)), -1))
+        return field, bounds, table
+
+    def first(self, scope) -> Optional[Rule]:
+        if self.table is not None:
+            value = scope.value(self.field)
+            if type(value) in (int, float) and value == value:
+                index = self.table[_region(self.bounds, value)]
+                return self.rules[index] if index >= 0 else None
+        for rule in self.rules:
+            if rule.when.scalar(scope):
+                return rule
+        return None
+
+    def vector(self, scope) -> list:
+        """Masque de chaque règle de la chaîne sur un lot"""
+        if self.table is not None:
+            values = scope.value(self.field)
+            if isinstance(values, np.ndarray) and values.dtype.kind == "f":
+                bounds = np.asarray(self.bounds, dtype=np.float64)
+                i = np.searchsorted(bounds, values, side="left")
+                exact = (i < len(bounds)) & (bounds[np.minimum(i, len(bounds) - 1)] == values)
+                index = np.asarray(self.table)[2 * i + exact]
+                index[np.isnan(values)] = -1
+                return [index == j for j in range(len(self.rules))]
+        remaining = True
+        masks = []
+        for rule in self.rules:
+            mask = _truth(rule.when.vector(scope)) & remaining
+            remaining = remaining & ~mask
+            masks.append(mask)
+        return masks
+
+
+class _Sample:
+    """Champ unique fixé à une valeur (construction des tables de seuils)"""
+
+    def __init__(self, field, value):
+        self.values = {field: value}
+
+    def value(self, name):
+        return self.values[name]
+
+
+class Section(NamedTuple):
+    name: str
+    requires: Optional[Expr]
+    otherwise: Tuple[Rule, ...]   # émises quand la garde échoue
+    chains: Tuple[Chain, ...]
+    paths: Tuple[Tuple[str, ...], ...]   # chemins du résultat lus par la section
+
+    @property
+    def rules(self) -> list:
+        return list(self.otherwise) + [rule for chain in self.chains for rule in chain.rules]
+
+
+class RulePlan:
+    """Plan d'évaluation compilé d'un fichier de règles"""
+
+    def __init__(self, spec, source="<règles>"):
+        if not isinstance(spec, dict) or not isinstance(spec.get("sections"), dict):
+            raise RuleError(f"{source} : objet avec une clé 'sections' attendu")
+        self.source = source
+        self.signature = hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+        constants = spec.get("constants", {})
+        field_specs = {name: {"expr": field} if isinstance(field, str) else field
+                       for name, field in spec.get("fields", {}).items()}
+        compiler = _Compiler(set(field_specs), constants)
+        batch_compiler = _Compiler(set(field_specs), constants, columns=True)
+
+        self.fields = {}
+        for name, field in field_specs.items():
+            if name in constants or name in FUNCTIONS or "expr" not in field:
+                raise RuleError(f"Champ {name} : nom réservé ou clé 'expr' manquante")
+            batch = batch_compiler.compile(field["batch"]) if "batch" in field else None
+            self.fields[name] = Field(name, compiler.compile(field["expr"]), batch)
+        self.check_cycles()
+
+        self.sections = {}
+        self.ids = set()
+        for name, section in spec["sections"].items():
+            requires = compiler.compile(section["requires"]) if section.get("requires") else None
+            otherwise = tuple(self.rule(item, name, compiler, conditional=False)
+                              for item in section.get("otherwise", []))
+            chains = tuple(
+                Chain([self.rule(rule, name, compiler) for rule in item["first"]]) if "first" in item
+                else Chain([self.rule(item, name, compiler)])
+                for item in section.get("rules", [])
+            )
+            names = set(requires.names if requires else ())
+            for rule in otherwise + tuple(rule for chain in chains for rule in chain.rules):
+                names |= rule.fields | (rule.when.names if rule.when else set())
+            paths = set(requires.paths if requires else ())
+            self.sections[name] = Section(name, requires, otherwise, chains, self.closure(names, paths))
+
+    def rule(self, spec, section, compiler, conditional=True) -> Rule:
+        keys = ("id", "severity", "title", "description") + (("when",) if conditional else ())
+        missing = [key for key in keys if key not in spec]
+        if missing:
+            raise RuleError(f"Section {section} : clés manquantes {missing} dans {spec}")
+        if spec["id"] in self.ids:
+            raise RuleError(f"Identifiant de règle en double : {spec['id']}")
+        if spec["severity"] not in SEVERITIES:
+            raise RuleError(f"Règle {spec['id']} : sévérité inconnue {spec['severity']}")
+        self.ids.add(spec["id"])
+        fields = set()
+        for _, name, _, _ in string.Formatter().parse(spec["description"]):
+            if name is None:
+                continue
+            if name not in self.fields:
+                raise RuleError(f"Règle {spec['id']} : champ inconnu dans le message : {{{name}}}")
+            fields.add(name)
+        return Rule(spec["id"], section, spec["severity"], spec["title"], spec["description"],
+                    compiler.compile(spec["when"]) if conditional else None, frozenset(fields))
+
+    def check_cycles(self):
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise RuleError(f"Champs cycliques : {' → '.join(path + [name])}")
+            state[name] = "visiting"
+            for dependency in self.fields[name].expr.names:
+                visit(dependency, path + [name])
+            state[name] = "done"
+
+        for name in self.fields:
+            visit(name, [])
+
+    def closure(self, names, paths) -> tuple:
+        """Chemins du résultat lus par des champs (et les champs dont ils dépendent)"""
+        found, seen, stack = set(paths), set(), list(names)
+        while stack:
+            name = stack.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            found |= self.fields[name].expr.paths
+            stack.extend(self.fields[name].expr.names)
+        return tuple(sorted(found))
+
+    @property
+    def rules(self) -> list:
+        return [rule for section in self.sections.values() for rule in section.rules]
+
+    # ----- Un résultat -----
+
+    def evaluate(self, results) -> "Evaluation":
+        return Evaluation(self, results)
+
+    def section_key(self, name, results) -> str:
+        """Empreinte des données lues par une section (rescans incrémentaux)"""
+        section = self.sections.get(name)
+        lookups = [_lookup(results, keys) for keys in section.paths] if section else []
+        return hashlib.sha1(json.dumps([self.signature, name, lookups], default=str).encode()).hexdigest()
+
+    # ----- Un lot en colonnes -----
+
+    def columns(self, results) -> dict:
+        """Champs du plan en colonnes, une ligne par résultat (None si non calculable)"""
+        values = {name: [] for name in self.fields}
+        for result in results:
+            scope = Evaluation(self, result)
+            for name, column in values.items():
+                try:
+                    column.append(scope.value(name))
+                except Exception:
+                    column.append(None)
+        return values
+
+    def evaluate_batch(self, columns) -> "BatchMatches":
+        """Masques par règle sur un lot ; colonnes nommées comme les champs du plan
+        (plan.columns) ou comme result_sink.FEATURES (expressions 'batch')"""
+        if np is None:
+            raise RuntimeError("Évaluation en colonnes impossible : numpy n'est pas installé")
+        scope = _BatchScope(self, columns)
+        matches = BatchMatches(scope.size)
+        for section in self.sections.values():
+            if section.requires and not scope.evaluable(section.requires):
+                matches.skipped.extend(section.rules)
+                continue
+            guard = _truth(section.requires.vector(scope)) if section.requires else True
+            for rule in section.otherwise:
+                matches.add(rule, ~np.broadcast_to(guard, (scope.size,)))
+            for chain in section.chains:
+                if not all(scope.evaluable(rule.when) for rule in chain.rules):
+                    matches.skipped.extend(chain.rules)
+                    continue
+                for rule, mask in zip(chain.rules, chain.vector(scope)):
+                    matches.add(rule, mask & guard)
+        return matches
+
+
+class Evaluation:
+    """Évaluation du plan sur un résultat : chaque champ est calculé au plus une fois"""
+
+    def __init__(self, plan, results):
+        self.plan = plan
+        self.results = results
+        self.values = {}
+
+    def value(self, name):
+        values = self.values
+        if name not in values:
+            values[name] = self.plan.fields[name].expr.scalar(self)
+        return values[name]
+
+    def matches(self, section) -> list:
+        """Règles déclenchées dans une section (ordre du fichier)"""
+        section = self.plan.sections.get(section)
+        if section is None:
+            return []
+        if section.requires is not None and not section.requires.scalar(self):
+            return list(section.otherwise)
+        found = []
+        for chain in section.chains:
+            rule = chain.first(self)
+            if rule is not None:
+                found.append(rule)
+        return found
+
+    def anomalies(self, section=None) -> list:
+        """Anomalies d'une section, ou de toutes dans l'ordre du fichier"""
+        sections = [section] if section else list(self.plan.sections)
+        return [{"severity": rule.severity, "title": rule.title, "description": rule.describe(self)}
+                for name in sections for rule in self.matches(name)]
+
+
+_UNAVAILABLE = object()
+
+
+class _BatchScope:
+    """Valeurs des champs sur un lot : colonne du même nom, sinon expression 'batch',
+    sinon expression du champ quand elle ne lit pas le résultat"""
+
+    def __init__(self, plan, columns):
+        self.plan = plan
+        self.columns = {name: _column(values) for name, values in columns.items()}
+        self.size = len(next(iter(self.columns.values()))) if self.columns else 0
+        self.sources = {}
+        self.values = {}
+
+    def source(self, name, resolving=()):
+        """Expression qui calcule le champ sur ce lot (None : colonne ; _UNAVAILABLE)"""
+        if name in self.columns:
+            return None
+        if name in self.sources:
+            return self.sources[name]
+        field = self.plan.fields.get(name)
+        found = _UNAVAILABLE
+        if field is not None and name not in resolving:
+            found = next((expr for expr in filter(None, (field.batch, field.expr))
+                          if self.evaluable(expr, resolving + (name,))), _UNAVAILABLE)
+        self.sources[name] = found
+        return found
+
+    def evaluable(self, expr, resolving=()) -> bool:
+        """Décidé avant tout calcul : une règle sans colonne ne coûte rien au lot"""
+        return not expr.paths and all(self.source(name, resolving) is not _UNAVAILABLE
+                                      for name in expr.names)
+
+    def value(self, name):
+        if name in self.columns:
+            return self.columns[name]
+        if name not in self.values:
+            source = self.source(name)
+            if source is _UNAVAILABLE:
+                raise _Unavailable(name)
+            self.values[name] = source.vector(self)
+        return self.values[name]
+
+
+class BatchMatches:
+    """Masques par règle d'un lot (skipped : règles sans colonne disponible)"""
+
+    def __init__(self, size):
+        self.size = size
+        self.rules = []
+        self.masks = {}
+        self.skipped = []
+
+    def add(self, rule, mask):
+        self.rules.append(rule)
+        self.masks[rule.id] = np.broadcast_to(_truth(mask), (self.size,))
+
+    def rule_ids(self, row) -> set:
+        return {rule.id for rule in self.rules if self.masks[rule.id][row]}
+
+    def severity_counts(self) -> "np.ndarray":
+        """(n, 5) effectifs par sévérité, disposition de bulk_scoring.ScoreBatch"""
+        counts = np.zeros((self.size, len(SEVERITIES) + 1), dtype=np.int64)
+        for rule in self.rules:
+            counts[:, SEVERITIES.index(rule.severity)] += self.masks[rule.id]
+        return counts
+
+
+# ========== CONFIGURATION ==========
+
+_default_path = DEFAULT_RULES
+
+
+@lru_cache(maxsize=8)
+def _compiled(path, mtime) -> RulePlan:
+    try:
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+    except json.JSONDecodeError as e:
+        raise RuleError(f"{path} : JSON invalide ({e})") from None
+    return RulePlan(spec, source=os.path.basename(path))
+
+
+def load_plan(path=None) -> RulePlan:
+    """Plan compilé d'un fichier de règles (recompilé seulement s'il a changé)"""
+    path = os.path.abspath(path or _default_path)
+    return _compiled(path, os.path.getmtime(path))
+
+
+def default_plan() -> RulePlan:
+    return load_plan()
+
+
+def set_default_rules(path):
+    """Fichier de règles des scanners de ce processus (compilé et vérifié immédiatement)"""
+    global _default_path
+    load_plan(path)
+    _default_path = path
+
+
+def add_rules_arguments(parser):
+    parser.add_argument("--rules", metavar="FICHIER",
+                        help="Fichier de règles de détection (défaut : rules.json)")
+
+
+def configure_rules_from_args(args):
+    if getattr(args, "rules", None):
+        try:
+            set_default_rules(args.rules)
+        except (OSError, RuleError) as e:
+            sys.exit(f"❌ Règles de détection : {e}")
+
+
+# ========== RÉÉVALUATION D'UN CORPUS ==========
+
+def _print_hits(plan, hits, skipped=()):
+    skipped = {rule.id for rule in skipped}
+    print(f"\n{'règle':<28} {'sévérité':<9} {'sites':>8}")
+    for rule in plan.rules:
+        count = "-" if rule.id in skipped else hits.get(rule.id, 0)
+        print(f"{rule.id:<28} {rule.severity:<9} {count:>8}")
+    if skipped:
+        print(f"⚠️  {len(skipped)} règles sans colonne disponible (ignorées) : {', '.join(sorted(skipped))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réévaluation d'un corpus avec un fichier de règles")
+    parser.add_argument("path", help="Résultats de scan (NDJSON ou tableau JSON, .gz accepté) "
+                                     "ou colonnes (.scol / .parquet)")
+    add_rules_arguments(parser)
+    from result_sink import add_sink_arguments, sink_from_args
+    add_sink_arguments(parser)
+    parser.add_argument("--check", action="store_true",
+                        help="Vérifie que l'évaluation en colonnes déclenche les mêmes règles")
+    args = parser.parse_args()
+
+    try:
+        plan = load_plan(args.rules)
+    except (OSError, RuleError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"📐 {plan.source} : {len(plan.rules)} règles, {len(plan.fields)} champs "
+          f"(signature {plan.signature})")
+
+    if args.path.endswith((".scol", ".parquet")):
+        from result_sink import read_columnar
+        columns = read_columnar(args.path)
+        start = time.perf_counter()
+        matches = plan.evaluate_batch(columns)
+        elapsed = time.perf_counter() - start
+        print(f"📋 {matches.size} lignes évaluées en colonnes en {elapsed * 1000:.1f} ms")
+        _print_hits(plan, {rule_id: int(mask.sum()) for rule_id, mask in matches.masks.items()},
+                    matches.skipped)
+        sys.exit(0)
+
+    from stream_reader import iter_records
+    from web_scanner import WebScanner
+    from compact_results import compact_results
+    results = [result for result in compact_results(iter_records(args.path))
+               if isinstance(result.get("collection"), Mapping)]
+    start = time.perf_counter()
+    matched, anomalies = [], []
+    for result in results:
+        evaluation = plan.evaluate(result)
+        rules = [rule for name in plan.sections for rule in evaluation.matches(name)]
+        matched.append(rules)
+        anomalies.append([{"severity": rule.severity, "title": rule.title,
+                           "description": rule.describe(evaluation)} for rule in rules])
+    elapsed = time.perf_counter() - start
+    print(f"📋 {len(results)} résultats réévalués en {elapsed * 1000:.1f} ms")
+
+    hits = {}
+    for rules in matched:
+        for rule in rules:
+            hits[rule.id] = hits.get(rule.id, 0) + 1
+    _print_hits(plan, hits)
+
+    levels = {"avant": {}, "après": {}}
+    changed = 0
+    sink = sink_from_args(args)
+    for result, found in zip(results, anomalies):
+        before = (result.get("analysis") or {}).get("risk_level")
+        score, level = WebScanner.score_anomalies(found)
+        levels["avant"][before] = levels["avant"].get(before, 0) + 1
+        levels["après"][level] = levels["après"].get(level, 0) + 1
+        changed += found != result.get("anomalies")
+        if sink is not None:
+            analysis = {**(result.get("analysis") or {}), "risk_score": score,
+                        "risk_level": level, "anomalies_count": len(found)}
+            sink.write({**result, "anomalies": found, "analysis": analysis})
+    if sink is not None:
+        sink.close()
+    print(f"\n{'niveau':<10} {'avant':>8} {'après':>8}")
+    for level in SEVERITIES:
+        print(f"{level:<10} {levels['avant'].get(level, 0):>8} {levels['après'].get(level, 0):>8}")
+    print(f"✓ {changed} résultats changent d'anomalies")
+
+    if args.check:
+        start = time.perf_counter()
+        batch = plan.evaluate_batch(plan.columns(results))
+        elapsed = time.perf_counter() - start
+        mismatches = sum(batch.rule_ids(i) != {rule.id for rule in rules} for i, rules in enumerate(matched))
+        if mismatches or batch.skipped:
+            print(f"\n❌ {mismatches} écarts, {len(batch.skipped)} règles non évaluées en colonnes")
+            sys.exit(1)
+        print(f"\n✓ Évaluation en colonnes identique sur {len(results)} résultats ({elapsed * 1000:.1f} ms)")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Pipeline de scan combiné
+Une seule requête HTTP et un seul parsing HTML alimentent à la fois
+WebScanner (analyse externe) et MalwareScanner (analyse du contenu)
+"""
+
+import sys
+import json
+import argparse
+
+from web_scanner import WebScanner
+from malware_scanner import MalwareScanner, MALWARE_KEYS
+from html_document import HTMLDocument
+from http_session import get_session
+from external_scripts import add_external_script_arguments, configure_external_from_args
+from scan_state import malware_current, UNCHANGED, NOT_MODIFIED
+from metrics import profiled
+
+
+class CombinedScanner:
+    """Scan externe + détection de malware sur un seul téléchargement"""
+
+    def __init__(self, url, verbose=False, quiet=False, session=None, cpu_stage=None,
+                 **web_options):
+        self.url = url
+        self.session = session or get_session()
+        self.web = WebScanner(url, verbose=verbose, quiet=quiet, session=self.session,
+                              **web_options)
+        self.malware = MalwareScanner(url, session=self.session, metrics=self.web.metrics)
+        # Un rescan sans contenu (304) doit pouvoir reprendre le résultat malware
+        self.web.requires_malware_state = True
+        # Pool de processus : le parsing unique et l'analyse malware y sont déportés
+        self.cpu_stage = cpu_stage
+        self.web.defer_parsing = cpu_stage is not None
+        self.results = self.web.results
+
+    def run(self):
+        """Collecte (HTTP/TLS/WHOIS en parallèle), puis les deux analyses"""
+        metrics = self.web.metrics
+        with profiled(self.web.profiler, self.web.domain, metrics), metrics.phase("scan"):
+            self.web.run_steps(save_state=False)
+            self.results["malware"] = self.analyze_malware()
+            self.web.save_state(malware=self.results["malware"])
+        self.results["metrics"] = metrics.to_dict()
+        return self.results
+
+    def analyze_malware(self):
+        """Analyse malware sur la réponse et le document déjà collectés"""
+        incremental = self.results.get("incremental")
+        if incremental and incremental["status"] in (UNCHANGED, NOT_MODIFIED) \
+                and malware_current(self.web.previous_state):
+            # Contenu identique au scan précédent
+            incremental["malware_reused"] = True
+            return self.web.previous_state["malware"]
+        
+        response, document = self.web.response, self.web.document
+        if response is None:
+            return {"error": "Impossible de récupérer le contenu"}
+        if self.cpu_stage is not None:
+            return self.analyze_offloaded(response)
+        if response.status_code >= 400:
+            # Même règle que MalwareScanner.fetch_content (raise_for_status)
+            return {"error": f"HTTP {response.status_code}"}
+        if document is None:
+            # Parsing sauté (contenu inchangé) mais résultat malware absent
+            document = self.web.document = HTMLDocument.parse(response.content)
+
+        self.malware.analyze_document(document, response.headers, verbose=False)
+        return {key: self.malware.results[key] for key in MALWARE_KEYS}
+
+    def analyze_offloaded(self, response):
+        """Parsing et analyse dans le pool CPU (structure HTML + malware)"""
+        with self.web.metrics.phase("cpu_stage"):
+            result = self.cpu_stage.analyze_combined(self.url, response)
+        self.web.metrics.merge(result["metrics"])
+        if self.results["collection"].get("html_structure") is None:
+            # Parsing différé par WebScanner (defer_parsing)
+            self.results["collection"]["html_structure"] = result["html_structure"]
+        if result["malware"] is None:
+            return {"error": f"HTTP {response.status_code}"}
+        return result["malware"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scan combiné (externe + malware) avec un seul téléchargement"
+    )
+    parser.add_argument("url", help="URL du site à analyser")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mode verbeux")
+    add_external_script_arguments(parser)
+    args = parser.parse_args()
+    configure_external_from_args(args)
+
+    if not args.url.startswith(('http://', 'https://')):
+        args.url = 'https://' + args.url
+
+    try:
+        results = CombinedScanner(args.url, verbose=args.verbose, quiet=True).run()
+        print(json.dumps(results, indent=2, ensure_ascii=False, default=str))
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Scan interrompu par l'utilisateur")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+État des scans précédents (SQLite)
+Par URL : validateurs HTTP (ETag, Last-Modified), empreinte SHA-256 du
+contenu, collecte HTTP et anomalies par section d'analyse, résultat malware.
+Un rescan envoie If-None-Match / If-Modified-Since ; sur 304 ou contenu
+identique, le parsing et l'analyse du contenu sont sautés et seules les
+sections dont les données d'entrée ont changé sont réévaluées.
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+
+DEFAULT_PATH = ".scan_state.sqlite"
+
+# Issue d'un scan incrémental (results["incremental"]["status"])
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+NOT_MODIFIED = "not_modified"
+
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def response_digest(response) -> str:
+    """Empreinte du corps : calculée pendant le téléchargement borné si possible"""
+    return getattr(response, "body_sha256", None) or content_digest(response.content)
+
+
+def validators(headers) -> dict:
+    """Validateurs de cache d'une réponse HTTP"""
+    return {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+
+
+def conditional_headers(state) -> dict:
+    """En-têtes de requête conditionnelle à partir de l'état enregistré"""
+    headers = {}
+    if state and state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state and state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    return headers
+
+
+def web_current(state) -> bool:
+    """Le bloc web enregistré correspond-il au dernier contenu vu ? (un scan
+    malware seul met à jour l'empreinte sans le bloc web)"""
+    return bool(state) and state.get("web") is not None \
+        and state.get("web_digest") == state.get("digest")
+
+
+def malware_current(state) -> bool:
+    """Le résultat malware enregistré correspond-il au dernier contenu vu ?"""
+    return bool(state) and state.get("malware") is not None \
+        and state.get("malware_digest") == state.get("digest")
+
+
+class ScanStateStore:
+    """État par URL partagé par WebScanner, MalwareScanner et le mode batch"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.stats = {NEW: 0, CHANGED: 0, UNCHANGED: 0, NOT_MODIFIED: 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS scan_state (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                digest TEXT,
+                web TEXT,
+                web_digest TEXT,
+                malware TEXT,
+                malware_digest TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scan_state)")}
+        if "web_digest" not in columns:
+            # Base antérieure : blocs web non datés, considérés comme périmés
+            self._conn.execute("ALTER TABLE scan_state ADD COLUMN web_digest TEXT")
+
+    def get(self, url):
+        """État enregistré pour l'URL (blocs JSON décodés), ou None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, digest, web, web_digest, malware, malware_digest, updated_at "
+                "FROM scan_state WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, digest, web, web_digest, malware, malware_digest, updated_at = row
+        return {
+            "etag": etag,
+            "last_modified": last_modified,
+            "digest": digest,
+            "web": json.loads(web) if web else None,
+            "web_digest": web_digest,
+            "malware": json.loads(malware) if malware else None,
+            "malware_digest": malware_digest,
+            "updated_at": updated_at
+        }
+
+    def save(self, url, validators, digest, web=None, malware=None):
+        """Met à jour l'état ; les blocs non fournis restent inchangés"""
+        columns = {"etag": validators.get("etag"),
+                   "last_modified": validators.get("last_modified"),
+                   "digest": digest,
+                   "updated_at": time.time()}
+        if web is not None:
+            columns["web"] = json.dumps(web, ensure_ascii=False, default=str)
+            columns["web_digest"] = digest
+        if malware is not None:
+            columns["malware"] = json.dumps(malware, ensure_ascii=False, default=str)
+            columns["malware_digest"] = digest
+        names = ", ".join(columns)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in columns)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO scan_state (url, {names}) VALUES (?{', ?' * len(columns)}) "
+                f"ON CONFLICT(url) DO UPDATE SET {updates}",
+                (url, *columns.values())
+            )
+
+    def record(self, status):
+        with self._lock:
+            self.stats[status] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def add_state_arguments(parser):
+    """Option de rescan incrémental partagée par les CLIs"""
+    parser.add_argument("--state-db", metavar="FICHIER",
+                        help="État des scans précédents (SQLite) pour les rescans incrémentaux")
+
+
+def state_options(args):
+    """Arguments de scanner correspondant à --state-db"""
+    return {"state_store": ScanStateStore(args.state_db) if args.state_db else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspection de l'état des scans")
+    parser.add_argument("--path", default=DEFAULT_PATH, help=f"Fichier SQLite (défaut : {DEFAULT_PATH})")
+    parser.add_argument("--forget", metavar="URL", help="Supprime l'état d'une URL (rescan complet)")
+    args = parser.parse_args()
+
+    store = ScanStateStore(args.path)
+    if args.forget:
+        store._conn.execute("DELETE FROM scan_state WHERE url = ?", (args.forget,))
+    total, with_malware, with_validators = store._conn.execute(
+        "SELECT COUNT(*), COUNT(malware), COUNT(COALESCE(etag, last_modified)) FROM scan_state"
+    ).fetchone()
+    print(f"📋 {total} URLs suivies ({with_validators} avec validateurs HTTP, "
+          f"{with_malware} avec résultat malware)")
+    store.close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
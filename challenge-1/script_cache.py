@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Cache de verdicts des scripts inline
+Les mêmes scripts (analytics, amorces de CMS) reviennent sur des milliers de
+pages : l'empreinte du contenu donne accès aux patterns trouvés et au
+verdict d'obfuscation déjà calculés. LRU borné en mémoire, persistance
+SQLite optionnelle entre les exécutions.
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+
+import obfuscation
+from obfuscation import obfuscation_features
+
+try:
+    import xxhash
+except ImportError:  # dépendance optionnelle
+    xxhash = None
+
+
+DEFAULT_MAX_ENTRIES = 20_000
+DIGESTS = ('md5', 'blake2b', 'xxh64')
+
+# Les seuils d'obfuscation font partie de la clé : les changer invalide le cache
+_OBFUSCATION_SIGNATURE = hashlib.sha1(repr((
+    obfuscation.MIN_LENGTH, obfuscation.MAX_NON_ALNUM_RATIO, obfuscation.MAX_HEX_ESCAPES,
+    obfuscation.MAX_SHORT_IDENTIFIERS, obfuscation.ENTROPY_SAMPLE
+)).encode()).hexdigest()[:8]
+
+
+def digest_function(name: str):
+    """Fonction str → empreinte hexadécimale pour l'algorithme demandé"""
+    if name == 'md5':
+        return lambda content: hashlib.md5(content.encode()).hexdigest()
+    if name == 'blake2b':
+        return lambda content: hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+    if name == 'xxh64':
+        if xxhash is None:
+            raise ValueError("xxh64 nécessite le paquet xxhash (pip install xxhash)")
+        return lambda content: xxhash.xxh64_hexdigest(content.encode())
+    raise ValueError(f"Empreinte inconnue : {name}")
+
+
+class ScriptVerdict:
+    """Patterns trouvés et caractéristiques d'obfuscation d'un script"""
+
+    __slots__ = ('matches', 'features')
+
+    def __init__(self, matches, features):
+        self.matches = matches      # [(pattern, nombre, offsets)]
+        self.features = features
+
+    def to_json(self):
+        return json.dumps({"matches": self.matches, "features": self.features})
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        return cls([tuple(m) for m in data["matches"]], data["features"])
+
+
+class ScriptCache:
+    """Empreinte de script → verdict, partagé par tous les scans du processus"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, digest='md5', path=None):
+        self.max_entries = max_entries
+        self.digest_name = digest
+        self.digest = digest_function(digest)
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "persistent_hits": 0, "misses": 0, "evictions": 0}
+
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts "
+                "(key TEXT PRIMARY KEY, verdict TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    def key(self, content: str, pattern_set, content_digest: str = None) -> str:
+        """Clé : jeu de patterns statiques + seuils + empreinte du contenu
+        (content_digest : empreinte déjà calculée avec self.digest)
+        (rien qui dépende du domaine : un même script est analysé une fois
+        pour tous les sites)"""
+        if content_digest is None:
+            content_digest = self.digest(content)
+        return f"{pattern_set.static.signature}:{_OBFUSCATION_SIGNATURE}:{self.digest_name}:{content_digest}"
+
+    def _get(self, key):
+        with self._lock:
+            verdict = self._entries.get(key)
+            if verdict is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return verdict, True
+            if self._conn is not None:
+                row = self._conn.execute("SELECT verdict FROM verdicts WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    verdict = ScriptVerdict.from_json(row[0])
+                    self._remember(key, verdict)
+                    self.stats["persistent_hits"] += 1
+                    return verdict, True
+            self.stats["misses"] += 1
+            return None, False
+
+    def _remember(self, key, verdict):
+        """Insertion LRU (verrou tenu)"""
+        self._entries[key] = verdict
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def analyze(self, content: str, pattern_set, content_digest: str = None, metrics=None):
+        """(verdict, trouvé dans le cache) pour un script ; pattern_set est le
+        SitePatterns du domaine scanné, metrics (ScanMetrics) reçoit le temps
+        regex et obfuscation des calculs"""
+        key = self.key(content, pattern_set, content_digest)
+        verdict, hit = self._get(key)
+        if not hit:
+            verdict = self._compute(key, content, pattern_set.static, metrics)
+
+        # Pattern iframe propre au domaine : hors cache, à chaque scan
+        start = time.perf_counter()
+        iframes = [(m.pattern, m.count, m.offsets) for m in pattern_set.scan_iframe(content)]
+        if metrics is not None:
+            metrics.count("regex_ms", (time.perf_counter() - start) * 1000)
+        if iframes:
+            verdict = ScriptVerdict(pattern_set.merge(verdict.matches, iframes), verdict.features)
+        return verdict, hit
+
+    def _compute(self, key, content, static_set, metrics):
+        # Calcul hors verrou : deux threads peuvent calculer le même verdict,
+        # le résultat est identique
+        start = time.perf_counter()
+        matches = [(m.pattern, m.count, m.offsets) for m in static_set.scan(content)]
+        scanned = time.perf_counter()
+        verdict = ScriptVerdict(matches, obfuscation_features(content))
+        if metrics is not None:
+            metrics.count("regex_ms", (scanned - start) * 1000)
+            metrics.count("obfuscation_ms", (time.perf_counter() - scanned) * 1000)
+        with self._lock:
+            self._remember(key, verdict)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO verdicts (key, verdict, stored_at) VALUES (?, ?, ?)",
+                    (key, verdict.to_json(), time.time())
+                )
+        return verdict
+
+    def hit_rate(self):
+        hits = self.stats["hits"] + self.stats["persistent_hits"]
+        total = hits + self.stats["misses"]
+        return round(hits / total, 3) if total else 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries), "hit_rate": self.hit_rate()}
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def configure_script_cache(**kwargs) -> ScriptCache:
+    """Remplace le cache partagé (taille, empreinte, persistance)"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is not None:
+            _default_cache.close()
+        _default_cache = ScriptCache(**kwargs)
+    return _default_cache
+
+
+def default_script_cache() -> ScriptCache:
+    """Cache partagé par tous les MalwareScanner du processus"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = ScriptCache()
+    return _default_cache
+
+
+def add_script_cache_arguments(parser):
+    """Options du cache de verdicts partagées par les CLIs"""
+    parser.add_argument("--script-cache", metavar="FICHIER",
+                        help="Persistance SQLite des verdicts de scripts inline")
+    parser.add_argument("--script-cache-size", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f"Verdicts conservés en mémoire (défaut : {DEFAULT_MAX_ENTRIES})")
+    parser.add_argument("--script-digest", choices=DIGESTS, default="md5",
+                        help="Empreinte des scripts : md5 (défaut), blake2b ou xxh64 (paquet xxhash)")
+
+
+def configure_from_args(args) -> ScriptCache:
+    return configure_script_cache(max_entries=args.script_cache_size,
+                                  digest=args.script_digest, path=args.script_cache)
+
+
+def check_cross_site(sites):
+    """Un script commun à plusieurs sites n'est analysé qu'une fois ; seul le
+    pattern iframe, propre au domaine, est réévalué"""
+    from pattern_engine import pattern_set_for
+
+    snippet = ("window.dataLayer=window.dataLayer||[];function gtag(){dataLayer.push(arguments);}"
+               "gtag('js',new Date());document.write('<iframe src=\"https://site0.test/\">');")
+    cache = ScriptCache()
+    verdicts = {}
+    for i in list(range(sites)) + [0]:
+        netloc = f"site{i}.test"
+        verdict, _ = cache.analyze(snippet, pattern_set_for(netloc))
+        verdicts[netloc] = verdict
+        expected = [(m.pattern, m.count, m.offsets) for m in pattern_set_for(netloc).scan(snippet)]
+        if verdict.matches != expected:
+            raise SystemExit(f"Verdict en cache différent de l'analyse directe pour {netloc}")
+    if cache.stats["misses"] != 1:
+        raise SystemExit(f"Cache inter-sites inopérant : {cache.stats['misses']} analyses pour un script")
+    print(f"cache    {sites} sites : 1 analyse, {cache.stats['hits']} verdicts réutilisés")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit des empreintes de scripts")
+    parser.add_argument("--size", type=int, default=4096, help="Taille des scripts en octets")
+    parser.add_argument("--count", type=int, default=20_000, help="Nombre de scripts")
+    parser.add_argument("--sites", type=int, default=100,
+                        help="Domaines partageant un même script pour la vérification du cache")
+    args = parser.parse_args()
+
+    check_cross_site(args.sites)
+
+    scripts = [f"var s{i}='" + "x" * args.size + "';" for i in range(args.count)]
+    total = sum(len(s) for s in scripts)
+    for name in DIGESTS:
+        try:
+            digest = digest_function(name)
+        except ValueError as e:
+            print(f"{name:<8} indisponible : {e}", file=sys.stderr)
+            continue
+        start = time.perf_counter()
+        for script in scripts:
+            digest(script)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<8} {total / elapsed / 1e6:>8.0f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
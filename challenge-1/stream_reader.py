@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Lecture incrémentale de jeux de données de scan
+Produit les enregistrements un par un depuis un tableau JSON de premier
+niveau (format data.json / data_stream.json) ou depuis du NDJSON, sans
+charger le fichier entier : la mémoire reste proportionnelle au plus gros
+enregistrement, pas à la taille du fichier. Les fichiers .gz sont acceptés.
+"""
+
+import io
+import sys
+import gzip
+import json
+import argparse
+import resource
+from typing import Iterator
+
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = ' \t\n\r'
+
+
+def open_dataset(path: str):
+    """Ouvre un fichier texte ('-' pour stdin, décompression .gz transparente)"""
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def _iter_json_array(stream, buffer: str, chunk_size: int) -> Iterator[dict]:
+    """Décode les éléments d'un tableau JSON au fil de la lecture"""
+    decoder = json.JSONDecoder()
+    pos = 0
+    eof = False
+
+    def read_more(minimum):
+        nonlocal buffer, pos, eof
+        # Compactage : on ne garde que la partie non consommée
+        buffer = buffer[pos:]
+        pos = 0
+        chunk = stream.read(max(chunk_size, minimum))
+        if chunk:
+            buffer += chunk
+        else:
+            eof = True
+
+    while True:
+        # Séparateurs entre éléments
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            read_more(chunk_size)
+        if pos >= len(buffer):
+            raise ValueError("Tableau JSON non terminé")
+        char = buffer[pos]
+        if char == ']':
+            return
+        if char == ',':
+            pos += 1
+            continue
+
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Enregistrement incomplet : lecture d'au moins autant (croissance
+            # géométrique, pas de re-décodage quadratique)
+            read_more(len(buffer) - pos)
+            continue
+        if end == len(buffer) and not eof:
+            # Un scalaire peut être tronqué en fin de tampon : on complète
+            read_more(chunk_size)
+            continue
+        pos = end
+        yield record
+
+
+def _iter_ndjson(stream, buffer: str) -> Iterator[dict]:
+    """Une valeur JSON par ligne (lignes vides ignorées)"""
+    def lines():
+        # Le tampon déjà lu peut se terminer au milieu d'une ligne
+        head = buffer.split('\n')
+        partial = head.pop()
+        yield from head
+        for line in stream:
+            if partial:
+                line, partial = partial + line, ''
+            yield line
+        if partial:
+            yield partial
+
+    for line in lines():
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(source, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """Enregistrements d'un chemin ou d'un flux texte (tableau JSON ou NDJSON)"""
+    stream = open_dataset(source) if isinstance(source, str) else source
+    try:
+        buffer = ''
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+            stripped = buffer.lstrip(_WHITESPACE + '\ufeff')
+            if stripped:
+                break
+        if stripped[0] == '[':
+            yield from _iter_json_array(stream, stripped[1:], chunk_size)
+        else:
+            yield from _iter_ndjson(stream, stripped)
+    finally:
+        if isinstance(source, str) and source != '-':
+            stream.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convertit un jeu de données (tableau JSON ou NDJSON) en NDJSON, en flux"
+    )
+    parser.add_argument("input", help="Fichier source ('-' pour stdin, .gz accepté)")
+    parser.add_argument("--drop", default="",
+                        help="Champs à retirer, séparés par des virgules (ex : html,ports)")
+    parser.add_argument("--count", action="store_true",
+                        help="Affiche seulement le nombre d'enregistrements et la RSS crête")
+    args = parser.parse_args()
+
+    drop = [field for field in args.drop.split(',') if field]
+    count = 0
+    for record in iter_records(args.input):
+        count += 1
+        if args.count:
+            continue
+        for field in drop:
+            record.pop(field, None)
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    if args.count:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{count} enregistrements, RSS crête {peak:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Magasin de certificats TLS partagé
+Un seul contexte SSL par processus ; les certificats sont décodés une fois
+par empreinte SHA-256 (un certificat wildcard partagé par de nombreux
+sous-domaines n'est parsé qu'une fois). Chaque collecte fait une poignée
+de main complète, sans reprise de session : un ticket repris restitue le
+certificat du ticket et masquerait un certificat renouvelé depuis.
+Les champs dépendant de la date (jours restants, expiration) sont
+recalculés à chaque lecture.
+"""
+
+import ssl
+import sys
+import socket
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import OpenSSL.crypto
+
+
+CERT_TIME_FORMAT = '%Y%m%d%H%M%SZ'
+DEFAULT_MAX_CERTIFICATES = 4096
+DEFAULT_MAX_ENDPOINTS = 16384
+DEFAULT_TIMEOUT = 5
+
+_context = None
+_context_lock = threading.Lock()
+
+
+def configure_tls_context(cafile=None):
+    """Remplace le contexte partagé (ex. : autorité de test pour un benchmark)"""
+    global _context
+    with _context_lock:
+        _context = ssl.create_default_context(cafile=cafile)
+    return _context
+
+
+def shared_context() -> ssl.SSLContext:
+    """Contexte SSL du processus, créé au premier appel"""
+    global _context
+    if _context is None:
+        with _context_lock:
+            if _context is None:
+                _context = ssl.create_default_context()
+    return _context
+
+
+def _components(name):
+    return {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+            for k, v in name.get_components()}
+
+
+def decode_certificate(der: bytes) -> dict:
+    """Champs invariants d'un certificat DER (format de collection["tls"])"""
+    cert = OpenSSL.crypto.load_certificate(OpenSSL.crypto.FILETYPE_ASN1, der)
+    return {
+        "subject": _components(cert.get_subject()),
+        "issuer": _components(cert.get_issuer()),
+        "version": cert.get_version(),
+        "serial_number": cert.get_serial_number(),
+        "not_before": datetime.strptime(cert.get_notBefore().decode('ascii'), CERT_TIME_FORMAT),
+        "not_after": datetime.strptime(cert.get_notAfter().decode('ascii'), CERT_TIME_FORMAT),
+        "signature_algorithm": cert.get_signature_algorithm().decode()
+    }
+
+
+class CertificateStore:
+    """Certificats décodés par empreinte et dernier certificat vu par (hôte, port, SNI)"""
+
+    def __init__(self, max_certificates=DEFAULT_MAX_CERTIFICATES, context=None,
+                 max_endpoints=DEFAULT_MAX_ENDPOINTS):
+        self.max_certificates = max_certificates
+        self.max_endpoints = max_endpoints
+        self.context = context
+        self._decoded = OrderedDict()   # empreinte → champs invariants (LRU)
+        self._endpoints = OrderedDict() # (hôte, port, SNI) → empreinte (LRU)
+        self._lock = threading.Lock()
+        self.stats = {"handshakes": 0, "decodes": 0, "decode_hits": 0, "certificate_changes": 0}
+
+    def decoded(self, der: bytes, fingerprint: str = None) -> dict:
+        """Champs invariants du certificat, décodés au premier passage seulement"""
+        fingerprint = fingerprint or hashlib.sha256(der).hexdigest()
+        with self._lock:
+            fields = self._decoded.get(fingerprint)
+            if fields is not None:
+                self._decoded.move_to_end(fingerprint)
+                self.stats["decode_hits"] += 1
+                return fields
+        fields = decode_certificate(der)
+        with self._lock:
+            self._decoded[fingerprint] = fields
+            self.stats["decodes"] += 1
+            while len(self._decoded) > self.max_certificates:
+                self._decoded.popitem(last=False)
+        return fields
+
+    def _handshake(self, host, port, sni, timeout):
+        context = self.context or shared_context()
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            with context.wrap_socket(sock, server_hostname=sni) as secure_sock:
+                der = secure_sock.getpeercert(binary_form=True)
+        return der, self.record_handshake((host, port, sni), der)
+
+    def record_handshake(self, key, der) -> str:
+        """Enregistre une poignée de main (aussi utilisé par le moteur asyncio)"""
+        fingerprint = hashlib.sha256(der).hexdigest()
+        with self._lock:
+            previous = self._endpoints.get(key)
+            self.stats["handshakes"] += 1
+            if previous and previous != fingerprint:
+                self.stats["certificate_changes"] += 1
+            self._endpoints[key] = fingerprint
+            self._endpoints.move_to_end(key)
+            while len(self._endpoints) > self.max_endpoints:
+                self._endpoints.popitem(last=False)
+        return fingerprint
+
+    def fetch(self, host, port=443, sni=None, timeout=DEFAULT_TIMEOUT) -> dict:
+        """Certificat présenté par host:port, au format de collection["tls"]"""
+        der, fingerprint = self._handshake(host, port, sni or host, timeout)
+        return self.describe(der, fingerprint)
+
+    def describe(self, der: bytes, fingerprint: str = None) -> dict:
+        """Certificat DER au format de collection["tls"] (champs datés recalculés)"""
+        fingerprint = fingerprint or hashlib.sha256(der).hexdigest()
+        fields = self.decoded(der, fingerprint)
+        not_after = fields["not_after"]
+        return {
+            "subject": fields["subject"],
+            "issuer": fields["issuer"],
+            "version": fields["version"],
+            "serial_number": fields["serial_number"],
+            "not_before": fields["not_before"].isoformat(),
+            "not_after": not_after.isoformat(),
+            # Dépendants de la date : jamais mis en cache
+            "days_until_expiry": (not_after - datetime.now()).days,
+            "signature_algorithm": fields["signature_algorithm"],
+            "has_expired": datetime.now(timezone.utc).replace(tzinfo=None) > not_after,
+            "fingerprint_sha256": fingerprint
+        }
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "certificates": len(self._decoded),
+                    "endpoints": len(self._endpoints)}
+
+
+_default_store = None
+
+
+def default_store() -> CertificateStore:
+    """Magasin partagé par tous les scanners du processus"""
+    global _default_store
+    if _default_store is None:
+        with _context_lock:
+            if _default_store is None:
+                _default_store = CertificateStore()
+    return _default_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Récupération de certificats via le magasin partagé")
+    parser.add_argument("hosts", nargs="+", help="Hôtes (hote[:port])")
+    parser.add_argument("--rounds", type=int, default=2,
+                        help="Passes successives, pour observer le cache des certificats décodés (défaut : 2)")
+    parser.add_argument("--cafile", help="Autorité de certification (remplace le magasin système)")
+    args = parser.parse_args()
+    if args.cafile:
+        configure_tls_context(args.cafile)
+
+    store = default_store()
+    for _ in range(args.rounds):
+        for target in args.hosts:
+            host, _, port = target.partition(':')
+            try:
+                cert = store.fetch(host, int(port or 443))
+                print(f"✓ {target} : {cert['fingerprint_sha256'][:16]}… "
+                      f"expire dans {cert['days_until_expiry']} jours")
+            except Exception as e:
+                print(f"✗ {target} : {e}", file=sys.stderr)
+    print(store.snapshot())
+
+
+if __name__ == "__main__":
+    main()
@@ -5,22 +5,76 @@ Scanner de site web - Challenge 1
 """
 
 import sys
-import ssl
-import socket
 import json
+import time
 import whois
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse
-import requests
-from bs4 import BeautifulSoup
-import OpenSSL.crypto
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from http_session import get_session, fetch_bounded, add_download_arguments, configure_download_from_args
+from tls_cache import default_store
+from scan_state import (response_digest, validators, conditional_headers, malware_current,
+                        web_current, NEW, CHANGED, UNCHANGED, NOT_MODIFIED)
+from html_document import HTMLDocument, BACKENDS, set_default_backend
+from metrics import ScanMetrics, profiled
+from whois_cache import query_whois_server
+from rule_engine import default_plan, add_rules_arguments, configure_rules_from_args
 
 
 class WebScanner:
-    def __init__(self, url, verbose=False):
+    # Section du plan de règles → méthode d'analyse ; les sections ajoutées
+    # au fichier de règles passent directement par apply_rules
+    ANALYSIS_SECTIONS = {
+        "certificate": "analyze_certificate",
+        "redirections": "analyze_redirections",
+        "html_size": "analyze_html_size",
+        "security_headers": "analyze_security_headers",
+        "domain_age": "analyze_domain_age",
+    }
+    
+    # Poids des sévérités et seuils des niveaux de risque (repris par bulk_scoring)
+    SEVERITY_WEIGHTS = {
+        "CRITICAL": 100,
+        "HIGH": 50,
+        "MEDIUM": 20,
+        "LOW": 5
+    }
+    RISK_THRESHOLDS = ((100, "CRITICAL"), (50, "HIGH"), (20, "MEDIUM"))
+    
+    def __init__(self, url, verbose=False, quiet=False, concurrent_collection=True,
+                 session=None, whois_cache=None, whois_timeout=10, tls_store=None,
+                 state_store=None, profiler=None, whois_server=None, rule_plan=None):
         self.url = url
         self.verbose = verbose
+        self.quiet = quiet
+        self.concurrent_collection = concurrent_collection
+        self.session = session or get_session()
+        self.whois_cache = whois_cache
+        self.whois_timeout = whois_timeout
+        self.whois_server = whois_server
+        self.tls_store = tls_store or default_store()
+        # Réponse et document de la requête principale (réutilisés par le pipeline combiné)
+        self.response = None
+        self.document = None
+        # Parsing confié à un autre étage (pool CPU du pipeline combiné)
+        self.defer_parsing = False
+        # Rescans incrémentaux : état du scan précédent de cette URL
+        self.state_store = state_store
+        self.previous_state = None
+        self.requires_malware_state = False
+        self.content_digest = None
+        self.sections = {}
+        # Durées par phase, volumes et profilage optionnel (metrics.py)
+        self.metrics = ScanMetrics()
+        self.profiler = profiler
+        if profiler is not None and profiler.sequential:
+            self.concurrent_collection = False
+        # Règles de détection compilées (rule_engine.py), partagées par les scans
+        self.rule_plan = rule_plan or default_plan()
+        self.rule_evaluation = None
         self.parsed_url = urlparse(url)
         self.domain = self.parsed_url.netloc
         self.results = {
@@ -37,6 +91,11 @@ class WebScanner:
         if self.verbose:
             print(f"[INFO] {message}")
     
+    def echo(self, message=""):
+        """Affiche la progression du scan (désactivé en mode batch)"""
+        if not self.quiet:
+            print(message)
+    
     # ========== ÉTAPE 1 : COLLECTE & INGESTION ==========
     
     def collect_http_data(self):
@@ -44,33 +103,17 @@ class WebScanner:
         self.log("Collecte des données HTTP...")
         
         try:
-            response = requests.get(
-                self.url, 
-                allow_redirects=True,
-                timeout=10,
-                headers={'User-Agent': 'Mozilla/5.0 WebScanner/1.0'}
-            )
-            
-            self.results["collection"]["http"] = {
-                "status_code": response.status_code,
-                "final_url": response.url,
-                "redirects": [r.url for r in response.history],
-                "headers": dict(response.headers),
-                "html_size": len(response.content),
-                "content_type": response.headers.get('Content-Type', 'unknown')
-            }
-            
-            # Parse HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            self.results["collection"]["html_structure"] = {
-                "title": soup.title.string if soup.title else None,
-                "meta_tags": len(soup.find_all('meta')),
-                "scripts": len(soup.find_all('script')),
-                "iframes": len(soup.find_all('iframe')),
-                "forms": len(soup.find_all('form'))
-            }
+            with self.metrics.phase("fetch"):
+                # Corps lu par blocs et plafonné (http_session.fetch_bounded)
+                response = fetch_bounded(
+                    self.session,
+                    self.url,
+                    allow_redirects=True,
+                    timeout=10,
+                    headers=self.http_request_headers()
+                )
             
-            self.log(f"✓ HTTP collecté : {response.status_code}, {len(response.content)} bytes")
+            self.handle_http_response(response)
             return True
             
         except Exception as e:
@@ -78,6 +121,111 @@ class WebScanner:
             self.log(f"✗ Erreur HTTP : {e}")
             return False
     
+    def http_request_headers(self):
+        """En-têtes de la requête principale (conditionnelle si un état existe)"""
+        headers = {'User-Agent': 'Mozilla/5.0 WebScanner/1.0'}
+        if self.state_store is not None:
+            self.previous_state = self.state_store.get(self.url)
+            if self._state_reusable():
+                headers.update(conditional_headers(self.previous_state))
+        return headers
+    
+    def handle_http_response(self, response):
+        """Réponse de la requête principale (moteurs synchrone et asyncio)"""
+        self.response = response
+        self.metrics.count("bytes_downloaded", len(response.content))
+        if response.status_code == 304 and self._state_reusable():
+            self.restore_http_state(response)
+        else:
+            self.ingest_http_response(response)
+        
+        self.log(f"✓ HTTP collecté : {response.status_code}, {len(response.content)} bytes")
+    
+    def ingest_http_response(self, response):
+        """Enregistre la réponse HTTP et parse le HTML une seule fois"""
+        self.results["collection"]["http"] = {
+            "status_code": response.status_code,
+            "final_url": response.url,
+            "redirects": [r.url for r in response.history],
+            "headers": dict(response.headers),
+            "html_size": len(response.content),
+            "content_type": response.headers.get('Content-Type', 'unknown')
+        }
+        if getattr(response, "truncated", False):
+            # Seul le début de la page (plafond de téléchargement) est analysé
+            self.results["collection"]["http"]["truncated"] = True
+        
+        if self.state_store is not None:
+            self.content_digest = response_digest(response)
+            if self._state_reusable() and self.content_digest == self.previous_state["digest"]:
+                # Contenu identique au scan précédent : pas de nouveau parsing
+                self.results["collection"]["html_structure"] = self.previous_state["web"]["html_structure"]
+                self._set_incremental(UNCHANGED)
+                return
+            self._set_incremental(CHANGED if self.previous_state else NEW)
+        
+        if self.defer_parsing:
+            # Structure complétée par le pipeline après le parsing hors processus
+            self.results["collection"]["html_structure"] = None
+            return
+        
+        self.parse_response(response)
+    
+    def parse_response(self, response):
+        """Parsing de la page (délégué à un thread par le moteur asyncio)"""
+        self.set_document(self.parse_document(response.content))
+    
+    def parse_document(self, content) -> HTMLDocument:
+        with self.metrics.phase("parse"):
+            return HTMLDocument.parse(content)
+    
+    def set_document(self, document: HTMLDocument):
+        # Le document parsé reste disponible pour d'autres analyseurs
+        self.document = document
+        self.results["collection"]["html_structure"] = document.structure()
+        self.metrics.record_document(document)
+    
+    def _state_reusable(self):
+        """L'état précédent suffit-il à reconstituer un scan sans le contenu ?"""
+        state = self.previous_state
+        if not state or not state.get("digest") or not web_current(state):
+            return False
+        return malware_current(state) or not self.requires_malware_state
+    
+    def _set_incremental(self, status):
+        self.results["incremental"] = {"status": status, "sections_reused": []}
+        self.state_store.record(status)
+    
+    def restore_http_state(self, response):
+        """Réponse 304 : collecte HTTP et structure reprises du scan précédent"""
+        previous = self.previous_state
+        self.results["collection"]["http"] = previous["web"]["http"]
+        self.results["collection"]["html_structure"] = previous["web"]["html_structure"]
+        self.content_digest = previous["digest"]
+        self._set_incremental(NOT_MODIFIED)
+    
+    def save_state(self, malware=None):
+        """Enregistre validateurs, empreinte et anomalies par section"""
+        if self.state_store is None or self.content_digest is None:
+            return
+        response_validators = validators(self.response.headers)
+        if self.response.status_code == 304:
+            # Un 304 peut omettre les validateurs : on garde les précédents
+            response_validators = {key: response_validators[key] or self.previous_state[key]
+                                   for key in response_validators}
+        collection = self.results["collection"]
+        self.state_store.save(
+            self.url,
+            response_validators,
+            self.content_digest,
+            web={
+                "http": collection["http"],
+                "html_structure": collection["html_structure"],
+                "sections": self.sections
+            },
+            malware=malware
+        )
+    
     def collect_tls_certificate(self):
         """Récupération du certificat TLS/SSL"""
         self.log("Collecte du certificat TLS...")
@@ -88,106 +236,54 @@ class WebScanner:
             return False
         
         try:
-            hostname = self.domain
-            port = 443
+            # Nom d'hôte sans port ni identifiants ; port explicite respecté
+            hostname = self.parsed_url.hostname
+            port = self.parsed_url.port or 443
             
-            # Connexion SSL
-            context = ssl.create_default_context()
-            with socket.create_connection((hostname, port), timeout=5) as sock:
-                with context.wrap_socket(sock, server_hostname=hostname) as secure_sock:
-                    cert_bin = secure_sock.getpeercert(binary_form=True)
-                    cert = OpenSSL.crypto.load_certificate(
-                        OpenSSL.crypto.FILETYPE_ASN1, 
-                        cert_bin
-                    )
-                    
-                    # Extraction des informations
-                    subject = {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v 
-                               for k, v in cert.get_subject().get_components()}
-                    issuer = {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v 
-                              for k, v in cert.get_issuer().get_components()}
-                    
-                    not_before = datetime.strptime(
-                        cert.get_notBefore().decode('ascii'),
-                        '%Y%m%d%H%M%SZ'
-                    )
-                    not_after = datetime.strptime(
-                        cert.get_notAfter().decode('ascii'),
-                        '%Y%m%d%H%M%SZ'
-                    )
-                    
-                    self.results["collection"]["tls"] = {
-                        "subject": subject,
-                        "issuer": issuer,
-                        "version": cert.get_version(),
-                        "serial_number": cert.get_serial_number(),
-                        "not_before": not_before.isoformat(),
-                        "not_after": not_after.isoformat(),
-                        "days_until_expiry": (not_after - datetime.now()).days,
-                        "signature_algorithm": cert.get_signature_algorithm().decode(),
-                        "has_expired": cert.has_expired()
-                    }
-                    
-                    self.log(f"✓ Certificat collecté : expire dans {self.results['collection']['tls']['days_until_expiry']} jours")
-                    return True
+            # Contexte SSL partagé, certificat décodé une fois par empreinte
+            with self.metrics.phase("tls"):
+                tls = self.tls_store.fetch(hostname, port, timeout=5)
+            self.results["collection"]["tls"] = tls
+            
+            self.log(f"✓ Certificat collecté : expire dans {tls['days_until_expiry']} jours")
+            return True
                     
         except Exception as e:
             self.results["collection"]["tls_error"] = str(e)
             self.log(f"✗ Erreur TLS : {e}")
             return False
     
+    def _query_whois(self):
+        """Interrogation WHOIS brute : dates normalisées au format ISO (sérialisable)"""
+        if self.whois_server:
+            w = query_whois_server(self.parsed_url.hostname, self.whois_server, self.whois_timeout)
+        else:
+            w = whois.whois(self.domain, timeout=self.whois_timeout)
+        
+        def first(value):
+            # Les dates peuvent être des listes ou des dates uniques
+            if isinstance(value, list):
+                value = value[0]
+            return value.isoformat() if value else None
+        
+        return {
+            "domain_name": w.domain_name,
+            "registrar": w.registrar,
+            "creation_date": first(w.creation_date),
+            "expiration_date": first(w.expiration_date),
+            "updated_date": first(w.updated_date),
+            "name_servers": w.name_servers if w.name_servers else [],
+            "status": w.status if w.status else []
+        }
+    
     def collect_whois(self):
         """Extraction WHOIS : dates clés, registrar, durée de vie"""
         self.log("Collecte des données WHOIS...")
         
         try:
-            w = whois.whois(self.domain)
-            
-            # Normalisation des dates (peuvent être listes ou dates uniques)
-            creation_date = w.creation_date
-            if isinstance(creation_date, list):
-                creation_date = creation_date[0]
-            
-            expiration_date = w.expiration_date
-            if isinstance(expiration_date, list):
-                expiration_date = expiration_date[0]
-            
-            updated_date = w.updated_date
-            if isinstance(updated_date, list):
-                updated_date = updated_date[0]
-            
-            # Calcul de la durée de vie
-            age_days = None
-            if creation_date:
-                # S'assurer que creation_date est aware ou naive comme datetime.now()
-                if creation_date.tzinfo is None:
-                    age_days = (datetime.now() - creation_date).days
-                else:
-                    from datetime import timezone
-                    age_days = (datetime.now(timezone.utc) - creation_date).days
-            
-            days_until_expiry = None
-            if expiration_date:
-                # S'assurer que expiration_date est aware ou naive comme datetime.now()
-                if expiration_date.tzinfo is None:
-                    days_until_expiry = (expiration_date - datetime.now()).days
-                else:
-                    from datetime import timezone
-                    days_until_expiry = (expiration_date - datetime.now(timezone.utc)).days
-            
-            self.results["collection"]["whois"] = {
-                "domain_name": w.domain_name,
-                "registrar": w.registrar,
-                "creation_date": creation_date.isoformat() if creation_date else None,
-                "expiration_date": expiration_date.isoformat() if expiration_date else None,
-                "updated_date": updated_date.isoformat() if updated_date else None,
-                "age_days": age_days,
-                "days_until_expiry": days_until_expiry,
-                "name_servers": w.name_servers if w.name_servers else [],
-                "status": w.status if w.status else []
-            }
-            
-            self.log(f"✓ WHOIS collecté : {age_days} jours d'âge")
+            with self.metrics.phase("whois"):
+                record, from_cache = self.lookup_whois()
+            self.store_whois(record, from_cache)
             return True
             
         except Exception as e:
@@ -195,171 +291,120 @@ class WebScanner:
             self.log(f"✗ Erreur WHOIS : {e}")
             return False
     
+    def lookup_whois(self):
+        """(enregistrement brut, issu du cache) — appel bloquant"""
+        if self.whois_cache is not None:
+            return self.whois_cache.lookup(self.domain, self._query_whois)
+        return self._query_whois(), False
+    
+    def store_whois(self, record, from_cache):
+        """Résumé WHOIS dans la collecte : âge et expiration recalculés"""
+        creation_date = record["creation_date"] and datetime.fromisoformat(record["creation_date"])
+        expiration_date = record["expiration_date"] and datetime.fromisoformat(record["expiration_date"])
+        
+        # Durées recalculées à chaque scan : une entrée en cache reste exacte
+        age_days = None
+        if creation_date:
+            # S'assurer que creation_date est aware ou naive comme datetime.now()
+            if creation_date.tzinfo is None:
+                age_days = (datetime.now() - creation_date).days
+            else:
+                age_days = (datetime.now(timezone.utc) - creation_date).days
+        
+        days_until_expiry = None
+        if expiration_date:
+            # S'assurer que expiration_date est aware ou naive comme datetime.now()
+            if expiration_date.tzinfo is None:
+                days_until_expiry = (expiration_date - datetime.now()).days
+            else:
+                days_until_expiry = (expiration_date - datetime.now(timezone.utc)).days
+        
+        self.results["collection"]["whois"] = {
+            "domain_name": record["domain_name"],
+            "registrar": record["registrar"],
+            "creation_date": record["creation_date"],
+            "expiration_date": record["expiration_date"],
+            "updated_date": record["updated_date"],
+            "age_days": age_days,
+            "days_until_expiry": days_until_expiry,
+            "name_servers": record["name_servers"],
+            "status": record["status"]
+        }
+        if self.whois_cache is not None:
+            self.results["collection"]["whois"]["from_cache"] = from_cache
+        
+        self.log(f"✓ WHOIS collecté{' (cache)' if from_cache else ''} : {age_days} jours d'âge")
+    
+    def collect(self):
+        """Lance les trois collecteurs (en parallèle par défaut) et mesure leur durée"""
+        collectors = {
+            "http": self.collect_http_data,
+            "tls": self.collect_tls_certificate,
+            "whois": self.collect_whois
+        }
+        timings = {}
+        
+        def timed(name, collector):
+            start = time.perf_counter()
+            success = False
+            try:
+                success = collector()
+            finally:
+                timings[name] = {
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "success": bool(success)
+                }
+        
+        start = time.perf_counter()
+        if self.concurrent_collection:
+            # Les collecteurs sont des allers-retours réseau indépendants :
+            # la durée de collecte devient celle du plus lent
+            with ThreadPoolExecutor(max_workers=len(collectors)) as executor:
+                futures = [executor.submit(timed, name, collector)
+                           for name, collector in collectors.items()]
+                for future in futures:
+                    future.result()
+        else:
+            for name, collector in collectors.items():
+                timed(name, collector)
+        
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        self.results["collection"]["timings"] = {
+            name: timings[name] for name in (*collectors, "total_ms")
+        }
+    
     # ========== ÉTAPE 2 : ANALYSE & DÉTECTION ==========
     
     def analyze_certificate(self):
         """Certificat faible ou expirant"""
         self.log("Analyse du certificat...")
-        
-        if "tls" not in self.results["collection"] or "error" in self.results["collection"].get("tls", {}):
-            self.add_anomaly(
-                "CRITICAL",
-                "Absence de HTTPS",
-                "Le site n'utilise pas HTTPS, les données ne sont pas chiffrées"
-            )
-            return
-        
-        tls = self.results["collection"]["tls"]
-        
-        # Certificat expiré
-        if tls.get("has_expired"):
-            self.add_anomaly(
-                "CRITICAL",
-                "Certificat expiré",
-                "Le certificat SSL/TLS a expiré, connexion non sécurisée"
-            )
-        
-        # Certificat expirant bientôt
-        days_left = tls.get("days_until_expiry", 999)
-        if 0 < days_left <= 30:
-            self.add_anomaly(
-                "HIGH",
-                "Certificat expirant bientôt",
-                f"Le certificat expire dans {days_left} jours"
-            )
-        elif 30 < days_left <= 60:
-            self.add_anomaly(
-                "MEDIUM",
-                "Certificat expire dans moins de 2 mois",
-                f"Le certificat expire dans {days_left} jours, renouvellement recommandé"
-            )
-        
-        # Algorithme de signature faible
-        sig_algo = tls.get("signature_algorithm", "").lower()
-        if "md5" in sig_algo or "sha1" in sig_algo:
-            self.add_anomaly(
-                "HIGH",
-                "Algorithme de signature faible",
-                f"Utilisation de {sig_algo}, considéré comme non sécurisé"
-            )
+        self.apply_rules("certificate")
     
     def analyze_redirections(self):
         """Redirection anormale"""
         self.log("Analyse des redirections...")
-        
-        if "http" not in self.results["collection"]:
-            return
-        
-        http = self.results["collection"]["http"]
-        redirects = http.get("redirects", [])
-        
-        # Trop de redirections
-        if len(redirects) > 3:
-            self.add_anomaly(
-                "MEDIUM",
-                "Chaîne de redirection longue",
-                f"{len(redirects)} redirections détectées, peut indiquer du cloaking"
-            )
-        
-        # Redirection HTTP → HTTPS manquante
-        if self.parsed_url.scheme == 'http' and not any('https://' in r for r in redirects):
-            self.add_anomaly(
-                "MEDIUM",
-                "Pas de redirection HTTPS automatique",
-                "Le site n'impose pas HTTPS, risque d'interception"
-            )
-        
-        # Redirection vers un domaine différent
-        final_domain = urlparse(http.get("final_url", "")).netloc
-        if final_domain and final_domain != self.domain:
-            self.add_anomaly(
-                "MEDIUM",
-                "Redirection vers un domaine différent",
-                f"Redirection de {self.domain} vers {final_domain}"
-            )
+        self.apply_rules("redirections")
     
     def analyze_html_size(self):
         """Taille HTML anormale"""
         self.log("Analyse de la taille HTML...")
-        
-        if "http" not in self.results["collection"]:
-            return
-        
-        html_size = self.results["collection"]["http"].get("html_size", 0)
-        
-        # Taille anormalement petite (peut indiquer une page vide ou erreur)
-        if html_size < 500:
-            self.add_anomaly(
-                "MEDIUM",
-                "Page HTML très petite",
-                f"Seulement {html_size} bytes, peut indiquer une page vide ou erreur"
-            )
-        
-        # Taille anormalement grande
-        elif html_size > 2_000_000:  # 2 MB
-            self.add_anomaly(
-                "LOW",
-                "Page HTML très volumineuse",
-                f"{html_size:,} bytes, peut impacter les performances"
-            )
+        self.apply_rules("html_size")
     
     def analyze_security_headers(self):
         """Absence de headers de sécurité"""
         self.log("Analyse des headers de sécurité...")
-        
-        if "http" not in self.results["collection"]:
-            return
-        
-        headers = self.results["collection"]["http"].get("headers", {})
-        
-        security_headers = {
-            "Strict-Transport-Security": "HSTS manquant",
-            "Content-Security-Policy": "CSP manquant",
-            "X-Frame-Options": "Protection anti-iframe manquante",
-            "X-Content-Type-Options": "Protection anti-MIME sniffing manquante",
-            "X-XSS-Protection": "Protection XSS manquante"
-        }
-        
-        missing = []
-        for header, description in security_headers.items():
-            if header not in headers:
-                missing.append(description)
-        
-        if len(missing) >= 3:
-            self.add_anomaly(
-                "HIGH",
-                "Headers de sécurité manquants",
-                f"{len(missing)}/5 headers absents : {', '.join(missing)}"
-            )
-        elif missing:
-            self.add_anomaly(
-                "MEDIUM",
-                "Certains headers de sécurité manquants",
-                ', '.join(missing)
-            )
+        self.apply_rules("security_headers")
     
     def analyze_domain_age(self):
         """Domaine très récent (signal faible de phishing)"""
         self.log("Analyse de l'âge du domaine...")
-        
-        if "whois" not in self.results["collection"]:
-            return
-        
-        age_days = self.results["collection"]["whois"].get("age_days")
-        
-        if age_days is not None:
-            if age_days < 30:
-                self.add_anomaly(
-                    "HIGH",
-                    "Domaine très récent",
-                    f"Créé il y a {age_days} jours, signal faible de phishing potentiel"
-                )
-            elif age_days < 90:
-                self.add_anomaly(
-                    "MEDIUM",
-                    "Domaine récent",
-                    f"Créé il y a {age_days} jours"
-                )
+        self.apply_rules("domain_age")
+    
+    def apply_rules(self, section):
+        """Anomalies d'une section du plan de règles (seuils et messages : rules.json)"""
+        evaluation = self.rule_evaluation or self.rule_plan.evaluate(self.results)
+        for anomaly in evaluation.anomalies(section):
+            self.add_anomaly(anomaly["severity"], anomaly["title"], anomaly["description"])
     
     def add_anomaly(self, severity, title, description):
         """Ajoute une anomalie détectée"""
@@ -371,80 +416,116 @@ class WebScanner:
     
     # ========== EXÉCUTION COMPLÈTE ==========
     
-    def run(self):
-        """Exécute toutes les étapes de scan"""
-        print(f"\n{'='*80}")
-        print(f"SCAN EXTERNE - {self.url}")
-        print(f"{'='*80}\n")
+    def run(self, save_state=True):
+        """Exécute toutes les étapes de scan (mesurées, profilées sur option)"""
+        with profiled(self.profiler, self.domain, self.metrics), self.metrics.phase("scan"):
+            self.run_steps(save_state)
+        self.results["metrics"] = self.metrics.to_dict()
+        return self.results
+    
+    def run_steps(self, save_state=True):
+        """Collecte, analyse et enregistrement de l'état"""
+        self.echo(f"\n{'='*80}")
+        self.echo(f"SCAN EXTERNE - {self.url}")
+        self.echo(f"{'='*80}\n")
         
         # ÉTAPE 1 : Collecte
-        print("📊 ÉTAPE 1 : COLLECTE & INGESTION")
-        print("-" * 80)
-        self.collect_http_data()
-        self.collect_tls_certificate()
-        self.collect_whois()
+        self.echo("📊 ÉTAPE 1 : COLLECTE & INGESTION")
+        self.echo("-" * 80)
+        self.collect()
         
         # ÉTAPE 2 : Analyse
-        print("\n🔍 ÉTAPE 2 : ANALYSE & DÉTECTION")
-        print("-" * 80)
-        self.analyze_certificate()
-        self.analyze_redirections()
-        self.analyze_html_size()
-        self.analyze_security_headers()
-        self.analyze_domain_age()
+        self.echo("\n🔍 ÉTAPE 2 : ANALYSE & DÉTECTION")
+        self.echo("-" * 80)
+        self.analyze()
+        
+        if save_state:
+            self.save_state()
+        
+        return self.results
+    
+    def analyze(self):
+        """Exécute les analyses et le score sur results["collection"] (sans réseau)"""
+        previous = ((self.previous_state or {}).get("web") or {}).get("sections", {})
+        reused = []
+        
+        # Champs des règles lus une seule fois pour toutes les sections
+        self.rule_evaluation = self.rule_plan.evaluate(self.results)
+        try:
+            for name in self.rule_plan.sections:
+                method = self.ANALYSIS_SECTIONS.get(name)
+                run = getattr(self, method) if method else partial(self.apply_rules, name)
+                phase = method or f"rules_{name}"
+                if self.state_store is None:
+                    with self.metrics.phase(phase):
+                        run()
+                    continue
+                key = self.rule_plan.section_key(name, self.results)
+                prior = previous.get(name)
+                if prior is not None and prior["inputs"] == key:
+                    # Données d'entrée et règles inchangées : anomalies du scan précédent
+                    anomalies = prior["anomalies"]
+                    self.results["anomalies"].extend(anomalies)
+                    reused.append(name)
+                else:
+                    start = len(self.results["anomalies"])
+                    with self.metrics.phase(phase):
+                        run()
+                    anomalies = self.results["anomalies"][start:]
+                self.sections[name] = {"inputs": key, "anomalies": anomalies}
+        finally:
+            self.rule_evaluation = None
+        
+        if "incremental" in self.results:
+            self.results["incremental"]["sections_reused"] = reused
         
         # Calcul du score de risque
-        self.calculate_risk_score()
+        with self.metrics.phase("calculate_risk_score"):
+            self.calculate_risk_score()
         
         return self.results
     
+    @classmethod
+    def score_anomalies(cls, anomalies) -> tuple:
+        """(score, niveau de risque) d'une liste d'anomalies"""
+        score = sum(cls.SEVERITY_WEIGHTS.get(a["severity"], 0) for a in anomalies)
+        for threshold, level in cls.RISK_THRESHOLDS:
+            if score >= threshold:
+                return score, level
+        return score, "LOW"
+    
     def calculate_risk_score(self):
         """Calcule un score de risque basé sur les anomalies"""
-        severity_weights = {
-            "CRITICAL": 100,
-            "HIGH": 50,
-            "MEDIUM": 20,
-            "LOW": 5
-        }
-        
-        score = sum(severity_weights.get(a["severity"], 0) for a in self.results["anomalies"])
-        
-        if score >= 100:
-            risk_level = "CRITICAL"
-        elif score >= 50:
-            risk_level = "HIGH"
-        elif score >= 20:
-            risk_level = "MEDIUM"
-        else:
-            risk_level = "LOW"
+        score, risk_level = self.score_anomalies(self.results["anomalies"])
         
         self.results["analysis"]["risk_score"] = score
         self.results["analysis"]["risk_level"] = risk_level
         self.results["analysis"]["anomalies_count"] = len(self.results["anomalies"])
     
-    def generate_report(self, output_file=None):
-        """Génère un rapport lisible"""
+    @staticmethod
+    def format_report(results) -> str:
+        """Rapport texte d'un résultat (scan courant ou ligne d'un lot)"""
         report = []
         report.append("=" * 80)
         report.append("RAPPORT D'ANALYSE EXTERNE")
         report.append("=" * 80)
-        report.append(f"\n📅 Date: {self.results['scan_date']}")
-        report.append(f"🌐 URL: {self.url}")
-        report.append(f"🏷️  Domaine: {self.domain}")
+        report.append(f"\n📅 Date: {results['scan_date']}")
+        report.append(f"🌐 URL: {results['url']}")
+        report.append(f"🏷️  Domaine: {results['domain']}")
         
         # Score de risque
-        risk_level = self.results["analysis"].get("risk_level", "UNKNOWN")
+        risk_level = results["analysis"].get("risk_level", "UNKNOWN")
         risk_emoji = {"CRITICAL": "🔴", "HIGH": "🟠", "MEDIUM": "🟡", "LOW": "🟢"}.get(risk_level, "⚪")
         report.append(f"\n{risk_emoji} NIVEAU DE RISQUE: {risk_level}")
-        report.append(f"📊 Score: {self.results['analysis'].get('risk_score', 0)}")
+        report.append(f"📊 Score: {results['analysis'].get('risk_score', 0)}")
         
         # Anomalies
         report.append(f"\n{'='*80}")
-        report.append(f"🚨 ANOMALIES DÉTECTÉES: {len(self.results['anomalies'])}")
+        report.append(f"🚨 ANOMALIES DÉTECTÉES: {len(results['anomalies'])}")
         report.append("-" * 80)
         
-        if self.results["anomalies"]:
-            for i, anomaly in enumerate(self.results["anomalies"], 1):
+        if results["anomalies"]:
+            for i, anomaly in enumerate(results["anomalies"], 1):
                 emoji = {"CRITICAL": "🔴", "HIGH": "🟠", "MEDIUM": "🟡", "LOW": "🟢"}.get(anomaly["severity"], "⚪")
                 report.append(f"\n{i}. {emoji} [{anomaly['severity']}] {anomaly['title']}")
                 report.append(f"   {anomaly['description']}")
@@ -457,24 +538,24 @@ class WebScanner:
         report.append("-" * 80)
         
         # HTTP
-        if "http" in self.results["collection"]:
-            http = self.results["collection"]["http"]
+        if "http" in results["collection"]:
+            http = results["collection"]["http"]
             report.append(f"\n🌐 HTTP/HTTPS:")
             report.append(f"   Status: {http.get('status_code')}")
             report.append(f"   Taille HTML: {http.get('html_size'):,} bytes")
             report.append(f"   Redirections: {len(http.get('redirects', []))}")
         
         # TLS
-        if "tls" in self.results["collection"] and "error" not in self.results["collection"]["tls"]:
-            tls = self.results["collection"]["tls"]
+        if "tls" in results["collection"] and "error" not in results["collection"]["tls"]:
+            tls = results["collection"]["tls"]
             report.append(f"\n🔐 Certificat TLS:")
             report.append(f"   Émetteur: {tls.get('issuer', {}).get('O', 'N/A')}")
             report.append(f"   Expire dans: {tls.get('days_until_expiry')} jours")
             report.append(f"   Algorithme: {tls.get('signature_algorithm')}")
         
         # WHOIS
-        if "whois" in self.results["collection"]:
-            whois_data = self.results["collection"]["whois"]
+        if "whois" in results["collection"]:
+            whois_data = results["collection"]["whois"]
             report.append(f"\n📋 WHOIS:")
             report.append(f"   Registrar: {whois_data.get('registrar', 'N/A')}")
             report.append(f"   Âge: {whois_data.get('age_days')} jours")
@@ -482,7 +563,12 @@ class WebScanner:
         
         report.append(f"\n{'='*80}\n")
         
-        report_text = "\n".join(report)
+        return "\n".join(report)
+    
+    def generate_report(self, output_file=None, save_files=True):
+        """Génère un rapport lisible (fichiers .txt / .json sauf save_files=False)"""
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        report_text = self.format_report(self.results)
         print(report_text)
         
         # Sauvegarde
@@ -490,8 +576,13 @@ class WebScanner:
             output_file = f"scan_{self.domain}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
         # Fichier texte
-        with open(f"{output_file}.txt", "w", encoding="utf-8") as f:
-            f.write(report_text)
+        if save_files:
+            with open(f"{output_file}.txt", "w", encoding="utf-8") as f:
+                f.write(report_text)
+        self.metrics.add_phase("report", time.perf_counter() - start, time.thread_time() - cpu_start)
+        self.results["metrics"] = self.metrics.to_dict()
+        if not save_files:
+            return
         
         # Fichier JSON
         with open(f"{output_file}.json", "w", encoding="utf-8") as f:
@@ -505,20 +596,59 @@ def main():
     parser = argparse.ArgumentParser(
         description="Scanner externe de site web - Collecte & Analyse"
     )
-    parser.add_argument("url", help="URL du site à analyser")
+    parser.add_argument("url", nargs="?", help="URL du site à analyser")
     parser.add_argument("-o", "--output", help="Nom du fichier de sortie (sans extension)")
     parser.add_argument("-v", "--verbose", action="store_true", help="Mode verbeux")
+    parser.add_argument("--parser", choices=BACKENDS, default="html.parser",
+                        help="Backend d'extraction HTML (défaut : html.parser)")
+    
+    from whois_cache import add_whois_arguments, whois_options
+    from scan_state import add_state_arguments, state_options
+    from metrics import add_metrics_arguments, metrics_options
+    add_whois_arguments(parser)
+    add_state_arguments(parser)
+    add_metrics_arguments(parser)
+    add_download_arguments(parser)
+    add_rules_arguments(parser)
+    from result_sink import add_sink_arguments, sink_from_args
+    add_sink_arguments(parser)
+    parser.add_argument("--no-files", action="store_true",
+                        help="N'écrit pas les fichiers .txt / .json du rapport (résultat via --sink)")
+    
+    from batch_scanner import add_batch_arguments, run_batch
+    add_batch_arguments(parser.add_argument_group("mode batch"))
     
     args = parser.parse_args()
+    set_default_backend(args.parser)
+    configure_download_from_args(args)
+    configure_rules_from_args(args)
+    
+    # Mode batch : plusieurs URLs dans un seul processus, sortie NDJSON
+    if args.input:
+        try:
+            run_batch(args)
+        except KeyboardInterrupt:
+            print("\n\n⚠️  Scan interrompu par l'utilisateur")
+            sys.exit(1)
+        return
+    
+    if not args.url:
+        parser.error("une URL ou --input est requis")
     
     # Validation de l'URL
     if not args.url.startswith(('http://', 'https://')):
         args.url = 'https://' + args.url
     
     try:
-        scanner = WebScanner(args.url, verbose=args.verbose)
+        scanner = WebScanner(args.url, verbose=args.verbose, **whois_options(args),
+                             **state_options(args), **metrics_options(args))
         scanner.run()
-        scanner.generate_report(args.output)
+        scanner.generate_report(args.output, save_files=not args.no_files)
+        sink = sink_from_args(args)
+        if sink is not None:
+            # Un seul fichier de résultats pour des scans successifs
+            with sink:
+                sink.write(scanner.results)
         
     except KeyboardInterrupt:
         print("\n\n⚠️  Scan interrompu par l'utilisateur")
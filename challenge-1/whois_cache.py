@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Cache WHOIS persistant (SQLite)
+Clé : domaine enregistrable. TTL configurable, cache négatif pour les
+échecs, éviction LRU au-delà d'une taille maximale, compteurs hit/miss.
+Les requêtes concurrentes sur un même domaine n'interrogent le registre
+qu'une fois (les suivantes attendent et lisent le cache).
+"""
+
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+
+from whois import WhoisError
+from whois.parser import WhoisEntry
+
+from domain_matcher import registrable_domain
+
+
+DEFAULT_PATH = ".whois_cache.sqlite"
+WHOIS_PORT = 43
+DEFAULT_TTL = 7 * 24 * 3600          # les données d'enregistrement changent rarement
+DEFAULT_NEGATIVE_TTL = 3600          # un échec est retenté au bout d'une heure
+DEFAULT_MAX_ENTRIES = 100_000
+EVICTION_CHECK_EVERY = 256           # fréquence de contrôle de la taille
+
+
+class WhoisCacheError(Exception):
+    """Échec WHOIS servi depuis le cache négatif"""
+
+
+class WhoisCache:
+    """Cache clé → enregistrement WHOIS normalisé (dates ISO)"""
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0,
+                      "expired": 0, "coalesced": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stores_since_check = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS whois (
+                domain TEXT PRIMARY KEY,
+                ok INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS whois_lru ON whois(accessed_at)")
+
+    # ---------- accès bas niveau ----------
+
+    def get(self, key, count=True):
+        """(ok, payload) si l'entrée est valide, sinon None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ok, payload, stored_at FROM whois WHERE domain = ?", (key,)
+            ).fetchone()
+            if row is None:
+                if count:
+                    self.stats["misses"] += 1
+                return None
+            ok, payload, stored_at = row
+            if now - stored_at > (self.ttl if ok else self.negative_ttl):
+                if count:
+                    self.stats["misses"] += 1
+                    self.stats["expired"] += 1
+                return None
+            self._conn.execute("UPDATE whois SET accessed_at = ? WHERE domain = ?", (now, key))
+            if count:
+                self.stats["hits" if ok else "negative_hits"] += 1
+        return bool(ok), json.loads(payload)
+
+    def put(self, key, record):
+        self._store(key, True, record)
+
+    def put_error(self, key, message):
+        self._store(key, False, message)
+
+    def _store(self, key, ok, payload):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO whois (domain, ok, payload, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, int(ok), json.dumps(payload, default=str), now, now)
+            )
+            self.stats["stores"] += 1
+            self._stores_since_check += 1
+            if self._stores_since_check >= EVICTION_CHECK_EVERY:
+                self._stores_since_check = 0
+                self._evict()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées (verrou tenu)"""
+        size = self._conn.execute("SELECT COUNT(*) FROM whois").fetchone()[0]
+        excess = size - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM whois WHERE domain IN "
+                "(SELECT domain FROM whois ORDER BY accessed_at LIMIT ?)", (excess,)
+            )
+            self.stats["evictions"] += excess
+
+    # ---------- API principale ----------
+
+    def lookup(self, domain, fetch):
+        """Enregistrement WHOIS depuis le cache, ou via fetch() puis mise en cache
+
+        Lève WhoisCacheError pour un échec encore dans le cache négatif.
+        Retourne (record, from_cache).
+        """
+        key = registrable_domain(domain)
+        cached = self.get(key)
+        if cached is None:
+            # Un seul appel réseau par domaine, même avec des scans concurrents
+            with self._lock:
+                key_lock = self._inflight.setdefault(key, threading.Lock())
+            with key_lock:
+                try:
+                    # Entrée écrite pendant l'attente par un scan concurrent
+                    cached = self.get(key, count=False)
+                    if cached is None:
+                        try:
+                            record = fetch()
+                        except Exception as e:
+                            self.put_error(key, str(e))
+                            raise
+                        self.put(key, record)
+                        return record, False
+                    self.stats["coalesced"] += 1
+                finally:
+                    with self._lock:
+                        self._inflight.pop(key, None)
+        ok, payload = cached
+        if not ok:
+            raise WhoisCacheError(payload)
+        return payload, True
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["negative_hits"] + self.stats["misses"]
+        return round((self.stats["hits"] + self.stats["negative_hits"]) / lookups, 3) if lookups else 0.0
+
+    def snapshot(self):
+        return {**self.stats, "hit_rate": self.hit_rate()}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def query_whois_server(domain, server, timeout=10):
+    """Requête WHOIS (RFC 3912) vers un serveur imposé, hôte[:port] ; la
+    réponse passe par le parseur de python-whois"""
+    host, sep, port = server.rpartition(':')
+    if not sep:
+        host, port = server, WHOIS_PORT
+    with socket.create_connection((host, int(port)), timeout=timeout) as sock:
+        sock.sendall(domain.encode('idna') + b"\r\n")
+        chunks = []
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    text = b"".join(chunks).decode('utf-8', errors='replace')
+    if not text.strip():
+        raise WhoisError(f"Réponse WHOIS vide ({server})")
+    return WhoisEntry.load(domain, text)
+
+
+def add_whois_arguments(parser):
+    """Options WHOIS partagées par web_scanner.py et batch_scanner.py"""
+    parser.add_argument("--whois-cache", metavar="FICHIER",
+                        help="Cache WHOIS SQLite persistant (désactivé par défaut)")
+    parser.add_argument("--whois-ttl", type=float, default=DEFAULT_TTL / 3600,
+                        help=f"Validité d'une entrée en heures (défaut : {DEFAULT_TTL // 3600})")
+    parser.add_argument("--whois-timeout", type=int, default=10,
+                        help="Délai maximal d'une requête WHOIS en secondes (défaut : 10)")
+    parser.add_argument("--whois-server", metavar="HOTE[:PORT]",
+                        help="Serveur WHOIS imposé pour tous les domaines (miroir, banc de test)")
+
+
+def whois_options(args):
+    """Arguments WebScanner correspondant aux options WHOIS de la CLI"""
+    cache = WhoisCache(args.whois_cache, ttl=args.whois_ttl * 3600) if args.whois_cache else None
+    return {"whois_cache": cache, "whois_timeout": args.whois_timeout,
+            "whois_server": args.whois_server}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspection du cache WHOIS")
+    parser.add_argument("--path", default=DEFAULT_PATH, help=f"Fichier SQLite (défaut : {DEFAULT_PATH})")
+    parser.add_argument("--purge-expired", action="store_true", help="Supprime les entrées expirées")
+    args = parser.parse_args()
+
+    cache = WhoisCache(args.path)
+    conn = cache._conn
+    if args.purge_expired:
+        now = time.time()
+        deleted = conn.execute(
+            "DELETE FROM whois WHERE (ok = 1 AND ? - stored_at > ?) OR (ok = 0 AND ? - stored_at > ?)",
+            (now, cache.ttl, now, cache.negative_ttl)
+        ).rowcount
+        print(f"✓ {deleted} entrées expirées supprimées")
+    total, ok = conn.execute("SELECT COUNT(*), COALESCE(SUM(ok), 0) FROM whois").fetchone()
+    print(f"📋 {total} domaines en cache ({ok} valides, {total - ok} échecs)")
+    cache.close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()